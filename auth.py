@@ -2,9 +2,10 @@ import streamlit as st
 import hashlib
 import sqlite3
 from datetime import datetime, timedelta
-from database import get_db_connection
+from database import db_connection, get_writer
 from language import t
 from utils import generate_verification_code, send_email
+from time_utils import now_ms, datetime_to_ms
 
 # 密码加密
 def hash_password(password):
@@ -12,29 +13,60 @@ def hash_password(password):
 
 # 用户注册
 def register_user(username, email, password):
-    conn = get_db_connection()
-    c = conn.cursor()
-    
     try:
-        c.execute(
+        get_writer().execute(
             'INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
             (username, email, hash_password(password))
         )
-        conn.commit()
         return True, t('auth.register_success')
     except sqlite3.IntegrityError:
         return False, t('auth.username_email_exists')
-    finally:
-        conn.close()
+
+# 为邮箱对应的用户生成并保存找回密码的验证码，用户不存在时返回 None
+def create_password_reset(email):
+    with db_connection(readonly=True) as conn:
+        user = conn.execute('SELECT id FROM users WHERE email = ?', (email,)).fetchone()
+    if not user:
+        return None
+    code = generate_verification_code()
+    expires_at = datetime.now() + timedelta(minutes=10)
+    get_writer().execute(
+        '''INSERT INTO password_resets (email, code, expires_at, expires_at_ms, created_at_ms, used)
+           VALUES (?, ?, ?, ?, ?, 0)''',
+        (email, code, expires_at.isoformat(), datetime_to_ms(expires_at), now_ms())
+    )
+    return code
+
+# 用验证码重置密码：检查验证码、更新密码并标记验证码已使用在写线程的同一个写操作中完成
+def reset_password(email, code, new_password):
+    def reset(conn):
+        record = conn.execute(
+            'SELECT * FROM password_resets WHERE email = ? AND used = 0 ORDER BY created_at_ms DESC LIMIT 1',
+            (email,)
+        ).fetchone()
+        # 验证码匹配与过期检查（缺少过期时间的记录视为已过期）
+        if not record or record['code'] != code:
+            return 'auth.code_invalid'
+        if now_ms() > (record['expires_at_ms'] or 0):
+            return 'auth.code_expired'
+        # 更新用户密码并标记记录为已使用
+        conn.execute('UPDATE users SET password = ? WHERE email = ?', (hash_password(new_password), email))
+        conn.execute('UPDATE password_resets SET used = 1 WHERE id = ?', (record['id'],))
+        return None
+
+    # 提示文字在页面线程中翻译（写线程中没有会话的语言设置）
+    error = get_writer().run(reset)
+    if error:
+        return False, t(error)
+    return True, t('auth.reset_success')
 
 # 用户登录
 def login_user(username, password):
-    conn = get_db_connection()
-    c = conn.cursor()
-    
-    c.execute('SELECT * FROM users WHERE username = ?', (username,))
-    user = c.fetchone()
-    conn.close()
+    with db_connection(readonly=True) as conn:
+        c = conn.cursor()
+        
+        c.execute('SELECT * FROM users WHERE username = ?', (username,))
+        user = c.fetchone()
     
     if user and user['password'] == hash_password(password):
         return True, user
@@ -103,23 +135,11 @@ def auth_page():
                 if not reset_email:
                     st.error(t('auth.fill_all_fields'))
                 else:
-                    # 检查邮箱是否存在
-                    conn = get_db_connection()
-                    user = conn.execute('SELECT * FROM users WHERE email = ?', (reset_email,)).fetchone()
-                    if not user:
+                    # 检查邮箱是否存在，存在时生成验证码并保存到数据库
+                    code = create_password_reset(reset_email)
+                    if code is None:
                         st.error(t('auth.user_not_found_by_email'))
-                        conn.close()
                     else:
-                        # 生成验证码并保存到数据库
-                        code = generate_verification_code()
-                        expires_at = (datetime.now() + timedelta(minutes=10)).isoformat()
-                        conn.execute(
-                            'INSERT INTO password_resets (email, code, expires_at, used) VALUES (?, ?, ?, 0)',
-                            (reset_email, code, expires_at)
-                        )
-                        conn.commit()
-                        conn.close()
-
                         # 发送邮件
                         subject = f"{t('auth.reset_password')}"
                         body = f"{t('auth.verification_code')}: {code}\n{t('auth.reset_password')}"
@@ -144,41 +164,9 @@ def auth_page():
             elif new_password != confirm_password:
                 st.error(t('auth.password_mismatch'))
             else:
-                conn = get_db_connection()
-                record = conn.execute(
-                    'SELECT * FROM password_resets WHERE email = ? AND used = 0 ORDER BY created_at DESC LIMIT 1',
-                    (reset_email,)
-                ).fetchone()
-
-                if not record:
-                    st.error(t('auth.code_invalid'))
-                    conn.close()
+                success, message = reset_password(reset_email, input_code, new_password)
+                if success:
+                    st.success(message)
+                    st.info(t('auth.please_login'))
                 else:
-                    # 验证码匹配与过期检查
-                    now = datetime.now()
-                    try:
-                        exp = datetime.fromisoformat(record['expires_at'])
-                    except Exception:
-                        # 兼容非ISO格式（如果存在）
-                        exp = now
-                    if record['code'] != input_code:
-                        st.error(t('auth.code_invalid'))
-                        conn.close()
-                    elif now > exp:
-                        st.error(t('auth.code_expired'))
-                        conn.close()
-                    else:
-                        # 更新用户密码
-                        conn.execute(
-                            'UPDATE users SET password = ? WHERE email = ?',
-                            (hash_password(new_password), reset_email)
-                        )
-                        # 标记记录为已使用
-                        conn.execute(
-                            'UPDATE password_resets SET used = 1 WHERE id = ?',
-                            (record['id'],)
-                        )
-                        conn.commit()
-                        conn.close()
-                        st.success(t('auth.reset_success'))
-                        st.info(t('auth.please_login'))
+                    st.error(message)
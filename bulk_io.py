@@ -0,0 +1,314 @@
+import os
+import sys
+import csv
+import json
+import time
+import sqlite3
+import argparse
+from database import DB_PATH, open_connection
+from migrations import ensure_schema
+from language import LANGUAGES
+from products import description_items, insert_product_rows, LISTING_STATUSES, STATUS_ACTIVE, STATUS_DELETED
+from listing_codes import category_code, condition_code
+from time_utils import now_ms
+
+# 商品批量导入/导出工具：以 CSV 或 JSONL 格式流式读写商品，内存占用与文件大小无关。
+# 导入与 publish_product() 的行为一致：只保存实际填写的语言描述，未提供发布时间时使用当前时间；
+# 每批记录在一个显式事务中用 executemany 写入，单行解析或校验失败只跳过该行并报告其行号。
+# 各语言描述（description_zh/en/ja/ko）、图片路径（image_path）和商品状态（status）在导出后可原样导入；
+# 导出默认不包含已删除（等待清理）的商品，未填写状态的导入记录为在售。
+#
+# 用法：
+#   python bulk_io.py export products.csv            # 按扩展名判断格式，- 表示标准输出
+#   python bulk_io.py export - --format jsonl [--include-deleted]
+#   python bulk_io.py import products.jsonl [--batch 1000] [--keep-ids]
+
+FIELDS = ['id', 'user_id', 'title', 'price', 'category', 'condition', 'contact_info',
+          'image_path', 'created_at_ms', 'status', 'status_changed_ms'] + \
+         [f'description_{lang}' for lang in LANGUAGES]
+
+DEFAULT_BATCH = 1000
+
+# 每隔多少行输出一次进度
+PROGRESS_EVERY = 10000
+
+
+# 根据文件扩展名判断格式
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if ext == '.csv':
+        return 'csv'
+    raise ValueError(f"无法根据扩展名判断格式: {path}，请使用 --format 指定")
+
+
+# 逐条读取记录，产生 (行号, 记录, 错误)：无法解析的行记录为 None 并给出错误原因，不中断读取。
+# 行号是记录在文件中的起始行（CSV 带引号的字段可以跨行，行号取自 reader.line_num）；
+# CSV 的空单元格按未填写处理
+def read_records(f, fmt):
+    if fmt == 'csv':
+        reader = csv.DictReader(f)
+        # 先读取表头，line_num 即为表头结束的行
+        reader.fieldnames
+        start = reader.line_num + 1
+        for record in reader:
+            yield start, {key: value for key, value in record.items() if value != ''}, None
+            start = reader.line_num + 1
+    else:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield number, None, f"JSON 格式错误: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield number, None, "每行必须是一个 JSON 对象"
+                continue
+            yield number, record, None
+
+
+# 进度统计：已处理行数和每秒行数
+class Progress:
+    def __init__(self, label, out=sys.stderr):
+        self.label = label
+        self.out = out
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    def add(self, count):
+        before = self.rows // PROGRESS_EVERY
+        self.rows += count
+        if self.rows // PROGRESS_EVERY > before:
+            self.report()
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def report(self, final=False):
+        elapsed = time.perf_counter() - self.started
+        prefix = '完成' if final else '进行中'
+        print(f"[{prefix}] {self.label} {self.rows} 行，用时 {elapsed:.2f} 秒，{self.rate():.0f} 行/秒",
+              file=self.out)
+
+
+# 导出：按 id 分批读取商品及其描述；include_deleted 为 False 时跳过已删除的商品
+def iter_export_rows(conn, batch=DEFAULT_BATCH, include_deleted=False):
+    last_id = 0
+    status_filter = '' if include_deleted else f"AND status <> '{STATUS_DELETED}'"
+    while True:
+        rows = conn.execute(
+            f'''SELECT id, user_id, title, price, category, condition, contact_info, image_path, created_at_ms,
+                      status, status_changed_ms
+               FROM products WHERE id > ? {status_filter} ORDER BY id LIMIT ?''',
+            (last_id, batch)
+        ).fetchall()
+        if not rows:
+            return
+        ids = [row['id'] for row in rows]
+        placeholders = ', '.join('?' * len(ids))
+        descriptions = {}
+        for desc in conn.execute(
+                f'SELECT product_id, lang, text FROM product_descriptions WHERE product_id IN ({placeholders})', ids):
+            descriptions.setdefault(desc['product_id'], {})[desc['lang']] = desc['text']
+        for row in rows:
+            record = {key: row[key] for key in row.keys()}
+            for lang, text in descriptions.get(row['id'], {}).items():
+                record[f'description_{lang}'] = text
+            yield record
+        last_id = ids[-1]
+
+
+def export_products(conn, out, fmt, batch=DEFAULT_BATCH, include_deleted=False):
+    progress = Progress('导出')
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, fieldnames=FIELDS)
+        writer.writeheader()
+    for record in iter_export_rows(conn, batch, include_deleted):
+        if fmt == 'csv':
+            writer.writerow(record)
+        else:
+            # JSONL 中省略空值，保持每行紧凑
+            out.write(json.dumps({key: value for key, value in record.items() if value is not None},
+                                 ensure_ascii=False) + '\n')
+        progress.add(1)
+    progress.report(final=True)
+    return progress.rows
+
+
+# 校验并转换一条导入记录，返回 (商品字段字典, 描述列表) 或抛出 ValueError
+def parse_record(record, keep_ids=False):
+    def required(key):
+        value = record.get(key)
+        if value is None or str(value).strip() == '':
+            raise ValueError(f"缺少必填字段 {key}")
+        return value
+
+    try:
+        user_id = int(required('user_id'))
+        price = float(required('price'))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"字段格式错误: {e}") from None
+    if price <= 0:
+        raise ValueError("价格必须大于0")
+    status = record.get('status') or STATUS_ACTIVE
+    if status not in LISTING_STATUSES:
+        raise ValueError(f"未知状态 {status}，应为 {', '.join(LISTING_STATUSES)} 之一")
+    try:
+        status_changed_ms = int(record['status_changed_ms']) if record.get('status_changed_ms') else None
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"字段格式错误: {e}") from None
+
+    product = {
+        'id': int(required('id')) if keep_ids else None,
+        'user_id': user_id,
+        'title': str(required('title')),
+        'price': price,
+        # 类别和新旧程度保存为代码，导入文件中也可以填写任意语言的显示文本
+        'category': category_code(record.get('category')),
+        'condition': condition_code(record.get('condition')),
+        'contact_info': str(required('contact_info')),
+        'image_path': record.get('image_path') or None,
+        'created_at_ms': int(record['created_at_ms']) if record.get('created_at_ms') else now_ms(),
+        'status': status,
+        'status_changed_ms': status_changed_ms,
+    }
+    descriptions = description_items({lang: str(record[f'description_{lang}'])
+                                      for lang in LANGUAGES if record.get(f'description_{lang}')})
+    if not descriptions:
+        raise ValueError("至少需要提供一种语言的描述")
+    return product, descriptions
+
+
+# 在一个事务中写入一批已校验的记录；未保留原ID时由 insert_product_rows() 在写锁内连续分配新ID
+def _insert_batch(conn, batch, keep_ids):
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # 跳过不存在的用户（外键约束已启用，否则整批会失败）
+        user_ids = sorted({product['user_id'] for product, _, _ in batch})
+        placeholders = ', '.join('?' * len(user_ids))
+        existing_users = {row[0] for row in conn.execute(
+            f'SELECT id FROM users WHERE id IN ({placeholders})', user_ids)}
+        # 保留原ID时跳过已被占用的ID
+        taken_ids = set()
+        if keep_ids:
+            product_ids = [product['id'] for product, _, _ in batch]
+            placeholders = ', '.join('?' * len(product_ids))
+            taken_ids = {row[0] for row in conn.execute(
+                f'SELECT id FROM products WHERE id IN ({placeholders})', product_ids)}
+        accepted = []
+        errors = []
+        for product, descriptions, line in batch:
+            if product['user_id'] not in existing_users:
+                errors.append((line, f"用户 {product['user_id']} 不存在"))
+            elif product['id'] in taken_ids:
+                errors.append((line, f"商品ID {product['id']} 已存在"))
+            else:
+                accepted.append((product, descriptions))
+                if keep_ids:
+                    taken_ids.add(product['id'])
+
+        insert_product_rows(conn, accepted)
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return len(accepted), errors
+
+
+# 导入：逐行校验，攒满一批后写入；返回 (成功行数, 错误列表[(行号, 原因)])
+def import_products(conn, f, fmt, batch_size=DEFAULT_BATCH, keep_ids=False, max_errors=100):
+    progress = Progress('导入')
+    errors = []
+    error_count = 0
+    inserted = 0
+    batch = []
+
+    def flush():
+        nonlocal inserted, error_count
+        count, batch_errors = _insert_batch(conn, batch, keep_ids)
+        inserted += count
+        error_count += len(batch_errors)
+        errors.extend(batch_errors[:max(max_errors - len(errors), 0)])
+        progress.add(len(batch))
+        batch.clear()
+
+    for line, record, error in read_records(f, fmt):
+        if error is None:
+            try:
+                product, descriptions = parse_record(record, keep_ids)
+            except (ValueError, TypeError) as e:
+                error = str(e)
+        if error is not None:
+            error_count += 1
+            if len(errors) < max_errors:
+                errors.append((line, error))
+            progress.add(1)
+            continue
+        batch.append((product, descriptions, line))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    progress.report(final=True)
+    return inserted, error_count, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='商品批量导入/导出工具')
+    parser.add_argument('--db', default=DB_PATH, help='数据库文件路径')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='导出商品（默认不含已删除的商品）')
+    export_parser.add_argument('output', help='输出文件，- 表示标准输出')
+    export_parser.add_argument('--format', choices=('csv', 'jsonl'), help='文件格式（默认按扩展名判断）')
+    export_parser.add_argument('--batch', type=int, default=DEFAULT_BATCH, help='每次读取的行数')
+    export_parser.add_argument('--include-deleted', action='store_true', help='同时导出已删除（等待清理）的商品')
+    import_parser = subparsers.add_parser('import', help='导入商品')
+    import_parser.add_argument('input', help='输入文件，- 表示标准输入')
+    import_parser.add_argument('--format', choices=('csv', 'jsonl'), help='文件格式（默认按扩展名判断）')
+    import_parser.add_argument('--batch', type=int, default=DEFAULT_BATCH, help='每个事务写入的行数')
+    import_parser.add_argument('--keep-ids', action='store_true', help='使用文件中的商品ID（用于恢复备份）')
+    args = parser.parse_args(argv)
+    try:
+        fmt = detect_format(args.output if args.command == 'export' else args.input, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    ensure_schema(args.db)
+    # 命令行工具使用普通连接，不计入页面的SQL统计；事务由本工具显式控制
+    conn = open_connection(args.db, factory=sqlite3.Connection, readonly=args.command == 'export')
+    conn.isolation_level = None
+    try:
+        if args.command == 'export':
+            if args.output == '-':
+                export_products(conn, sys.stdout, fmt, args.batch, args.include_deleted)
+            else:
+                with open(args.output, 'w', encoding='utf-8', newline='') as out:
+                    export_products(conn, out, fmt, args.batch, args.include_deleted)
+        elif args.command == 'import':
+            if args.input == '-':
+                result = import_products(conn, sys.stdin, fmt, args.batch, args.keep_ids)
+            else:
+                with open(args.input, encoding='utf-8-sig', newline='') as f:
+                    result = import_products(conn, f, fmt, args.batch, args.keep_ids)
+            inserted, error_count, errors = result
+            print(f"成功导入 {inserted} 个商品，失败 {error_count} 行")
+            for line, reason in sorted(errors):
+                print(f"  第 {line} 行: {reason}")
+            if error_count > len(errors):
+                print(f"  ... 另有 {error_count - len(errors)} 行错误未列出")
+            return 1 if error_count else 0
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# 测试使用临时数据库：database.py 在导入时读取 MARKET_DB_PATH，必须在导入任何应用模块之前设置
+os.environ['MARKET_DB_PATH'] = os.path.join(tempfile.mkdtemp(prefix='market_test_'), 'market.db')
@@ -1,103 +1,219 @@
 import sqlite3
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 import streamlit as st
+from migrations import apply_migrations, ensure_schema
+from sql_profiler import InstrumentedConnection, skip_module_file
+from db_writer import DatabaseWriter
 
-# 确保数据库目录存在
+# 数据库文件路径（可通过环境变量 MARKET_DB_PATH 指定其他数据库，如诊断工具使用的临时库）
+DB_PATH = os.environ.get('MARKET_DB_PATH', 'second_hand_market.db')
+
+# 连接池大小与获取连接的最长等待时间（秒）
+POOL_SIZE = 8
+POOL_TIMEOUT = 10.0
+
+# 每个连接创建时执行一次的PRAGMA
+CONNECTION_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 5000),
+    ('cache_size', -8000),
+    ('foreign_keys', 'ON'),
+)
+
+# 只读连接的PRAGMA：不修改日志模式，并禁止任何写操作
+READONLY_PRAGMAS = (
+    ('busy_timeout', 5000),
+    ('cache_size', -8000),
+    ('query_only', 'ON'),
+)
+
+# 初始化数据库：执行所有未执行的结构迁移（见 migrations.py）
 def init_db():
-    conn = sqlite3.connect('second_hand_market.db')
-    c = conn.cursor()
-    
-    # 创建用户表
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    # 创建商品表
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS products (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        title TEXT NOT NULL,
-        description_zh TEXT,
-        description_en TEXT,
-        description_ja TEXT,
-        description_ko TEXT,
-        price REAL NOT NULL,
-        category TEXT,
-        condition TEXT,
-        contact_info TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        image_path TEXT,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )
-    ''')
-    
-    # 为已有表添加多语言描述字段（兼容现有数据）
-    try:
-        c.execute('ALTER TABLE products ADD COLUMN description_zh TEXT')
-        c.execute('ALTER TABLE products ADD COLUMN description_en TEXT')
-        c.execute('ALTER TABLE products ADD COLUMN description_ja TEXT')
-        c.execute('ALTER TABLE products ADD COLUMN description_ko TEXT')
-        # 将现有description数据复制到description_zh（假设原数据为中文）
-        c.execute('UPDATE products SET description_zh = description WHERE description IS NOT NULL')
-    except sqlite3.OperationalError:
-        # 如果字段已存在，则忽略错误
-        pass
-    
-    # 创建消息表
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        sender_id INTEGER NOT NULL,
-        receiver_id INTEGER NOT NULL,
-        product_id INTEGER,
-        content TEXT NOT NULL,
-        is_read BOOLEAN DEFAULT 0,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (sender_id) REFERENCES users (id),
-        FOREIGN KEY (receiver_id) REFERENCES users (id),
-        FOREIGN KEY (product_id) REFERENCES products (id)
-    )
-    ''')
-    
-    # 创建索引以提高搜索性能
-    c.execute('CREATE INDEX IF NOT EXISTS idx_products_title ON products(title)')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_products_category ON products(category)')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_messages_sender_receiver ON messages(sender_id, receiver_id)')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_messages_receiver ON messages(receiver_id)')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_messages_product ON messages(product_id)')
-    
-    # 创建密码重置表
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS password_resets (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        email TEXT NOT NULL,
-        code TEXT NOT NULL,
-        expires_at TIMESTAMP NOT NULL,
-        used BOOLEAN DEFAULT 0,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    # 为密码重置表创建索引
-    c.execute('CREATE INDEX IF NOT EXISTS idx_password_resets_email ON password_resets(email)')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_password_resets_expires ON password_resets(expires_at)')
-    
-    conn.commit()
-    conn.close()
-
-# 获取数据库连接
-def get_db_connection():
-    conn = sqlite3.connect('second_hand_market.db')
+    return apply_migrations(DB_PATH)
+
+# 创建一个新连接并执行连接级PRAGMA
+# readonly=True 时以 file:...?mode=ro 打开，读者永远不会持有写锁
+def open_connection(db_path=DB_PATH, timeout=POOL_TIMEOUT, factory=InstrumentedConnection, readonly=False):
+    if readonly:
+        uri = f'file:{os.path.abspath(db_path)}?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, timeout=timeout, check_same_thread=False, factory=factory)
+        pragmas = READONLY_PRAGMAS
+    else:
+        conn = sqlite3.connect(db_path, timeout=timeout, check_same_thread=False, factory=factory)
+        pragmas = CONNECTION_PRAGMAS
     conn.row_factory = sqlite3.Row  # 启用行工厂，方便按列名访问
+    for name, value in pragmas:
+        conn.execute(f'PRAGMA {name} = {value}')
     return conn
 
-# 初始化数据库
-# 无论数据库是否存在，都调用init_db()来确保所有表都已创建
-init_db()
+# 统计调用函数时跳过本模块
+skip_module_file(__file__)
+
+# 由连接池管理的连接：close() 时归还到连接池，而不是真正关闭
+# 继承 InstrumentedConnection，每条语句都会计时（见 sql_profiler.py）
+class PooledConnection(InstrumentedConnection):
+    _pool = None
+    _checked_out = False
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.release(self)
+        else:
+            super().close()
+
+
+# 有界连接池：连接在多次页面重跑之间复用，PRAGMA 只在创建连接时执行一次
+class ConnectionPool:
+    def __init__(self, db_path=DB_PATH, max_size=POOL_SIZE, timeout=POOL_TIMEOUT, readonly=False):
+        self.db_path = db_path
+        self.readonly = readonly
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._all = []
+        self._stats = {
+            'created': 0,
+            'checkouts': 0,
+            'in_use': 0,
+            'peak_in_use': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+        }
+
+    def _connect(self):
+        conn = open_connection(self.db_path, timeout=self.timeout, factory=PooledConnection,
+                               readonly=self.readonly)
+        conn._pool = self
+        return conn
+
+    def acquire(self):
+        """从池中取出一个连接，池满时最多等待 timeout 秒"""
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise TimeoutError(f"获取数据库连接超时（{self.timeout}秒）")
+        waited = time.perf_counter() - start
+
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                conn = self._connect()
+            except Exception:
+                self._slots.release()
+                raise
+            with self._lock:
+                self._all.append(conn)
+                self._stats['created'] += 1
+
+        conn._checked_out = True
+        with self._lock:
+            stats = self._stats
+            stats['checkouts'] += 1
+            stats['in_use'] += 1
+            stats['peak_in_use'] = max(stats['peak_in_use'], stats['in_use'])
+            stats['wait_time_total'] += waited
+            stats['wait_time_max'] = max(stats['wait_time_max'], waited)
+        return conn
+
+    def release(self, conn):
+        """归还连接，未提交的事务会被回滚"""
+        if not conn._checked_out:
+            return
+        conn._checked_out = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        finally:
+            self._idle.put(conn)
+            with self._lock:
+                self._stats['in_use'] -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['idle'] = self._idle.qsize()
+        stats['max_size'] = self.max_size
+        checkouts = stats['checkouts']
+        stats['wait_time_avg'] = stats['wait_time_total'] / checkouts if checkouts else 0.0
+        return stats
+
+    def close_all(self):
+        with self._lock:
+            conns, self._all = self._all, []
+        for conn in conns:
+            sqlite3.Connection.close(conn)
+
+
+# 进程级共享的连接池，跨 Streamlit 重跑保持
+# 创建连接池前先做一次结构版本检查，已是最新时只需读取 user_version
+@st.cache_resource
+def get_pool():
+    ensure_schema(DB_PATH)
+    return ConnectionPool(DB_PATH)
+
+
+# 只读连接池：供搜索、列表等纯读取函数使用，可与写线程并行读取
+@st.cache_resource
+def get_readonly_pool():
+    ensure_schema(DB_PATH)
+    return ConnectionPool(DB_PATH, readonly=True)
+
+
+# 以上下文管理器方式借出连接，退出时自动归还
+# readonly=True 时从只读连接池借出
+def db_connection(readonly=False):
+    if readonly:
+        return get_readonly_pool().connection()
+    return get_pool().connection()
+
+
+# 获取数据库连接（兼容旧代码：调用 close() 会把连接归还到连接池）
+def get_db_connection():
+    return get_pool().acquire()
+
+
+# 获取连接池统计信息
+def get_pool_stats(readonly=False):
+    if readonly:
+        return get_readonly_pool().stats()
+    return get_pool().stats()
+
+
+# 进程内唯一的后台写线程，持有唯一的写连接（见 db_writer.py）
+@st.cache_resource
+def _start_writer():
+    ensure_schema(DB_PATH)
+    return DatabaseWriter(lambda: open_connection(DB_PATH))
+
+
+# 写线程因错误退出时重新启动一个（已排队的写操作已以该错误失败）
+def get_writer():
+    writer = _start_writer()
+    if not writer.is_alive():
+        _start_writer.clear()
+        writer = _start_writer()
+    return writer
+
+
+# 获取写线程统计信息
+def get_writer_stats():
+    return get_writer().stats()
@@ -0,0 +1,225 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+from sql_profiler import caller_tag, skip_module_file, tagged
+
+# 后台单写线程：由唯一的写连接按顺序执行排队的写操作，
+# 把同一时间段内排队的多个写操作合并到一次提交中（group commit），减少 "database is locked" 等待
+
+# 写线程执行的语句按提交写操作的业务函数统计，查找调用函数时跳过本模块
+skip_module_file(__file__)
+
+# 单条写语句的执行结果
+WriteResult = namedtuple('WriteResult', ['lastrowid', 'rowcount'])
+
+# 一次合并提交最多包含的写操作数量
+MAX_BATCH = 64
+
+# execute()/run() 默认等待提交完成的最长时间（秒），避免写线程异常时页面一直等待
+WRITE_TIMEOUT = 30.0
+
+# 队列结束标记
+_STOP = object()
+
+
+# 排队中的写操作：sql 语句或接收连接参数的函数
+class _WriteJob:
+    __slots__ = ('sql', 'params', 'func', 'future', 'enqueued', 'tag')
+
+    def __init__(self, sql=None, params=(), func=None):
+        self.sql = sql
+        self.params = params
+        self.func = func
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+        # 提交时记下发起写操作的业务函数，执行时的 SQL 统计计入该函数
+        self.tag = caller_tag()
+
+    def run(self, conn):
+        with tagged(self.tag):
+            if self.func is not None:
+                return self.func(conn)
+            cursor = conn.execute(self.sql, self.params)
+            return WriteResult(cursor.lastrowid, cursor.rowcount)
+
+
+class DatabaseWriter:
+    def __init__(self, connect, max_batch=MAX_BATCH):
+        # connect: 无参函数，返回一个新的 sqlite3 连接（由写线程独占）
+        self._connect = connect
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        # 写线程因无法恢复的错误（如无法打开连接、回滚失败）退出时保存该异常，
+        # 之后提交的写操作直接以该异常失败
+        self._error = None
+        self._stats = {
+            'writes': 0,
+            'failed': 0,
+            'commits': 0,
+            'batch_max': 0,
+            'commit_time_total': 0.0,
+            'commit_time_max': 0.0,
+            'queue_wait_total': 0.0,
+            'queue_depth_max': 0,
+        }
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    # 提交一条写语句，返回 Future，结果为 WriteResult(lastrowid, rowcount)
+    def submit(self, sql, params=()):
+        return self._enqueue(_WriteJob(sql=sql, params=params))
+
+    # 提交一个在写连接上执行的函数 func(conn)，适合需要先读后写的操作
+    def submit_func(self, func):
+        return self._enqueue(_WriteJob(func=func))
+
+    # 同步执行写语句并等待提交完成（需要新行ID的调用方使用）
+    def execute(self, sql, params=(), timeout=WRITE_TIMEOUT):
+        return self.submit(sql, params).result(timeout)
+
+    # 同步执行函数并等待提交完成，返回函数的返回值
+    def run(self, func, timeout=WRITE_TIMEOUT):
+        return self.submit_func(func).result(timeout)
+
+    # 写线程是否仍在正常运行
+    def is_alive(self):
+        with self._lock:
+            return self._error is None and self._thread.is_alive()
+
+    def _enqueue(self, job):
+        # 在锁内检查并入队：写线程退出时先在锁内记下异常，再取出队列中剩余的写操作，不会遗漏
+        with self._lock:
+            if self._error is not None:
+                job.future.set_exception(self._error)
+                return job.future
+            self._queue.put(job)
+            depth = self._queue.qsize()
+            if depth > self._stats['queue_depth_max']:
+                self._stats['queue_depth_max'] = depth
+        return job.future
+
+    def _run(self):
+        # 打开连接和事务控制语句（BEGIN/SAVEPOINT/COMMIT）计入写线程本身
+        with tagged('db_writer'):
+            conn = None
+            try:
+                conn = self._connect()
+                # 由写线程显式控制事务
+                conn.isolation_level = None
+                self._loop(conn)
+            except Exception as e:
+                self._fail_pending(e)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    # 写线程退出：记下异常，队列中剩余的写操作都以该异常失败
+    def _fail_pending(self, error):
+        with self._lock:
+            self._error = error
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not _STOP and not job.future.done():
+                job.future.set_exception(error)
+
+    def _loop(self, conn):
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                break
+            # 取出当前已排队的其余写操作，合并到同一次提交
+            batch = [job]
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is _STOP:
+                    stop = True
+                    break
+                batch.append(job)
+            try:
+                self._commit_batch(conn, batch)
+            except Exception as e:
+                # 回滚也失败时连接状态未知，本批尚未完成的写操作以该异常失败，写线程退出
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                raise
+            if stop:
+                break
+
+    def _commit_batch(self, conn, batch):
+        started = time.perf_counter()
+        results = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for job in batch:
+                # 每个写操作使用独立的保存点，单个失败不影响同批次的其他写操作
+                conn.execute('SAVEPOINT write_job')
+                try:
+                    result = job.run(conn)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO write_job')
+                    conn.execute('RELEASE write_job')
+                    results.append((job, None, e))
+                else:
+                    conn.execute('RELEASE write_job')
+                    results.append((job, result, None))
+            conn.execute('COMMIT')
+        except Exception as e:
+            # 提交失败：整批回滚，所有尚未失败的写操作都返回该异常
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            done = {id(job) for job, _, _ in results}
+            results = [(job, None, err or e) for job, _, err in results]
+            results += [(job, None, e) for job in batch if id(job) not in done]
+
+        finished = time.perf_counter()
+        commit_time = finished - started
+        failed = 0
+        queue_wait = 0.0
+        for job, result, error in results:
+            queue_wait += started - job.enqueued
+            if error is not None:
+                failed += 1
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+
+        with self._lock:
+            stats = self._stats
+            stats['writes'] += len(batch)
+            stats['failed'] += failed
+            stats['commits'] += 1
+            stats['batch_max'] = max(stats['batch_max'], len(batch))
+            stats['commit_time_total'] += commit_time
+            stats['commit_time_max'] = max(stats['commit_time_max'], commit_time)
+            stats['queue_wait_total'] += queue_wait
+
+    # 写线程统计：队列深度、提交次数、平均批量和提交延迟
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        commits = stats['commits']
+        writes = stats['writes']
+        stats['batch_avg'] = writes / commits if commits else 0.0
+        stats['commit_time_avg'] = stats['commit_time_total'] / commits if commits else 0.0
+        stats['queue_wait_avg'] = stats['queue_wait_total'] / writes if writes else 0.0
+        return stats
+
+    # 处理完已排队的写操作后停止写线程
+    def close(self, timeout=None):
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
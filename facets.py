@@ -0,0 +1,144 @@
+import time
+import bisect
+import threading
+import streamlit as st
+from database import db_connection
+
+# 搜索筛选栏的统计数据（分面）：在售商品按类别、新旧程度的数量和价格分布直方图。
+# 用一条聚合查询按 (类别, 新旧程度, 价格区间) 分组得到所有数据，保存在进程内存中；
+# 发布、修改、下架商品时按变化增量更新，定期（或无法增量更新时）重新查询一次。
+# 页面每次重新运行只读取已汇总好的结果，不访问数据库。
+
+# 价格区间的下边界（最后一个区间没有上限）
+PRICE_BUCKET_EDGES = (0, 10, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+# 完整重新查询的间隔（秒），用于收敛增量更新无法处理的情况（如最低/最高价格的商品下架）
+FACET_REFRESH_INTERVAL = 600.0
+
+
+def price_bucket(price):
+    return max(bisect.bisect_right(PRICE_BUCKET_EDGES, price) - 1, 0)
+
+
+# 一条聚合查询：按 (类别, 新旧程度, 价格区间) 分组统计数量和价格范围
+def load_facet_cells(conn):
+    bucket_case = ' '.join(f'WHEN price < {edge} THEN {index - 1}'
+                           for index, edge in enumerate(PRICE_BUCKET_EDGES) if index > 0)
+    rows = conn.execute(f'''
+        SELECT category, condition, CASE {bucket_case} ELSE {len(PRICE_BUCKET_EDGES) - 1} END AS bucket,
+               COUNT(*) AS count, MIN(price) AS min_price, MAX(price) AS max_price
+        FROM products WHERE status = 'active'
+        GROUP BY category, condition, bucket
+    ''').fetchall()
+    return {(row['category'], row['condition'], row['bucket']): [row['count'], row['min_price'], row['max_price']]
+            for row in rows}
+
+
+class FacetIndex:
+    def __init__(self, refresh_interval=FACET_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        # (类别, 新旧程度, 价格区间) → [数量, 最低价, 最高价]
+        self._cells = None
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        # 每次变化加一；重新查询期间有变化时，下次读取再查询一次
+        self._generation = 0
+        self._refreshes = 0
+        self._updates = 0
+
+    # 返回汇总结果：{'total', 'categories': {类别: 数量}, 'conditions': {新旧程度: 数量},
+    #               'histogram': [(区间下限, 区间上限或 None, 数量)], 'min_price', 'max_price'}
+    def snapshot(self):
+        with self._lock:
+            if self._cells is not None and time.monotonic() - self._loaded_at < self.refresh_interval:
+                if self._snapshot is None:
+                    self._snapshot = self._summarize()
+                return self._snapshot
+            generation = self._generation
+        with db_connection(readonly=True) as conn:
+            cells = load_facet_cells(conn)
+        with self._lock:
+            self._cells = cells
+            self._snapshot = self._summarize()
+            self._refreshes += 1
+            # 查询期间有变化时，结果可能不包含这些变化，下次读取重新查询
+            self._loaded_at = time.monotonic() if generation == self._generation else 0.0
+            return self._snapshot
+
+    def _summarize(self):
+        categories = {}
+        conditions = {}
+        buckets = [0] * len(PRICE_BUCKET_EDGES)
+        min_price = max_price = None
+        for (category, condition, bucket), (count, low, high) in self._cells.items():
+            if count <= 0:
+                continue
+            categories[category] = categories.get(category, 0) + count
+            conditions[condition] = conditions.get(condition, 0) + count
+            buckets[bucket] += count
+            min_price = low if min_price is None else min(min_price, low)
+            max_price = high if max_price is None else max(max_price, high)
+        edges = PRICE_BUCKET_EDGES + (None,)
+        return {
+            'total': sum(categories.values()),
+            'categories': dict(sorted(categories.items(), key=lambda item: -item[1])),
+            'conditions': dict(sorted(conditions.items(), key=lambda item: -item[1])),
+            'histogram': [(edges[i], edges[i + 1], count) for i, count in enumerate(buckets)],
+            'min_price': min_price,
+            'max_price': max_price,
+        }
+
+    # 增量更新：一个在售商品上架（delta=1）或下架（delta=-1）。
+    # 下架时不收缩价格范围（无法知道是否还有同价商品），等下次完整查询时再收敛
+    def apply(self, category, condition, price, delta):
+        with self._lock:
+            self._generation += 1
+            self._updates += 1
+            if self._cells is None:
+                return
+            cell = self._cells.get((category, condition, price_bucket(price)))
+            if cell is None:
+                if delta < 0:
+                    # 统计中没有这个商品（例如统计在它上架前已加载），重新查询
+                    self._loaded_at = 0.0
+                    return
+                cell = self._cells[(category, condition, price_bucket(price))] = [0, price, price]
+            cell[0] += delta
+            if delta > 0:
+                cell[1] = min(cell[1], price)
+                cell[2] = max(cell[2], price)
+            self._snapshot = None
+
+    # 无法增量更新时调用（如批量过期），下次读取时重新查询
+    def mark_stale(self):
+        with self._lock:
+            self._generation += 1
+            self._loaded_at = 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'loaded': self._cells is not None,
+                'age': time.monotonic() - self._loaded_at if self._cells is not None else None,
+                'refreshes': self._refreshes,
+                'updates': self._updates,
+            }
+
+
+@st.cache_resource
+def get_facet_index():
+    return FacetIndex()
+
+
+def get_facets():
+    return get_facet_index().snapshot()
+
+
+# 商品变化后调用：old/new 为变化前后的 (类别, 新旧程度, 价格, 状态)，新发布时 old 为 None
+def record_listing_change(old, new):
+    index = get_facet_index()
+    if old is not None and old[3] == 'active':
+        index.apply(old[0], old[1], old[2], -1)
+    if new is not None and new[3] == 'active':
+        index.apply(new[0], new[1], new[2], 1)
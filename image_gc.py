@@ -0,0 +1,238 @@
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+from database import DB_PATH, open_connection
+from migrations import ensure_schema
+from image_store import IMAGE_DIR, VARIANTS
+
+# 孤儿图片清理：把 images/ 下的文件与 products.image_path 对比，
+# 没有任何商品引用、且超过保留期的文件移到隔离目录（或直接删除）。
+# 缩略图等尺寸文件跟随原图判断；刚上传还未写入商品记录的文件在保留期内不会被处理。
+#
+# 每次运行最多检查 --batch 个文件，进度保存在状态文件中，下次从上次停下的位置继续，
+# 扫描到末尾后从头开始，因此可以由定时任务频繁地小批量执行。
+#
+# 用法：
+#   python image_gc.py run --dry-run         # 只输出报告，不修改任何文件
+#   python image_gc.py run [--batch 1000] [--grace-hours 24] [--delete]
+#   python image_gc.py purge [--grace-hours 168]   # 删除隔离目录中超过保留期的文件
+
+QUARANTINE_DIR = '.quarantine'
+STATE_FILE = '.gc_state.json'
+
+DEFAULT_BATCH = 1000
+DEFAULT_GRACE_HOURS = 24
+DEFAULT_PURGE_HOURS = 24 * 7
+
+# 每条 IN (...) 查询最多包含的路径数量
+LOOKUP_CHUNK = 500
+
+# 报告中最多列出的文件数
+REPORT_SAMPLES = 20
+
+_VARIANT_SUFFIXES = tuple(f'_{variant}' for variant, _ in VARIANTS)
+
+
+# 读取/保存扫描进度（上次处理到的相对路径）
+def load_state(root):
+    try:
+        with open(os.path.join(root, STATE_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(root, state):
+    path = os.path.join(root, STATE_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+# 按路径排序逐个列出文件（相对路径，使用 / 分隔），跳过隔离目录、状态文件和不晚于 cursor 的文件
+def iter_files(root, cursor=''):
+    def walk(directory, prefix):
+        try:
+            # 目录名按 "名称/" 排序，使遍历顺序与完整相对路径的字符串顺序一致
+            entries = sorted(os.scandir(directory),
+                             key=lambda entry: entry.name + '/' if entry.is_dir() else entry.name)
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            rel = prefix + entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if rel == QUARANTINE_DIR:
+                    continue
+                # 整个目录都不晚于 cursor 时跳过，不必逐个列出
+                if cursor and not cursor.startswith(rel + '/') and rel + '/' < cursor:
+                    continue
+                yield from walk(entry.path, rel + '/')
+            elif entry.is_file(follow_symlinks=False):
+                if rel in (STATE_FILE, STATE_FILE + '.tmp') or rel <= cursor:
+                    continue
+                yield rel, entry.stat(follow_symlinks=False)
+
+    yield from walk(root, '')
+
+
+# 文件对应的原图相对路径：尺寸文件（xxx_thumb.jpg）对应 xxx.jpg，其他文件就是原图本身
+def original_of(rel, root):
+    base, ext = os.path.splitext(rel)
+    for suffix in _VARIANT_SUFFIXES:
+        if base.endswith(suffix):
+            original = base[:-len(suffix)] + ext
+            if os.path.exists(os.path.join(root, original)):
+                return original
+    return rel
+
+
+# 查询这批原图中哪些仍被商品引用（数据库中保存的是 images/... 形式的路径）
+def referenced_paths(conn, originals):
+    keys = sorted({f'{IMAGE_DIR}/{rel}' for rel in originals})
+    referenced = set()
+    for start in range(0, len(keys), LOOKUP_CHUNK):
+        chunk = keys[start:start + LOOKUP_CHUNK]
+        placeholders = ', '.join('?' * len(chunk))
+        for row in conn.execute(
+                f'SELECT DISTINCT image_path FROM products WHERE image_path IN ({placeholders})', chunk):
+            referenced.add(row[0][len(IMAGE_DIR) + 1:])
+    return referenced
+
+
+# 处理一批文件，返回报告；dry_run 时不移动/删除文件，也不更新进度
+def collect_batch(conn, root, batch=DEFAULT_BATCH, grace_hours=DEFAULT_GRACE_HOURS,
+                  delete=False, dry_run=False):
+    state = load_state(root)
+    cursor = state.get('cursor', '')
+    cutoff = time.time() - grace_hours * 3600
+
+    files = []
+    for item in iter_files(root, cursor):
+        files.append(item)
+        if len(files) >= batch:
+            break
+
+    originals = {rel: original_of(rel, root) for rel, _ in files}
+    referenced = referenced_paths(conn, set(originals.values()))
+
+    report = {
+        'cursor': cursor,
+        'scanned': len(files),
+        'referenced': 0,
+        'in_grace_period': 0,
+        'orphans': 0,
+        'orphan_bytes': 0,
+        'action': 'none' if dry_run else ('deleted' if delete else 'quarantined'),
+        'samples': [],
+    }
+    for rel, stat in files:
+        if originals[rel] in referenced:
+            report['referenced'] += 1
+            continue
+        if stat.st_mtime > cutoff:
+            report['in_grace_period'] += 1
+            continue
+        report['orphans'] += 1
+        report['orphan_bytes'] += stat.st_size
+        if len(report['samples']) < REPORT_SAMPLES:
+            report['samples'].append(rel)
+        if dry_run:
+            continue
+        path = os.path.join(root, rel)
+        if delete:
+            os.remove(path)
+        else:
+            target = os.path.join(root, QUARANTINE_DIR, rel)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(path, target)
+            # 记录隔离时间，purge 按隔离时间而不是原文件时间判断
+            os.utime(target)
+
+    # 不满一批说明已扫描到末尾，下次从头开始
+    finished = len(files) < batch
+    report['next_cursor'] = '' if finished else files[-1][0]
+    report['wrapped'] = finished
+    if not dry_run:
+        save_state(root, {'cursor': report['next_cursor'], 'last_run': int(time.time())})
+    return report
+
+
+# 删除隔离目录中超过保留期的文件，返回 (文件数, 字节数)
+def purge_quarantine(root, grace_hours=DEFAULT_PURGE_HOURS, dry_run=False):
+    quarantine = os.path.join(root, QUARANTINE_DIR)
+    cutoff = time.time() - grace_hours * 3600
+    count = size = 0
+    for directory, _, names in os.walk(quarantine, topdown=False):
+        for name in names:
+            path = os.path.join(directory, name)
+            stat = os.stat(path)
+            if stat.st_mtime > cutoff:
+                continue
+            count += 1
+            size += stat.st_size
+            if not dry_run:
+                os.remove(path)
+        if not dry_run and directory != quarantine and not os.listdir(directory):
+            os.rmdir(directory)
+    return count, size
+
+
+def print_report(report, dry_run):
+    title = '孤儿图片清理报告（试运行，未修改任何文件）' if dry_run else '孤儿图片清理报告'
+    print(title)
+    print(f"  起始位置: {report['cursor'] or '(开头)'}")
+    print(f"  检查文件: {report['scanned']}")
+    print(f"  仍被引用: {report['referenced']}")
+    print(f"  保留期内: {report['in_grace_period']}")
+    print(f"  孤儿文件: {report['orphans']} 个，{report['orphan_bytes'] / 1024 / 1024:.2f} MB"
+          f"（{report['action']}）")
+    for rel in report['samples']:
+        print(f"    {rel}")
+    if report['orphans'] > len(report['samples']):
+        print(f"    ... 另有 {report['orphans'] - len(report['samples'])} 个")
+    if report['wrapped']:
+        print("  已扫描到末尾，下次从头开始")
+    else:
+        print(f"  下次从 {report['next_cursor']} 之后继续")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='孤儿图片清理工具')
+    parser.add_argument('--db', default=DB_PATH, help='数据库文件路径')
+    parser.add_argument('--root', default=IMAGE_DIR, help='图片目录')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='检查一批文件并隔离/删除孤儿图片')
+    run_parser.add_argument('--batch', type=int, default=DEFAULT_BATCH, help='本次最多检查的文件数')
+    run_parser.add_argument('--grace-hours', type=float, default=DEFAULT_GRACE_HOURS,
+                            help='最近修改过的文件在保留期内不处理')
+    run_parser.add_argument('--delete', action='store_true', help='直接删除而不是移到隔离目录')
+    run_parser.add_argument('--dry-run', action='store_true', help='只输出报告')
+    purge_parser = subparsers.add_parser('purge', help='删除隔离目录中超过保留期的文件')
+    purge_parser.add_argument('--grace-hours', type=float, default=DEFAULT_PURGE_HOURS,
+                              help='隔离超过该时长的文件才删除')
+    purge_parser.add_argument('--dry-run', action='store_true', help='只输出报告')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        ensure_schema(args.db)
+        # 命令行工具使用普通连接，不计入页面的SQL统计
+        conn = open_connection(args.db, factory=sqlite3.Connection, readonly=True)
+        try:
+            report = collect_batch(conn, args.root, batch=args.batch, grace_hours=args.grace_hours,
+                                   delete=args.delete, dry_run=args.dry_run)
+        finally:
+            conn.close()
+        print_report(report, args.dry_run)
+    elif args.command == 'purge':
+        count, size = purge_quarantine(args.root, grace_hours=args.grace_hours, dry_run=args.dry_run)
+        verb = '可删除' if args.dry_run else '已删除'
+        print(f"{verb}隔离文件 {count} 个，{size / 1024 / 1024:.2f} MB")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from PIL import Image, ImageOps
+
+# 图片存储：上传内容按 SHA-256 哈希保存（images/ab/abcdef....jpg），相同图片只保存一份；
+# 缩略图和展示图在后台线程池中生成，页面按显示宽度选择最小的合适尺寸
+
+IMAGE_DIR = 'images'
+
+# 图片尺寸：名称 → 最长边像素，按从小到大排列
+VARIANTS = (
+    ('thumb', 240),
+    ('display', 960),
+)
+
+ALLOWED_EXTENSIONS = {'.jpg': '.jpg', '.jpeg': '.jpg', '.png': '.png'}
+
+# 后台生成图片的线程数，以及批量发布时并行保存上传图片的线程数
+VARIANT_WORKERS = 2
+UPLOAD_WORKERS = 4
+
+# 正在生成中的原图，避免重复提交
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+@st.cache_resource
+def get_image_executor():
+    return ThreadPoolExecutor(max_workers=VARIANT_WORKERS, thread_name_prefix='image-variants')
+
+
+@st.cache_resource
+def get_upload_executor():
+    return ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix='image-uploads')
+
+
+# 根据内容哈希得到存储路径，扩展名统一为小写（.jpeg 归为 .jpg）
+def content_path(data, filename):
+    ext = ALLOWED_EXTENSIONS.get(os.path.splitext(filename)[1].lower(), '.jpg')
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{IMAGE_DIR}/{digest[:2]}/{digest}{ext}"
+
+
+# 原图对应的某个尺寸的文件路径，例如 images/ab/abcd.jpg → images/ab/abcd_thumb.jpg
+def variant_path(image_path, variant):
+    base, ext = os.path.splitext(image_path)
+    return f"{base}_{variant}{ext}"
+
+
+# 原子写入：先写临时文件再重命名，读取方不会看到写了一半的文件
+def _write_atomic(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+# 保存上传的图片，返回存储路径；已存在相同内容时不再写入，只确保各尺寸已生成
+def save_upload(data, filename):
+    data = bytes(data)
+    path = content_path(data, filename)
+    if os.path.exists(path):
+        # 更新修改时间，后台清理任务不会删除刚被重新上传的图片
+        os.utime(path)
+    else:
+        _write_atomic(path, data)
+    schedule_variants(path)
+    return path
+
+
+# 并行保存多张上传的图片：uploads 为 {键: (数据, 文件名)}，返回 {键: 存储路径或保存时的异常}
+def save_uploads(uploads):
+    executor = get_upload_executor()
+    futures = {key: executor.submit(save_upload, data, filename) for key, (data, filename) in uploads.items()}
+    results = {}
+    for key, future in futures.items():
+        try:
+            results[key] = future.result()
+        except Exception as e:
+            results[key] = e
+    return results
+
+
+# 删除原图及其各尺寸文件；原图在 min_age 秒内被修改过（重新上传）时不删除，返回是否已删除
+def delete_image(image_path, min_age=0.0):
+    try:
+        if os.path.getmtime(image_path) > time.time() - min_age:
+            return False
+    except OSError:
+        return False
+    for path in [variant_path(image_path, variant) for variant, _ in VARIANTS] + [image_path]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    return True
+
+
+# 生成缩略图和展示图（在后台线程中执行），已存在的尺寸会跳过
+def generate_variants(image_path):
+    with Image.open(image_path) as image:
+        image = ImageOps.exif_transpose(image)
+        fmt = 'PNG' if image_path.lower().endswith('.png') else 'JPEG'
+        if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        for variant, size in VARIANTS:
+            target = variant_path(image_path, variant)
+            if os.path.exists(target):
+                continue
+            resized = image.copy()
+            # thumbnail() 保持比例且只缩小不放大
+            resized.thumbnail((size, size), Image.LANCZOS)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target) or '.', suffix='.tmp')
+            os.close(fd)
+            try:
+                resized.save(tmp_path, fmt, quality=85, optimize=True)
+                os.replace(tmp_path, target)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+
+
+def _generate_in_background(image_path):
+    try:
+        generate_variants(image_path)
+    except Exception as e:
+        print(f"生成图片尺寸失败 {image_path}: {e}")
+    finally:
+        with _pending_lock:
+            _pending.discard(image_path)
+
+
+# 提交后台生成任务；同一张图片正在生成时不重复提交
+def schedule_variants(image_path):
+    if all(os.path.exists(variant_path(image_path, variant)) for variant, _ in VARIANTS):
+        return None
+    with _pending_lock:
+        if image_path in _pending:
+            return None
+        _pending.add(image_path)
+    return get_image_executor().submit(_generate_in_background, image_path)
+
+
+# 按显示宽度选择最小的合适尺寸；尺寸尚未生成时返回原图并提交后台生成（兼容旧图片）
+def image_for_width(image_path, width):
+    if not image_path or not os.path.exists(image_path):
+        return None
+    missing = False
+    for variant, size in VARIANTS:
+        if size < width:
+            continue
+        path = variant_path(image_path, variant)
+        if os.path.exists(path):
+            return path
+        missing = True
+        break
+    if missing:
+        schedule_variants(image_path)
+    return image_path
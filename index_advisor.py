@@ -0,0 +1,484 @@
+import os
+import re
+import sys
+import random
+import sqlite3
+import argparse
+import tempfile
+import time
+from text_search import rebuild_product_fts
+
+# 索引诊断工具：在按真实规模生成的临时数据库上运行应用的各个查询函数，
+# 收集它们发出的所有SQL语句，逐条执行 EXPLAIN QUERY PLAN，
+# 标记全表扫描和临时B树排序，并尝试给出能消除这些问题的索引建议。
+#
+# 用法：
+#   python index_advisor.py report [--products 20000]
+#   python index_advisor.py emit               # 输出可加入 migrations.py 的迁移代码
+#   python index_advisor.py apply --db PATH    # 把建议的索引作为新的迁移写入 migrations.py，
+#                                              # 再用 apply_migrations 迁移指定数据库
+
+# 只分析这些类型的语句
+_ANALYZED_PREFIXES = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+# 已知且接受的问题：(调用函数, 匹配语句的正则, 原因)。没有索引建议时报告为“已知”而不是“问题”
+ACCEPTED_ISSUES = [
+    ('load_facet_cells', r'GROUP BY category, condition, bucket',
+     '价格区间是 CASE 表达式，无法用索引分组；只在分面统计刷新时执行'),
+    ('search_products', r'products_fts MATCH',
+     '全文检索的结果由 FTS5 给出，无法使用 products 上的索引排序；排序的行数限于匹配关键词的商品'),
+    ('search_products', r"category = \? AND price >= \? AND price <= \?.*ORDER BY created_at_ms",
+     '类别和价格范围用 idx_products_active_category_price 缩小范围后再排序；'
+     '改用 (category, created_at_ms) 索引时价格范围越窄需要跳过的行越多'),
+    ('count_search_results', r"FROM products WHERE status = 'active' LIMIT",
+     '不带条件的计数最多读取 COUNT_LIMIT 行后结束'),
+    ('_load_description', r"ORDER BY lang = 'zh'",
+     '最多两行（所选语言和中文）的排序'),
+    ('get_conversations', r'GROUP BY other_user_id',
+     '对方用户ID按当前用户计算，无法用索引分组；分组的只是该用户收发的消息'),
+    ('get_message_history', r'm\.product_id = \?',
+     '商品条件在同一对用户的消息范围内逐行过滤'),
+]
+
+# 模拟数据使用的类别和新旧程度（与数据库中的存储值一致）
+_CATEGORIES = ['electronics', 'household', 'clothing', 'books', 'sports', 'other']
+_CONDITIONS = ['new', 'like_new', 'minor_wear', 'normal', 'heavy_wear']
+
+
+# 生成模拟数据：用户数约为商品数的十分之一，消息数为商品数的五倍
+def seed_database(db_path, products=20000, seed=42):
+    rng = random.Random(seed)
+    users = max(products // 10, 10)
+    messages = products * 5
+    now = int(time.time() * 1000)
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        'INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+        ((f'user{i}', f'user{i}@example.com', 'x') for i in range(users))
+    )
+
+    def random_time():
+        return now - rng.randint(0, 365 * 24 * 3600 * 1000)
+
+    conn.executemany(
+        '''INSERT INTO products
+           (user_id, title, price, category, condition, contact_info, created_at_ms)
+           VALUES (?, ?, ?, ?, ?, ?, ?)''',
+        ((rng.randint(1, users), f'商品 {i}', round(rng.uniform(1, 5000), 2),
+          rng.choice(_CATEGORIES), rng.choice(_CONDITIONS), '13800000000', random_time())
+         for i in range(products))
+    )
+    conn.executemany(
+        'INSERT INTO product_descriptions (product_id, lang, text) VALUES (?, ?, ?)',
+        ((i + 1, 'zh', f'描述 {i}') for i in range(products))
+    )
+    rebuild_product_fts(conn)
+    conn.executemany(
+        '''INSERT INTO messages (sender_id, receiver_id, product_id, content, is_read, created_at_ms)
+           VALUES (?, ?, ?, ?, ?, ?)''',
+        ((rng.randint(1, users), rng.randint(1, users), rng.randint(1, products),
+          f'消息 {i}', rng.random() < 0.8, random_time())
+         for i in range(messages))
+    )
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+
+
+# 调用应用中的查询函数，收集它们发出的所有SQL语句
+def collect_statements():
+    # 这些模块会读取 MARKET_DB_PATH，必须在设置环境变量之后导入
+    from sql_profiler import capture_statements
+    from products import get_user_products, get_product_details, load_descriptions
+    from search import search_products, count_search_results, get_all_categories
+    from messages import (get_conversations, get_message_history, get_unread_message_count,
+                          get_user_info, send_message, delete_message)
+    from auth import login_user
+    from language import t
+    from database import get_writer
+
+    with capture_statements() as captured:
+        login_user('user1', 'x')
+        get_all_categories()
+        for sort_by in (t("search.sort_newest"), t("search.sort_price_low"), t("search.sort_price_high")):
+            _, cursor = search_products(sort_by=sort_by, limit=30)
+            search_products(sort_by=sort_by, cursor=cursor, limit=30)
+            _, cursor = search_products(category='books', min_price=0.0, max_price=5000.0,
+                                        sort_by=sort_by, limit=30)
+            search_products(category='books', min_price=0.0, max_price=5000.0,
+                            sort_by=sort_by, cursor=cursor, limit=30)
+            search_products(keyword='商品 1', category='books',
+                            min_price=0.0, max_price=5000.0, sort_by=sort_by, limit=30)
+        _, cursor = search_products(keyword='商品', sort_by=t("search.sort_relevance"), limit=30)
+        search_products(keyword='商品', sort_by=t("search.sort_relevance"), cursor=cursor, limit=30)
+        count_search_results()
+        count_search_results(category='books')
+        load_descriptions(get_user_products(1))
+        get_user_products(1, limit=21, cursor=(int(time.time() * 1000), 0))
+        get_product_details(1)['description']
+        get_conversations(1)
+        get_message_history(1, 2)
+        get_message_history(1, 2, product_id=1)
+        get_unread_message_count(1)
+        get_user_info(1)
+        send_message(1, 2, 'advisor')
+        delete_message(-1, 1)
+        # 等待后台写线程处理完排队的写操作
+        get_writer().run(lambda conn: None)
+
+    return {sql: info for sql, info in captured.items()
+            if sql.lstrip().upper().startswith(_ANALYZED_PREFIXES)}
+
+
+def _bind_params(sql, params):
+    if params is None:
+        return [None] * sql.count('?')
+    return params
+
+
+def explain(conn, sql, params):
+    rows = conn.execute('EXPLAIN QUERY PLAN ' + sql, _bind_params(sql, params)).fetchall()
+    return [row[3] for row in rows]
+
+
+def _table_columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})').fetchall()]
+
+
+# INTEGER PRIMARY KEY 字段是 rowid 的别名，每个索引都隐含它，不需要放进索引字段
+def _rowid_alias(conn, table):
+    keys = [row for row in conn.execute(f'PRAGMA table_info({table})').fetchall() if row[5]]
+    if len(keys) == 1 and keys[0][2].upper() == 'INTEGER':
+        return keys[0][1]
+    return None
+
+
+# 解析SQL：表别名、每个表的等值条件字段和排序字段
+def parse_statement(conn, sql):
+    flat = ' '.join(sql.split())
+    aliases = {}
+    for table, alias in re.findall(r'(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', flat, re.I):
+        if alias.upper() in ('WHERE', 'JOIN', 'ON', 'ORDER', 'GROUP', 'LIMIT', ''):
+            alias = table
+        aliases[alias] = table
+        aliases[table] = table
+    update = re.match(r'(?:UPDATE|DELETE FROM)\s+(\w+)', flat, re.I)
+    if update:
+        aliases[update.group(1)] = update.group(1)
+
+    tables = set(aliases.values())
+    # rowid 别名不作为索引字段（按它等值查询走主键，排序时索引已隐含它）
+    columns = {table: [col for col in _table_columns(conn, table) if col != _rowid_alias(conn, table)]
+               for table in tables}
+
+    def owner(qualifier, column):
+        if qualifier:
+            table = aliases.get(qualifier)
+            return table if table and column in columns[table] else None
+        owners = [table for table in tables if column in columns[table]]
+        return owners[0] if len(owners) == 1 else None
+
+    # 等值条件：字段 = ? 或字段 = 数字常量
+    where = re.split(r'\bORDER BY\b|\bGROUP BY\b|\bLIMIT\b', flat, flags=re.I)[0]
+    equality = {table: [] for table in tables}
+    for qualifier, column in re.findall(r'(?:(\w+)\.)?(\w+)\s*=\s*(?:\?|\d+\b)', where):
+        table = owner(qualifier, column)
+        if table and column not in equality[table]:
+            equality[table].append(column)
+
+    ordering = {table: [] for table in tables}
+    order = re.search(r'ORDER BY (.+?)(?:\bLIMIT\b|$)', flat, re.I)
+    if order:
+        for term in order.group(1).split(','):
+            match = re.match(r'\s*(?:(\w+)\.)?(\w+)', term)
+            if match:
+                table = owner(match.group(1), match.group(2))
+                if table and match.group(2) not in ordering[table]:
+                    ordering[table].append(match.group(2))
+    return aliases, equality, ordering
+
+
+# 找出查询计划中的问题：没有使用索引的全表扫描、临时B树排序/分组，
+# 以及索引只覆盖了部分等值条件、剩余条件需要回表逐行过滤的情况
+def plan_issues(plan, aliases=None, equality=None):
+    issues = []
+    for detail in plan:
+        if re.match(r'SCAN \w+( AS \w+)?$', detail):
+            issues.append(detail)
+        elif detail.startswith('USE TEMP B-TREE'):
+            issues.append(detail)
+        elif equality:
+            match = re.match(r'SEARCH (\w+) USING INDEX \w+ \((.*)\)', detail)
+            if match:
+                table = aliases.get(match.group(1), match.group(1))
+                constrained = set(re.findall(r'(\w+)[=<>]', match.group(2)))
+                if any(col not in constrained for col in equality.get(table, [])):
+                    issues.append(detail)
+    return issues
+
+
+# 根据SQL中的等值条件和排序字段，为每个表生成候选索引 (表名, 字段元组, 部分索引条件)。
+# predicates 为 {表名: [语句中出现的部分索引条件]}，这些条件的部分索引优先尝试，最后尝试完整索引
+def candidate_indexes(equality, ordering, predicates=None):
+    candidates = []
+    for table in sorted(equality):
+        eq, ob = equality[table], [c for c in ordering[table] if c not in equality[table]]
+        for where in list((predicates or {}).get(table, [])) + [None]:
+            for cols in (eq + ob, eq, ob):
+                if cols and (table, tuple(cols), where) not in candidates:
+                    candidates.append((table, tuple(cols), where))
+    return candidates
+
+
+def _index_name(table, cols, where=None):
+    if where is None:
+        return f"idx_{table}_{'_'.join(cols)}"
+    # 部分索引按条件命名：status = 'active' → idx_products_active_...
+    match = re.fullmatch(r"\w+\s*=\s*'(\w+)'", where)
+    return f"idx_{table}_{match.group(1) if match else 'partial'}_{'_'.join(cols)}"
+
+
+def _index_sql(name, table, cols, where=None):
+    sql = f"CREATE INDEX IF NOT EXISTS {name} ON {table}({', '.join(cols)})"
+    return f"{sql} WHERE {where}" if where else sql
+
+
+# 现有索引：{(表名, 字段元组, 部分索引条件或 None): 索引名}
+def _existing_index_columns(conn):
+    existing = {}
+    for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+        for row in conn.execute(f'PRAGMA index_list({table})').fetchall():
+            name, partial = row[1], row[4]
+            cols = tuple(info[2] for info in conn.execute(f'PRAGMA index_info({name})').fetchall())
+            where = None
+            if partial:
+                sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?",
+                                   (name,)).fetchone()[0]
+                where = ' '.join(re.split(r'\bWHERE\b', sql, maxsplit=1, flags=re.I)[1].split())
+            existing[(table, cols, where)] = name
+    return existing
+
+
+# 语句中出现的、现有部分索引的条件（按表），只有包含该条件的查询才能使用对应的部分索引
+def _statement_predicates(sql, existing, tables):
+    flat = ' '.join(sql.split())
+    predicates = {}
+    for table, _, where in existing:
+        if where is not None and table in tables and where in flat:
+            predicates.setdefault(table, [])
+            if where not in predicates[table]:
+                predicates[table].append(where)
+    return predicates
+
+
+# 索引 a 是否被索引 b 覆盖：同一个表、部分索引条件相同，且 a 的字段是 b 的字段的前缀
+def _covered_by(a, b):
+    return a[0] == b[0] and a[2] == b[2] and len(b[1]) > len(a[1]) and b[1][:len(a[1])] == a[1]
+
+
+# 语句能使用的现有索引是否已包含这些字段（字段相同或为其前缀）：完整索引，或条件出现在语句中的部分索引
+def _already_indexed(existing, predicates, table, cols):
+    usable = [None] + predicates.get(table, [])
+    return any(t == table and where in usable and c[:len(cols)] == cols for t, c, where in existing)
+
+
+# 现有索引中被某个建议索引覆盖的索引可以删除（建议索引同样能满足它的查询）；
+# 部分索引只和条件相同的建议索引比较
+def redundant_indexes(conn, recommended):
+    redundant = []
+    for key, name in _existing_index_columns(conn).items():
+        if name.startswith('sqlite_autoindex'):
+            continue
+        if any(_covered_by(key, other) for other in recommended):
+            redundant.append(name)
+    return sorted(redundant)
+
+
+# 语句的问题是否已知且接受，返回原因或 None
+def accepted_reason(caller, sql):
+    for accepted_caller, pattern, reason in ACCEPTED_ISSUES:
+        if caller == accepted_caller and re.search(pattern, sql):
+            return reason
+    return None
+
+
+# 对每条有问题的语句尝试候选索引，保留能减少问题数量的最佳候选
+def recommend(conn, statements):
+    existing = _existing_index_columns(conn)
+    report = []
+    recommended = {}
+    for sql, (caller, params) in statements.items():
+        aliases, equality, ordering = parse_statement(conn, sql)
+        plan = explain(conn, sql, params)
+        issues = plan_issues(plan, aliases, equality)
+        predicates = _statement_predicates(sql, existing, set(aliases.values()))
+        best = None
+        if issues:
+            for table, cols, where in candidate_indexes(equality, ordering, predicates):
+                # 已有字段相同（或更长）的可用索引时不再建议，避免只因查询规划器的选择而重复建索引
+                if _already_indexed(existing, predicates, table, cols):
+                    continue
+                name = _index_name(table, cols, where)
+                conn.execute(_index_sql(name, table, cols, where))
+                try:
+                    remaining = plan_issues(explain(conn, sql, params), aliases, equality)
+                finally:
+                    conn.execute(f'DROP INDEX {name}')
+                if len(remaining) < len(issues) and (best is None or len(remaining) < len(best[3])):
+                    best = (table, cols, where, remaining)
+        if best:
+            recommended[best[:3]] = _index_name(*best[:3])
+        flat = ' '.join(sql.split())
+        accepted = accepted_reason(caller, flat) if issues and not best else None
+        report.append({'caller': caller, 'sql': flat, 'plan': plan,
+                       'issues': issues, 'fix': best, 'accepted': accepted})
+
+    # 去掉被其他建议索引覆盖的索引
+    for key in list(recommended):
+        if any(_covered_by(key, other) for other in recommended):
+            del recommended[key]
+    return report, recommended
+
+
+def _scratch_database(products):
+    from migrations import apply_migrations
+
+    path = os.path.join(tempfile.mkdtemp(prefix='index_advisor_'), 'advisor.db')
+    apply_migrations(path)
+    seed_database(path, products=products)
+    return path
+
+
+def analyze(products):
+    path = _scratch_database(products)
+    os.environ['MARKET_DB_PATH'] = path
+    statements = collect_statements()
+    conn = sqlite3.connect(path)
+    try:
+        report, recommended = recommend(conn, statements)
+        return report, recommended, redundant_indexes(conn, recommended)
+    finally:
+        conn.close()
+
+
+def print_report(report, recommended, redundant):
+    unresolved = 0
+    for entry in report:
+        if not entry['issues']:
+            status = '正常'
+        elif entry['accepted']:
+            status = '已知'
+        else:
+            status = '问题'
+            unresolved += not entry['fix']
+        print(f"[{status}] {entry['caller']}: {entry['sql']}")
+        for detail in entry['plan']:
+            marker = '  !! ' if detail in entry['issues'] else '     '
+            print(f"{marker}{detail}")
+        if entry['fix']:
+            table, cols, where, remaining = entry['fix']
+            partial = f" WHERE {where}" if where else ''
+            print(f"  -> 建议索引 {table}({', '.join(cols)}){partial}，剩余问题 {len(remaining)} 个")
+        if entry['accepted']:
+            print(f"  -> 已接受：{entry['accepted']}")
+        print()
+
+    if recommended:
+        print("建议创建的索引：")
+        for statement in index_statements(recommended):
+            print(f"  {statement}")
+        for name in redundant:
+            print(f"  DROP INDEX IF EXISTS {name}  -- 已被上面的索引覆盖")
+    else:
+        print("没有新的索引建议")
+    if unresolved:
+        print(f"另有 {unresolved} 条语句的问题既没有索引建议，也不在 ACCEPTED_ISSUES 中")
+
+
+def index_statements(recommended, redundant=()):
+    statements = [_index_sql(name, table, cols, where)
+                  for (table, cols, where), name in sorted(recommended.items(), key=lambda item: item[1])]
+    statements += [f"DROP INDEX IF EXISTS {name}" for name in redundant]
+    return statements
+
+
+# 迁移代码：(迁移函数的源码, MIGRATIONS 中的一项)
+def migration_code(version, statements):
+    lines = [f"# 版本{version}：索引诊断工具建议的索引",
+             f"def _migration_{version:03d}_advisor_indexes(conn):"]
+    if not statements:
+        lines.append("    pass")
+    for statement in statements:
+        # 部分索引条件中含单引号时用双引号
+        quote = '"' if "'" in statement else "'"
+        lines.append(f"    conn.execute({quote}{statement}{quote})")
+    entry = f"({version}, '索引诊断工具建议的索引', _migration_{version:03d}_advisor_indexes),"
+    return '\n'.join(lines) + '\n', entry
+
+
+def emit_migration(recommended, redundant):
+    from migrations import LATEST_VERSION
+
+    code, entry = migration_code(LATEST_VERSION + 1, index_statements(recommended, redundant))
+    return f"{code}\n# 在 MIGRATIONS 中追加：{entry}"
+
+
+# 把建议的索引作为新的迁移步骤写入 migrations.py（函数放在 MIGRATIONS 之前，并在列表末尾追加一项），
+# 返回新的版本号
+def append_migration(statements, path=None):
+    import migrations
+
+    path = path or migrations.__file__
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    version = migrations.LATEST_VERSION + 1
+    code, entry = migration_code(version, statements)
+    start = source.index('\nMIGRATIONS = [\n')
+    end = source.index('\n]\n', start)
+    # 新函数接在最后一个迁移函数之后（MIGRATIONS 前的注释之前）
+    insert_at = source.rindex('\n\n\n', 0, start)
+    source = (source[:insert_at] + '\n\n\n' + code.rstrip('\n') + source[insert_at:end]
+              + f'\n    {entry}' + source[end:])
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(source)
+    return version
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='SQL索引诊断工具')
+    parser.add_argument('--products', type=int, default=20000, help='模拟数据的商品数量')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('report', help='输出每条语句的查询计划和索引建议')
+    subparsers.add_parser('emit', help='输出包含建议索引的迁移代码')
+    apply_parser = subparsers.add_parser('apply', help='在指定数据库上创建建议的索引')
+    apply_parser.add_argument('--db', required=True, help='目标数据库文件路径')
+    args = parser.parse_args(argv)
+
+    target = os.path.abspath(args.db) if args.command == 'apply' else None
+    report, recommended, redundant = analyze(args.products)
+
+    if args.command == 'report':
+        print_report(report, recommended, redundant)
+    elif args.command == 'emit':
+        print(emit_migration(recommended, redundant))
+    elif args.command == 'apply':
+        import importlib
+        import migrations
+
+        statements = index_statements(recommended, redundant)
+        if not statements:
+            print("没有新的索引建议")
+            return 0
+        version = append_migration(statements)
+        print(f"已在 migrations.py 中加入版本{version}：")
+        for statement in statements:
+            print(f"  {statement}")
+        # 重新加载 migrations 以包含新加入的迁移，再按版本号迁移目标数据库
+        importlib.reload(migrations)
+        applied = migrations.apply_migrations(target)
+        print(f"已迁移 {target}：{applied or '没有待执行的迁移'}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -74,11 +74,15 @@ TRANSLATIONS = {
             "sort_newest": "最新上架",
             "sort_price_low": "价格从低到高",
             "sort_price_high": "价格从高到低",
+            "sort_relevance": "相关度最高",
             "all": "全部",
             "price_range": "价格范围",
             "price_low": "最低价格",
             "price_high": "最高价格",
             "no_results": "没有找到符合条件的商品",
+            "load_more": "加载更多",
+            "showing": "已显示 {} 个",
+            "suggestions": "猜你想搜",
             "view_details": "查看详情",
             "results_found": "找到",
             "products": "个商品",
@@ -116,7 +120,34 @@ TRANSLATIONS = {
             "upload_image": "上传图片",
             "submit": "发布商品",
             "fill_required": "请填写所有必填项",
+            "publish_mode": "发布方式",
+            "single_publish": "单个发布",
+            "batch_publish": "批量发布",
+            "batch_hint": "每行填写一个商品，描述使用当前语言；图片请一次上传，并在“图片文件名”列填写对应的文件名",
+            "batch_image_file": "图片文件名",
+            "batch_images": "上传图片（可多选）",
+            "batch_submit": "全部发布",
+            "batch_image_missing": "未上传图片文件 {}",
+            "batch_empty": "请至少填写一个商品",
+            "batch_result": "成功发布 {} 个商品，失败 {} 个",
+            "batch_row": "第 {} 行",
+            "invalid_price": "价格必须大于0",
+            "price_not_number": "价格必须是数字",
             "no_products": "您还没有发布任何商品",
+            "page_size": "每页显示",
+            "prev_page": "上一页",
+            "next_page": "下一页",
+            "page_number": "第 {} 页",
+            "status": "状态",
+            "statuses": {
+                "active": "在售",
+                "sold": "已售出",
+                "expired": "已过期",
+                "deleted": "已删除"
+            },
+            "mark_sold": "标记为已售",
+            "relist": "重新上架",
+            "status_updated": "商品状态已更新",
             "edit": "编辑",
             "delete": "删除",
             "created_at": "发布时间",
@@ -261,11 +292,15 @@ TRANSLATIONS = {
             "sort_newest": "Newest first",
             "sort_price_low": "Price: Low to High",
             "sort_price_high": "Price: High to Low",
+            "sort_relevance": "Most relevant",
             "all": "All",
             "price_range": "Price range",
             "price_low": "Minimum price",
             "price_high": "Maximum price",
             "no_results": "No products found",
+            "load_more": "Load more",
+            "showing": "Showing {}",
+            "suggestions": "Suggestions",
             "view_details": "View details",
             "results_found": "Found",
             "products": "products",
@@ -305,7 +340,34 @@ TRANSLATIONS = {
             "upload_image": "Upload Image",
             "submit": "Publish Product",
             "fill_required": "Please fill in all required fields",
+            "publish_mode": "Publish mode",
+            "single_publish": "Single listing",
+            "batch_publish": "Batch publish",
+            "batch_hint": 'Fill in one product per row, with the description in the current language; upload all images at once and enter each file name in the "Image file" column',
+            "batch_image_file": "Image file",
+            "batch_images": "Upload images (multiple allowed)",
+            "batch_submit": "Publish all",
+            "batch_image_missing": "Image file {} was not uploaded",
+            "batch_empty": "Please fill in at least one product",
+            "batch_result": "{} products published, {} failed",
+            "batch_row": "Row {}",
+            "invalid_price": "Price must be greater than 0",
+            "price_not_number": "Price must be a number",
             "no_products": "You haven't published any products yet",
+            "page_size": "Per page",
+            "prev_page": "Previous",
+            "next_page": "Next",
+            "page_number": "Page {}",
+            "status": "Status",
+            "statuses": {
+                "active": "Active",
+                "sold": "Sold",
+                "expired": "Expired",
+                "deleted": "Deleted"
+            },
+            "mark_sold": "Mark as sold",
+            "relist": "Relist",
+            "status_updated": "Product status updated",
             "edit": "Edit",
             "delete": "Delete",
             "created_at": "Created At",
@@ -450,11 +512,15 @@ TRANSLATIONS = {
             "sort_newest": "新しい順",
             "sort_price_low": "価格: 安い順",
             "sort_price_high": "価格: 高い順",
+            "sort_relevance": "関連度順",
             "all": "すべて",
             "price_range": "価格範囲",
             "price_low": "最低価格",
             "price_high": "最高価格",
             "no_results": "該当する商品がありません",
+            "load_more": "もっと見る",
+            "showing": "{} 件を表示中",
+            "suggestions": "検索候補",
             "view_details": "詳細を見る",
             "results_found": "見つかりました",
             "products": "件の商品",
@@ -491,7 +557,34 @@ TRANSLATIONS = {
             "upload_image": "画像をアップロード",
             "submit": "商品を発表",
             "fill_required": "すべての必須フィールドに入力してください",
+            "publish_mode": "出品方法",
+            "single_publish": "個別出品",
+            "batch_publish": "一括出品",
+            "batch_hint": "1行に1つの商品を入力し、説明は現在の言語で記入してください。画像はまとめてアップロードし、「画像ファイル名」列に対応するファイル名を入力してください",
+            "batch_image_file": "画像ファイル名",
+            "batch_images": "画像をアップロード（複数可）",
+            "batch_submit": "すべて出品",
+            "batch_image_missing": "画像ファイル {} がアップロードされていません",
+            "batch_empty": "少なくとも1つの商品を入力してください",
+            "batch_result": "{} 件の商品を出品しました、{} 件失敗",
+            "batch_row": "{} 行目",
+            "invalid_price": "価格は0より大きくする必要があります",
+            "price_not_number": "価格は数値で入力してください",
             "no_products": "まだ商品を発表していません",
+            "page_size": "表示件数",
+            "prev_page": "前へ",
+            "next_page": "次へ",
+            "page_number": "{} ページ",
+            "status": "ステータス",
+            "statuses": {
+                "active": "販売中",
+                "sold": "売却済み",
+                "expired": "期限切れ",
+                "deleted": "削除済み"
+            },
+            "mark_sold": "売却済みにする",
+            "relist": "再出品",
+            "status_updated": "商品のステータスを更新しました",
             "edit": "編集",
             "delete": "削除",
             "created_at": "作成日時",
@@ -636,11 +729,15 @@ TRANSLATIONS = {
             "sort_newest": "최신순",
             "sort_price_low": "가격: 낮은 순",
             "sort_price_high": "가격: 높은 순",
+            "sort_relevance": "관련도순",
             "all": "전체",
             "price_range": "가격 범위",
             "price_low": "최소 가격",
             "price_high": "최대 가격",
             "no_results": "해당하는 상품이 없습니다",
+            "load_more": "더 보기",
+            "showing": "{}개 표시 중",
+            "suggestions": "추천 검색어",
             "view_details": "자세히 보기",
             "results_found": "발견",
             "products": "개의 제품",
@@ -677,7 +774,34 @@ TRANSLATIONS = {
             "upload_image": "이미지 업로드",
             "submit": "제품 게시",
             "fill_required": "모든 필수 필드를 입력하세요",
+            "publish_mode": "등록 방식",
+            "single_publish": "개별 등록",
+            "batch_publish": "일괄 등록",
+            "batch_hint": '한 행에 하나의 상품을 입력하고 설명은 현재 언어로 작성하세요. 이미지는 한 번에 업로드하고 "이미지 파일명" 열에 해당 파일명을 입력하세요',
+            "batch_image_file": "이미지 파일명",
+            "batch_images": "이미지 업로드 (여러 개 가능)",
+            "batch_submit": "모두 등록",
+            "batch_image_missing": "이미지 파일 {}이(가) 업로드되지 않았습니다",
+            "batch_empty": "상품을 하나 이상 입력하세요",
+            "batch_result": "{}개 상품 등록 성공, {}개 실패",
+            "batch_row": "{}행",
+            "invalid_price": "가격은 0보다 커야 합니다",
+            "price_not_number": "가격은 숫자여야 합니다",
             "no_products": "아직 제품을 게시하지 않았습니다",
+            "page_size": "페이지당 개수",
+            "prev_page": "이전",
+            "next_page": "다음",
+            "page_number": "{} 페이지",
+            "status": "상태",
+            "statuses": {
+                "active": "판매 중",
+                "sold": "판매 완료",
+                "expired": "만료됨",
+                "deleted": "삭제됨"
+            },
+            "mark_sold": "판매 완료로 표시",
+            "relist": "재등록",
+            "status_updated": "상품 상태가 업데이트되었습니다",
             "edit": "편집",
             "delete": "삭제",
             "created_at": "작성일",
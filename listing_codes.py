@@ -0,0 +1,41 @@
+from language import TRANSLATIONS, LANGUAGES, get_current_language
+
+# 商品类别和新旧程度的代码：数据库中保存与语言无关的代码（即翻译键 product.categories.<代码>），
+# 界面显示时按语言查表。各语言的显示文本在模块加载时预先计算，显示和筛选都不再经过 t() 往返翻译。
+
+CATEGORY_CODES = ('electronics', 'household', 'clothing', 'books', 'sports', 'other')
+CONDITION_CODES = ('new', 'like_new', 'minor_wear', 'normal', 'heavy_wear')
+
+
+def _label_table(group, codes):
+    return {lang: {code: TRANSLATIONS[lang]['product'][group].get(code, code) for code in codes}
+            for lang in LANGUAGES}
+
+
+# 语言 → {代码: 显示文本}
+CATEGORY_LABELS = _label_table('categories', CATEGORY_CODES)
+CONDITION_LABELS = _label_table('conditions', CONDITION_CODES)
+
+# 任意语言的显示文本（以及代码本身）→ 代码，用于迁移旧数据和导入按显示文本填写的文件
+CATEGORY_BY_LABEL = {label: code for labels in CATEGORY_LABELS.values() for code, label in labels.items()}
+CATEGORY_BY_LABEL.update({code: code for code in CATEGORY_CODES})
+CONDITION_BY_LABEL = {label: code for labels in CONDITION_LABELS.values() for code, label in labels.items()}
+CONDITION_BY_LABEL.update({code: code for code in CONDITION_CODES})
+
+
+# 转换为代码；无法识别的值原样返回
+def category_code(value):
+    return CATEGORY_BY_LABEL.get(value, value)
+
+
+def condition_code(value):
+    return CONDITION_BY_LABEL.get(value, value)
+
+
+# 按当前语言显示；无法识别的代码（未迁移的旧数据）原样显示
+def category_label(code, lang=None):
+    return CATEGORY_LABELS[lang or get_current_language()].get(code, code)
+
+
+def condition_label(code, lang=None):
+    return CONDITION_LABELS[lang or get_current_language()].get(code, code)
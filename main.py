@@ -5,6 +5,9 @@ from products import product_publish_page, product_management_page
 from search import search_page
 from messages import messages_page
 from language import get_language_selector, t, LANGUAGES
+from sql_profiler import begin_render, end_render
+from maintenance import start_maintenance
+from suggestions import get_suggest_index
 
 # 设置页面配置
 st.set_page_config(
@@ -49,4 +52,14 @@ def main():
         messages_page()
 
 if __name__ == "__main__":
-    main()
+    # 启动后台维护线程（过期商品等，每个进程只启动一次）
+    start_maintenance()
+    # 预先加载标题联想索引（已加载时直接返回）
+    get_suggest_index().ensure_loaded()
+    
+    # 统计本次渲染的SQL查询次数、耗时和读取行数
+    begin_render()
+    try:
+        main()
+    finally:
+        end_render()
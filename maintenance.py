@@ -0,0 +1,266 @@
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+import streamlit as st
+from database import DB_PATH, open_connection, get_writer
+from migrations import ensure_schema
+from product_cache import get_product_cache
+from search_cache import get_search_cache
+from facets import get_facet_index
+from suggestions import get_suggest_index
+from image_store import delete_image
+from time_utils import now_ms
+from text_search import unindex_products
+
+# 定时维护任务：
+#   - 把发布超过有效期仍未售出的商品标记为已过期
+#   - 清理软删除的数据：已删除的商品（连同相关消息、描述和图片文件）以及已清空对话中的消息
+# 应用进程中由后台线程按各自的间隔执行（写操作交给写线程，每批一个短事务，外键约束已启用）；
+# 也可以在命令行中单独执行，例如由 cron 调用：
+#   python maintenance.py expire [--days 90] [--batch 500] [--dry-run]
+#   python maintenance.py purge [--batch 200]
+
+# 商品有效期（天）、每批处理的商品数量和后台执行间隔（秒）
+LISTING_MAX_AGE_DAYS = 90
+EXPIRE_BATCH = 500
+EXPIRE_INTERVAL = 3600.0
+
+# 软删除清理：每批删除的行数和后台执行间隔（秒）
+PURGE_BATCH = 200
+PURGE_INTERVAL = 60.0
+
+# 图片在这段时间内被重新上传过时不删除（留给 image_gc.py 按保留期处理）
+IMAGE_PURGE_MIN_AGE = 3600.0
+
+# 每批最多处理的已清空对话数量
+PURGE_CONVERSATIONS = 20
+
+
+# 过期一批商品，返回被标记的商品ID列表（在调用方的事务中执行）
+def expire_batch(conn, cutoff_ms, batch=EXPIRE_BATCH):
+    ids = [row[0] for row in conn.execute(
+        "SELECT id FROM products WHERE status = 'active' AND created_at_ms < ? LIMIT ?",
+        (cutoff_ms, batch)
+    ).fetchall()]
+    if ids:
+        placeholders = ', '.join('?' * len(ids))
+        conn.execute(
+            f"UPDATE products SET status = 'expired', status_changed_ms = ? WHERE id IN ({placeholders})",
+            [now_ms()] + ids
+        )
+    return ids
+
+
+# 统计将要过期的商品数量（试运行使用）
+def count_stale(conn, cutoff_ms):
+    return conn.execute(
+        "SELECT COUNT(*) FROM products WHERE status = 'active' AND created_at_ms < ?", (cutoff_ms,)
+    ).fetchone()[0]
+
+
+def _cutoff(max_age_days):
+    return now_ms() - int(max_age_days * 24 * 3600 * 1000)
+
+
+# 在应用进程中执行：每批通过写线程提交，完成后按ID使商品缓存失效并从标题联想中移除；
+# 过期的商品通常分布在各个类别中，有商品过期时清空整个搜索缓存，筛选统计下次读取时重新查询
+def expire_stale_listings(max_age_days=LISTING_MAX_AGE_DAYS, batch=EXPIRE_BATCH):
+    cutoff_ms = _cutoff(max_age_days)
+    writer = get_writer()
+    cache = get_product_cache()
+    suggest_index = get_suggest_index()
+    total = 0
+    while True:
+        ids = writer.run(lambda conn: expire_batch(conn, cutoff_ms, batch))
+        for product_id in ids:
+            cache.invalidate(product_id)
+            suggest_index.remove(product_id)
+        total += len(ids)
+        if len(ids) < batch:
+            break
+    if total:
+        get_search_cache().clear()
+        get_facet_index().mark_stale()
+    return total
+
+
+# 删除一批已软删除的商品（在调用方的事务中执行），返回 (商品ID列表, 不再被引用的图片路径列表)
+# 先删除引用这些商品的消息，描述随商品级联删除，再删除全文索引行
+def purge_products_batch(conn, batch=PURGE_BATCH):
+    rows = conn.execute(
+        "SELECT id, image_path FROM products WHERE status = 'deleted' LIMIT ?", (batch,)
+    ).fetchall()
+    if not rows:
+        return [], []
+    ids = [row[0] for row in rows]
+    placeholders = ', '.join('?' * len(ids))
+    conn.execute(f'DELETE FROM messages WHERE product_id IN ({placeholders})', ids)
+    conn.execute(f'DELETE FROM products WHERE id IN ({placeholders})', ids)
+    unindex_products(conn, ids)
+
+    # 相同内容的图片只保存一份，仍被其他商品引用时不能删除
+    unreferenced = []
+    for image_path in {row[1] for row in rows if row[1]}:
+        if conn.execute('SELECT 1 FROM products WHERE image_path = ? LIMIT 1', (image_path,)).fetchone() is None:
+            unreferenced.append(image_path)
+    return ids, unreferenced
+
+
+# 删除一批已清空对话中的消息（在调用方的事务中执行），返回删除的消息数；
+# 某个对话清空时间之前的消息全部删除后，移除它的清空记录
+def purge_conversations_batch(conn, batch=PURGE_BATCH):
+    clears = conn.execute(
+        'SELECT user_low, user_high, cleared_before_ms FROM conversation_clears LIMIT ?', (PURGE_CONVERSATIONS,)
+    ).fetchall()
+    deleted = 0
+    for user_low, user_high, cleared_before_ms in clears:
+        remaining = batch - deleted
+        if remaining <= 0:
+            break
+        count = conn.execute(
+            """DELETE FROM messages WHERE id IN (
+                   SELECT id FROM messages
+                   WHERE ((sender_id = ? AND receiver_id = ?) OR (sender_id = ? AND receiver_id = ?))
+                       AND created_at_ms <= ?
+                   LIMIT ?)""",
+            (user_low, user_high, user_high, user_low, cleared_before_ms, remaining)
+        ).rowcount
+        deleted += count
+        if count < remaining:
+            conn.execute(
+                'DELETE FROM conversation_clears WHERE user_low = ? AND user_high = ? AND cleared_before_ms = ?',
+                (user_low, user_high, cleared_before_ms)
+            )
+    return deleted
+
+
+# 在应用进程中执行：逐批通过写线程删除，每批之间其他写操作可以插队，不会长时间占用写锁
+def purge_deleted(batch=PURGE_BATCH):
+    writer = get_writer()
+    cache = get_product_cache()
+    products = images = 0
+    while True:
+        ids, image_paths = writer.run(lambda conn: purge_products_batch(conn, batch))
+        for product_id in ids:
+            cache.invalidate(product_id)
+        # 文件在事务提交后再删除
+        images += sum(delete_image(path, IMAGE_PURGE_MIN_AGE) for path in image_paths)
+        products += len(ids)
+        if len(ids) < batch:
+            break
+    messages = 0
+    while True:
+        count = writer.run(lambda conn: purge_conversations_batch(conn, batch))
+        messages += count
+        if count < batch:
+            break
+    return {'products': products, 'images': images, 'messages': messages}
+
+
+# 后台维护线程：每个任务按各自的间隔执行，单个任务失败不影响其他任务
+class MaintenanceWorker:
+    def __init__(self, tasks=None):
+        self.tasks = tasks if tasks is not None else MAINTENANCE_TASKS
+        self._stop = threading.Event()
+        self._next_run = {name: 0.0 for name, _, _ in self.tasks}
+        self._last_results = {}
+        self._thread = threading.Thread(target=self._run, name='maintenance', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_due()
+            wait = min(self._next_run.values()) - time.monotonic()
+            self._stop.wait(max(wait, 1.0))
+
+    def run_due(self):
+        for name, task, interval in self.tasks:
+            if time.monotonic() < self._next_run[name]:
+                continue
+            started = time.perf_counter()
+            try:
+                result = task()
+                self._last_results[name] = {'result': result, 'ms': round((time.perf_counter() - started) * 1000, 2)}
+            except Exception as e:
+                self._last_results[name] = {'error': str(e)}
+                print(f"维护任务 {name} 执行失败: {e}")
+            self._next_run[name] = time.monotonic() + interval
+
+    def stats(self):
+        return dict(self._last_results)
+
+    def stop(self):
+        self._stop.set()
+
+
+# 后台线程执行的任务：(名称, 函数, 执行间隔秒数)
+MAINTENANCE_TASKS = [
+    ('expire_stale_listings', expire_stale_listings, EXPIRE_INTERVAL),
+    ('purge_deleted', purge_deleted, PURGE_INTERVAL),
+]
+
+
+# 启动后台维护线程（每个进程只启动一次）
+@st.cache_resource
+def start_maintenance():
+    return MaintenanceWorker()
+
+
+# 命令行中逐批执行：每批一个 BEGIN IMMEDIATE 事务，size(结果) 不满一批时结束
+def _run_batches(conn, run_batch, batch, size=len):
+    while True:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = run_batch()
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        yield result
+        if size(result) < batch:
+            return
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='定时维护任务')
+    parser.add_argument('--db', default=DB_PATH, help='数据库文件路径')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    expire_parser = subparsers.add_parser('expire', help='把超过有效期的在售商品标记为已过期')
+    expire_parser.add_argument('--days', type=float, default=LISTING_MAX_AGE_DAYS, help='商品有效期（天）')
+    expire_parser.add_argument('--batch', type=int, default=EXPIRE_BATCH, help='每个事务处理的商品数量')
+    expire_parser.add_argument('--dry-run', action='store_true', help='只统计数量，不修改数据')
+    purge_parser = subparsers.add_parser('purge', help='删除已软删除的商品和已清空对话中的消息')
+    purge_parser.add_argument('--batch', type=int, default=PURGE_BATCH, help='每个事务删除的行数')
+    args = parser.parse_args(argv)
+
+    ensure_schema(args.db)
+    # 命令行工具使用普通连接，不计入页面的SQL统计；事务由本工具显式控制
+    conn = open_connection(args.db, factory=sqlite3.Connection)
+    conn.isolation_level = None
+    try:
+        if args.command == 'expire':
+            cutoff_ms = _cutoff(args.days)
+            if args.dry_run:
+                print(f"将标记为已过期的商品: {count_stale(conn, cutoff_ms)} 个")
+                return 0
+            batches = _run_batches(conn, lambda: expire_batch(conn, cutoff_ms, args.batch), args.batch)
+            total = sum(len(ids) for ids in batches)
+            print(f"已标记为已过期的商品: {total} 个")
+        elif args.command == 'purge':
+            products = images = 0
+            for ids, image_paths in _run_batches(conn, lambda: purge_products_batch(conn, args.batch), args.batch,
+                                                 size=lambda result: len(result[0])):
+                products += len(ids)
+                images += sum(delete_image(path, IMAGE_PURGE_MIN_AGE) for path in image_paths)
+            messages = sum(_run_batches(conn, lambda: purge_conversations_batch(conn, args.batch), args.batch,
+                                        size=lambda count: count))
+            print(f"已删除商品 {products} 个，图片 {images} 张，消息 {messages} 条")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,38 +1,22 @@
 import streamlit as st
 import sqlite3
-from database import get_db_connection
+from database import db_connection, get_writer
 from datetime import datetime, timedelta
 import time
 import json
 from language import t
+from time_utils import now_ms, ms_to_datetime
 
 # 安全的时间格式化函数
 def safe_format_time(time_value):
-    """处理各种时间格式并返回正确的格式化结果，确保使用本地时间"""
-    if isinstance(time_value, str):
-        # 尝试多种时间格式解析
-        formats_to_try = [
-            "%Y-%m-%d %H:%M:%S",
-            "%Y-%m-%d %H:%M:%S.%f",
-            "%Y-%m-%d %H:%M",
-            "%Y/%m/%d %H:%M:%S",
-            "%Y/%m/%d %H:%M"
-        ]
-        for fmt in formats_to_try:
-            try:
-                # 解析时间字符串为datetime对象
-                dt = datetime.strptime(time_value, fmt)
-                return dt
-            except ValueError:
-                continue
-        # 如果都失败，返回当前时间
-        return datetime.now()
-    elif isinstance(time_value, datetime):
+    """把数据库中的毫秒时间戳转换为本地时间 datetime"""
+    if isinstance(time_value, datetime):
         # 直接返回datetime对象
         return time_value
-    else:
-        # 其他情况返回当前时间
+    elif time_value is None:
+        # 缺少时间时返回当前时间
         return datetime.now()
+    return ms_to_datetime(time_value)
 
 # 格式化消息显示时间
 def format_message_time(dt):
@@ -87,95 +71,93 @@ def get_user_avatar(username):
 
 # 发送消息
 def send_message(sender_id, receiver_id, content, product_id=None):
-    """发送新消息，使用本地时间并保存到数据库"""
-    conn = get_db_connection()
-    c = conn.cursor()
-    # 获取当前本地时间，确保消息时间准确
-    local_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    c.execute(
-        """INSERT INTO messages (sender_id, receiver_id, content, product_id, created_at, is_read)
+    """发送新消息，以毫秒时间戳记录发送时间并保存到数据库"""
+    # 交给后台写线程执行，并等待提交完成
+    get_writer().execute(
+        """INSERT INTO messages (sender_id, receiver_id, content, product_id, created_at_ms, is_read)
            VALUES (?, ?, ?, ?, ?, ?)""",
-        (sender_id, receiver_id, content, product_id, local_time, 0)  # 初始未读
+        (sender_id, receiver_id, content, product_id, now_ms(), 0)  # 初始未读
     )
-    conn.commit()
-    conn.close()
     return True  # 返回True表示消息发送成功
 
 # 获取用户的对话列表
 def get_conversations(user_id):
     """获取用户的所有对话列表，包含未读消息数和最后一条消息"""
-    conn = get_db_connection()
-    
-    # 获取与该用户相关的所有对话，按照最后一条消息的时间排序
-    query = """
-    SELECT 
-        CASE 
-            WHEN sender_id = ? THEN receiver_id 
-            ELSE sender_id 
-        END as other_user_id,
-        MAX(created_at) as last_message_time,
-        COUNT(CASE WHEN receiver_id = ? AND is_read = 0 THEN 1 END) as unread_count
-    FROM messages
-    WHERE sender_id = ? OR receiver_id = ?
-    GROUP BY other_user_id
-    ORDER BY last_message_time DESC
-    """
-    conversations = conn.execute(query, (user_id, user_id, user_id, user_id)).fetchall()
-    
-    # 获取每个对话中对方用户的信息
-    result = []
-    for conv in conversations:
-        other_user_id = conv['other_user_id']
-        # 获取对方用户信息
-        user_info = conn.execute("SELECT username, email FROM users WHERE id = ?", (other_user_id,)).fetchone()
-        if user_info:
-            # 获取最后一条消息内容
-            last_message_query = """
-            SELECT content, sender_id FROM messages 
-            WHERE (sender_id = ? AND receiver_id = ?) OR (sender_id = ? AND receiver_id = ?)
-            ORDER BY created_at DESC LIMIT 1
-            """
-            last_msg = conn.execute(last_message_query, 
-                                  (user_id, other_user_id, other_user_id, user_id)).fetchone()
-            
-            # 格式化时间
-            formatted_time = format_conversation_time(conv['last_message_time'])
-            
-            # 构建消息预览
-            last_message_preview = ""
-            if last_msg:
-                # 判断是否是自己发的消息
-                is_self_sent = last_msg['sender_id'] == user_id
-                prefix = "我: " if is_self_sent else ""
-                content = last_msg['content']
-                last_message_preview = prefix + (content[:20] + '...' if len(content) > 20 else content)
-            
-            result.append({
-                'user_id': other_user_id,
-                'username': user_info['username'],
-                'last_message_time': formatted_time,
-                'unread_count': conv['unread_count'],
-                'last_message': last_message_preview
-            })
+    with db_connection(readonly=True) as conn:
+        # 获取与该用户相关的所有对话，按照最后一条消息的时间排序
+        # 已清空的对话只统计清空时间之后的消息
+        query = """
+        SELECT 
+            CASE 
+                WHEN m.sender_id = ? THEN m.receiver_id 
+                ELSE m.sender_id 
+            END as other_user_id,
+            MAX(m.created_at_ms) as last_message_time,
+            COUNT(CASE WHEN m.receiver_id = ? AND m.is_read = 0 THEN 1 END) as unread_count,
+            MAX(COALESCE(c.cleared_before_ms, -1)) as cleared_before_ms
+        FROM messages m
+        LEFT JOIN conversation_clears c
+            ON c.user_low = MIN(m.sender_id, m.receiver_id) AND c.user_high = MAX(m.sender_id, m.receiver_id)
+        WHERE (m.sender_id = ? OR m.receiver_id = ?)
+            AND m.created_at_ms > COALESCE(c.cleared_before_ms, -1)
+        GROUP BY other_user_id
+        ORDER BY last_message_time DESC
+        """
+        conversations = conn.execute(query, (user_id, user_id, user_id, user_id)).fetchall()
+        
+        # 获取每个对话中对方用户的信息
+        result = []
+        for conv in conversations:
+            other_user_id = conv['other_user_id']
+            # 获取对方用户信息
+            user_info = conn.execute("SELECT username, email FROM users WHERE id = ?", (other_user_id,)).fetchone()
+            if user_info:
+                # 获取最后一条消息内容（按用户对的写法可以使用 idx_messages_pair_created_at_ms，不需要排序）
+                last_message_query = """
+                SELECT content, sender_id FROM messages 
+                WHERE min(sender_id, receiver_id) = ? AND max(sender_id, receiver_id) = ?
+                    AND created_at_ms > ?
+                ORDER BY created_at_ms DESC LIMIT 1
+                """
+                last_msg = conn.execute(last_message_query, 
+                                      conversation_key(user_id, other_user_id)
+                                      + (conv['cleared_before_ms'],)).fetchone()
+                
+                # 格式化时间
+                formatted_time = format_conversation_time(conv['last_message_time'])
+                
+                # 构建消息预览
+                last_message_preview = ""
+                if last_msg:
+                    # 判断是否是自己发的消息
+                    is_self_sent = last_msg['sender_id'] == user_id
+                    prefix = "我: " if is_self_sent else ""
+                    content = last_msg['content']
+                    last_message_preview = prefix + (content[:20] + '...' if len(content) > 20 else content)
+                
+                result.append({
+                    'user_id': other_user_id,
+                    'username': user_info['username'],
+                    'last_message_time': formatted_time,
+                    'unread_count': conv['unread_count'],
+                    'last_message': last_message_preview
+                })
     
-    conn.close()
     return result
 
 # 获取两个用户之间的消息历史
 def get_message_history(user_id1, user_id2, product_id=None):
     """获取两个用户之间的消息历史，标记消息为已读"""
-    conn = get_db_connection()
-    
-    # 构建基础查询
+    # 构建基础查询：按这对用户（较小ID, 较大ID）匹配两个方向的消息，
+    # 表达式须与 idx_messages_pair_created_at_ms 一致，才能按索引顺序读取而不需要额外排序
     query = """
     SELECT m.*, u.username as sender_name 
     FROM messages m
     JOIN users u ON m.sender_id = u.id
     WHERE 
-        (m.sender_id = ? AND m.receiver_id = ?) OR 
-        (m.sender_id = ? AND m.receiver_id = ?)
+        min(m.sender_id, m.receiver_id) = ? AND max(m.sender_id, m.receiver_id) = ?
     """
-    params = [user_id1, user_id2, user_id2, user_id1]
+    params = [min(user_id1, user_id2), max(user_id1, user_id2)]
     
     # 如果指定了商品ID，则只获取与该商品相关的消息
     if product_id:
@@ -183,81 +165,87 @@ def get_message_history(user_id1, user_id2, product_id=None):
         params.append(product_id)
     
     # 按时间正序排列，确保消息按发送顺序显示
-    query += " ORDER BY m.created_at ASC"
-    
-    # 执行查询获取消息
-    messages = conn.execute(query, params).fetchall()
-    
-    # 将接收方为当前用户的消息标记为已读
-    conn.execute(
-        "UPDATE messages SET is_read = 1 WHERE receiver_id = ? AND sender_id = ?",
-        (user_id1, user_id2)
-    )
-    conn.commit()
-    conn.close()
+    query += " AND m.created_at_ms > ? ORDER BY m.created_at_ms ASC"
+    
+    with db_connection(readonly=True) as conn:
+        # 只显示清空时间之后的消息
+        params.append(get_cleared_before(conn, user_id1, user_id2))
+        # 执行查询获取消息
+        messages = conn.execute(query, params).fetchall()
+    
+    # 将接收方为当前用户的消息标记为已读：只在确有未读消息时提交，且不等待写入完成
+    if any(msg['receiver_id'] == user_id1 and not msg['is_read'] for msg in messages):
+        get_writer().submit(
+            "UPDATE messages SET is_read = 1 WHERE receiver_id = ? AND sender_id = ? AND is_read = 0",
+            (user_id1, user_id2)
+        )
     return messages
 
 # 删除单条消息
 def delete_message(message_id, user_id):
     """删除指定ID的消息，确保只能删除自己发送或接收的消息"""
-    conn = get_db_connection()
-    
-    try:
+    # 检查与删除在写线程的同一事务中完成
+    def _delete(conn):
         # 首先检查消息是否存在且属于当前用户
         message = conn.execute(
-            "SELECT * FROM messages WHERE id = ? AND (sender_id = ? OR receiver_id = ?)",
+            "SELECT id FROM messages WHERE id = ? AND (sender_id = ? OR receiver_id = ?)",
             (message_id, user_id, user_id)
         ).fetchone()
         
         if not message:
-            return False, "消息不存在或无权删除"
+            return False
         
         # 删除消息
         conn.execute("DELETE FROM messages WHERE id = ?", (message_id,))
-        conn.commit()
+        return True
+    
+    try:
+        if not get_writer().run(_delete):
+            return False, "消息不存在或无权删除"
         return True, "消息删除成功"
     except Exception as e:
-        conn.rollback()
         return False, f"删除失败: {str(e)}"
-    finally:
-        conn.close()
+
+# 一对用户在 conversation_clears 中的键（较小的ID在前）
+def conversation_key(user_id1, user_id2):
+    return (min(user_id1, user_id2), max(user_id1, user_id2))
+
+# 对话的清空时间，没有清空过时返回 -1
+def get_cleared_before(conn, user_id1, user_id2):
+    row = conn.execute(
+        "SELECT cleared_before_ms FROM conversation_clears WHERE user_low = ? AND user_high = ?",
+        conversation_key(user_id1, user_id2)
+    ).fetchone()
+    return row[0] if row else -1
 
 # 清空两个用户之间的聊天历史
 def clear_conversation_history(user_id1, user_id2):
-    """清空两个用户之间的所有聊天记录"""
-    conn = get_db_connection()
-    
+    """清空两个用户之间的所有聊天记录：只记录清空时间，消息由后台清理任务分批删除"""
     try:
-        # 删除两个用户之间的所有消息
-        conn.execute(
-            "DELETE FROM messages WHERE (sender_id = ? AND receiver_id = ?) OR (sender_id = ? AND receiver_id = ?)",
-            (user_id1, user_id2, user_id2, user_id1)
+        get_writer().execute(
+            """INSERT INTO conversation_clears (user_low, user_high, cleared_before_ms) VALUES (?, ?, ?)
+               ON CONFLICT (user_low, user_high) DO UPDATE SET cleared_before_ms = excluded.cleared_before_ms""",
+            conversation_key(user_id1, user_id2) + (now_ms(),)
         )
-        conn.commit()
         return True, "聊天历史已清空"
     except Exception as e:
-        conn.rollback()
         return False, f"清空失败: {str(e)}"
-    finally:
-        conn.close()
 
 # 获取用户信息（根据ID）
 def get_user_info(user_id):
     """根据用户ID获取用户详细信息"""
-    conn = get_db_connection()
-    user = conn.execute("SELECT id, username, email FROM users WHERE id = ?", (user_id,)).fetchone()
-    conn.close()
+    with db_connection(readonly=True) as conn:
+        user = conn.execute("SELECT id, username, email FROM users WHERE id = ?", (user_id,)).fetchone()
     return dict(user) if user else None
 
 # 按日期分组消息
 def group_messages_by_date(messages):
-    """将消息按日期分组，用于显示"""
+    """将消息按日期分组，用于显示（键为本地日期 date 对象）"""
     grouped = {}
     
     for msg in messages:
-        # 确保消息有created_at字段并转换为日期
-        created_at = safe_format_time(msg['created_at'])
-        date_key = created_at.date().isoformat()
+        # 直接由毫秒时间戳得到本地日期
+        date_key = safe_format_time(msg['created_at_ms']).date()
         
         if date_key not in grouped:
             grouped[date_key] = []
@@ -267,9 +255,8 @@ def group_messages_by_date(messages):
     return dict(sorted(grouped.items()))
 
 # 格式化日期显示
-def format_date_header(date_str):
+def format_date_header(date_obj):
     """格式化日期显示为'今天'、'昨天'或具体日期"""
-    date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
     today = datetime.now().date()
     yesterday = today - timedelta(days=1)
     
@@ -944,7 +931,7 @@ def messages_page():
                                     <div class='message-row message-row-sender'>
                                         <div class='message-content'>
                                             <div class='message-bubble message-bubble-sender'>{msg['content']}</div>
-                                            <div class='message-time' style='text-align: right;'>{format_message_time(msg['created_at'])}</div>
+                                            <div class='message-time' style='text-align: right;'>{format_message_time(msg['created_at_ms'])}</div>
                                         </div>
                                     </div>
                                     </div>
@@ -960,7 +947,7 @@ def messages_page():
                                         <div class='message-receiver-avatar' style='background-color: {sender_bg_color};'>{sender_avatar_text}</div>
                                         <div class='message-content'>
                                             <div class='message-bubble message-bubble-receiver'>{msg['content']}</div>
-                                            <div class='message-time'>{format_message_time(msg['created_at'])}</div>
+                                            <div class='message-time'>{format_message_time(msg['created_at_ms'])}</div>
                                         </div>
                                     </div>
                                     </div>
@@ -1085,10 +1072,14 @@ def show_contact_seller_button(product):
 # 获取未读消息数量
 def get_unread_message_count(user_id):
     """获取用户的未读消息总数"""
-    conn = get_db_connection()
-    count = conn.execute(
-        "SELECT COUNT(*) as unread_count FROM messages WHERE receiver_id = ? AND is_read = 0",
-        (user_id,)
-    ).fetchone()['unread_count']
-    conn.close()
+    with db_connection(readonly=True) as conn:
+        # 不计入已清空对话中的消息
+        count = conn.execute(
+            """SELECT COUNT(*) as unread_count FROM messages m
+               LEFT JOIN conversation_clears c
+                   ON c.user_low = MIN(m.sender_id, m.receiver_id) AND c.user_high = MAX(m.sender_id, m.receiver_id)
+               WHERE m.receiver_id = ? AND m.is_read = 0
+                   AND m.created_at_ms > COALESCE(c.cleared_before_ms, -1)""",
+            (user_id,)
+        ).fetchone()['unread_count']
     return count
\ No newline at end of file
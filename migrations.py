@@ -0,0 +1,524 @@
+import sqlite3
+import argparse
+from time_utils import parse_legacy_time
+from text_search import register_sql_functions, rebuild_product_fts
+
+# 数据库结构迁移
+# 每个迁移步骤是 (版本号, 说明, 函数)，按版本号顺序执行；
+# 当前版本记录在 PRAGMA user_version 中，启动时只需读取一次即可判断是否需要迁移。
+
+
+# 工具函数：获取表的字段名集合
+def _table_columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})').fetchall()}
+
+
+# 工具函数：字段不存在时才添加，返回是否真正添加了字段
+def _add_column_if_missing(conn, table, column, definition):
+    if column in _table_columns(conn, table):
+        return False
+    conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return True
+
+
+# 版本1：基础表结构（兼容旧版 init_db() 创建的数据库）
+def _migration_001_baseline(conn):
+    # 创建用户表
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    # 创建商品表
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        description TEXT,
+        description_zh TEXT,
+        description_en TEXT,
+        description_ja TEXT,
+        description_ko TEXT,
+        price REAL NOT NULL,
+        category TEXT,
+        condition TEXT,
+        contact_info TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        image_path TEXT,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''')
+
+    # 为已有表补齐多语言描述字段和旧版 description 字段（update_product 仍会写入它）
+    _add_column_if_missing(conn, 'products', 'description', 'TEXT')
+    if _add_column_if_missing(conn, 'products', 'description_zh', 'TEXT'):
+        # 将现有description数据复制到description_zh（假设原数据为中文）
+        conn.execute('UPDATE products SET description_zh = description WHERE description IS NOT NULL')
+    for lang in ('en', 'ja', 'ko'):
+        _add_column_if_missing(conn, 'products', f'description_{lang}', 'TEXT')
+
+    # 创建消息表
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sender_id INTEGER NOT NULL,
+        receiver_id INTEGER NOT NULL,
+        product_id INTEGER,
+        content TEXT NOT NULL,
+        is_read BOOLEAN DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (sender_id) REFERENCES users (id),
+        FOREIGN KEY (receiver_id) REFERENCES users (id),
+        FOREIGN KEY (product_id) REFERENCES products (id)
+    )
+    ''')
+
+    # 创建索引以提高搜索性能
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_title ON products(title)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_category ON products(category)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_sender_receiver ON messages(sender_id, receiver_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_receiver ON messages(receiver_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_product ON messages(product_id)')
+
+    # 创建密码重置表
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS password_resets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT NOT NULL,
+        code TEXT NOT NULL,
+        expires_at TIMESTAMP NOT NULL,
+        used BOOLEAN DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    # 为密码重置表创建索引
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_password_resets_email ON password_resets(email)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_password_resets_expires ON password_resets(expires_at)')
+
+
+# 版本2：索引诊断工具（index_advisor.py）建议的索引
+# 覆盖默认列表/价格排序、按类别筛选后排序、"我的商品"列表和未读消息计数；
+# idx_products_category 与 idx_messages_receiver 是新索引的前缀，一并删除
+def _migration_002_advisor_indexes(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_created_at ON products(created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_price ON products(price)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_user_id_created_at ON products(user_id, created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_category_created_at ON products(category, created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_category_price ON products(category, price)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_receiver_id_is_read ON messages(receiver_id, is_read)')
+    conn.execute('DROP INDEX IF EXISTS idx_products_category')
+    conn.execute('DROP INDEX IF EXISTS idx_messages_receiver')
+
+
+# 工具函数：把文本时间字段回填到整数毫秒字段
+# 先用 SQLite 的 strftime 批量转换，无法识别的格式再逐行用 Python 解析
+def _backfill_ms(conn, table, source, target, utc=False):
+    modifier = '' if utc else ", 'utc'"
+    conn.execute(f'''
+    UPDATE {table} SET {target} =
+        CAST(strftime('%s', {source}{modifier}) AS INTEGER) * 1000
+        + CAST(substr(strftime('%f', {source}), 4, 3) AS INTEGER)
+    WHERE {target} IS NULL AND {source} IS NOT NULL AND strftime('%s', {source}) IS NOT NULL
+    ''')
+    rows = conn.execute(
+        f'SELECT id, {source} FROM {table} WHERE {target} IS NULL AND {source} IS NOT NULL'
+    ).fetchall()
+    for row_id, text in rows:
+        conn.execute(f'UPDATE {table} SET {target} = ? WHERE id = ?',
+                     (parse_legacy_time(str(text), utc=utc), row_id))
+
+
+# 版本3：时间改为整数毫秒时间戳存储
+# products/messages 的 created_at 由应用按本地时间写入；password_resets.created_at 是 UTC 默认值
+def _migration_003_epoch_ms(conn):
+    for table in ('products', 'messages', 'password_resets'):
+        _add_column_if_missing(conn, table, 'created_at_ms', 'INTEGER')
+    _add_column_if_missing(conn, 'password_resets', 'expires_at_ms', 'INTEGER')
+
+    _backfill_ms(conn, 'products', 'created_at', 'created_at_ms')
+    _backfill_ms(conn, 'messages', 'created_at', 'created_at_ms')
+    _backfill_ms(conn, 'password_resets', 'created_at', 'created_at_ms', utc=True)
+    _backfill_ms(conn, 'password_resets', 'expires_at', 'expires_at_ms')
+
+    # 排序相关的索引改用整数字段
+    conn.execute('DROP INDEX IF EXISTS idx_products_created_at')
+    conn.execute('DROP INDEX IF EXISTS idx_products_user_id_created_at')
+    conn.execute('DROP INDEX IF EXISTS idx_products_category_created_at')
+    conn.execute('DROP INDEX IF EXISTS idx_password_resets_expires')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_created_at_ms ON products(created_at_ms)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_user_id_created_at_ms ON products(user_id, created_at_ms)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_category_created_at_ms ON products(category, created_at_ms)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_password_resets_expires_ms ON password_resets(expires_at_ms)')
+
+
+# 版本4：商品描述拆分到 product_descriptions(product_id, lang, text) 表
+# 每种语言只保存用户实际填写的文本，回退到中文在读取时进行；
+# 旧版发布时复制到其他语言的中文副本不再迁移，products 上的描述字段随后删除
+DESCRIPTION_LANGS = ('zh', 'en', 'ja', 'ko')
+
+
+def _migration_004_product_descriptions(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS product_descriptions (
+        product_id INTEGER NOT NULL,
+        lang TEXT NOT NULL,
+        text TEXT NOT NULL,
+        PRIMARY KEY (product_id, lang),
+        FOREIGN KEY (product_id) REFERENCES products (id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    ''')
+
+    columns = _table_columns(conn, 'products')
+    if 'description_zh' in columns:
+        # 中文描述为空时使用旧版 description 字段
+        legacy = "NULLIF(description, '')" if 'description' in columns else 'NULL'
+        conn.execute(f'''
+        INSERT OR IGNORE INTO product_descriptions (product_id, lang, text)
+        SELECT id, 'zh', COALESCE(NULLIF(description_zh, ''), {legacy})
+        FROM products WHERE COALESCE(NULLIF(description_zh, ''), {legacy}) IS NOT NULL
+        ''')
+        for lang in DESCRIPTION_LANGS[1:]:
+            if f'description_{lang}' not in columns:
+                continue
+            conn.execute(f'''
+            INSERT OR IGNORE INTO product_descriptions (product_id, lang, text)
+            SELECT id, ?, description_{lang} FROM products
+            WHERE NULLIF(description_{lang}, '') IS NOT NULL
+              AND description_{lang} IS NOT COALESCE(NULLIF(description_zh, ''), {legacy})
+            ''', (lang,))
+
+    # 删除 products 上的描述字段（SQLite 3.35 起支持 DROP COLUMN，旧版本只清空数据）
+    for column in ('description',) + tuple(f'description_{lang}' for lang in DESCRIPTION_LANGS):
+        if column not in columns:
+            continue
+        try:
+            conn.execute(f'ALTER TABLE products DROP COLUMN {column}')
+        except sqlite3.OperationalError:
+            conn.execute(f'UPDATE products SET {column} = NULL')
+
+
+# 版本5：按图片路径查找商品（孤儿图片清理按批次查询引用，不必每次全表扫描）
+def _migration_005_image_path_index(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_image_path ON products(image_path)')
+
+
+# 版本6：商品状态（active 在售 / sold 已售 / expired 已过期 / deleted 已删除）
+# 搜索和默认列表只查询在售商品，相关索引改为只包含 status = 'active' 的部分索引；
+# 查询条件必须写成字面量 status = 'active'（不能用参数绑定），SQLite 才会使用这些索引
+def _migration_006_listing_status(conn):
+    _add_column_if_missing(
+        conn, 'products', 'status',
+        "TEXT NOT NULL DEFAULT 'active' CHECK (status IN ('active', 'sold', 'expired', 'deleted'))")
+    _add_column_if_missing(conn, 'products', 'status_changed_ms', 'INTEGER')
+
+    conn.execute('DROP INDEX IF EXISTS idx_products_created_at_ms')
+    conn.execute('DROP INDEX IF EXISTS idx_products_price')
+    conn.execute('DROP INDEX IF EXISTS idx_products_category_created_at_ms')
+    conn.execute('DROP INDEX IF EXISTS idx_products_category_price')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_products_active_created_at_ms ON products(created_at_ms) WHERE status = 'active'")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_products_active_price ON products(price) WHERE status = 'active'")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_products_active_category_created_at_ms ON products(category, created_at_ms) WHERE status = 'active'")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_products_active_category_price ON products(category, price) WHERE status = 'active'")
+
+
+# 版本7：软删除
+# 删除商品只把 status 改为 deleted，"我的商品"的索引改为不包含已删除商品的部分索引；
+# 清空聊天记录只记录清空时间（每对用户一行，user_low < user_high），之前的消息不再显示；
+# 实际的数据删除由后台清理任务分批完成（见 maintenance.py）
+def _migration_007_soft_delete(conn):
+    conn.execute('DROP INDEX IF EXISTS idx_products_user_id_created_at_ms')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_products_live_user_id_created_at_ms ON products(user_id, created_at_ms) WHERE status <> 'deleted'")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_products_deleted ON products(status_changed_ms) WHERE status = 'deleted'")
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS conversation_clears (
+        user_low INTEGER NOT NULL,
+        user_high INTEGER NOT NULL,
+        cleared_before_ms INTEGER NOT NULL,
+        PRIMARY KEY (user_low, user_high)
+    ) WITHOUT ROWID
+    ''')
+
+
+# 版本8：商品全文索引（FTS5），rowid 即商品ID，标题和各语言描述各占一列；
+# 由 products / product_descriptions 上的触发器保持同步，包含所有状态的商品，查询时再按状态过滤。
+# 排序使用 BM25，标题命中的权重高于描述
+FTS_RANK = 'bm25(10.0, 1.0, 1.0, 1.0, 1.0)'
+
+
+def _migration_008_product_fts(conn):
+    description_columns = ', '.join(f'description_{lang}' for lang in DESCRIPTION_LANGS)
+    conn.execute(f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        title, {description_columns}, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    ''')
+    conn.execute("INSERT INTO products_fts (products_fts, rank) VALUES ('rank', ?)", (FTS_RANK,))
+
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, title) VALUES (NEW.id, NEW.title);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF title ON products BEGIN
+        UPDATE products_fts SET title = NEW.title WHERE rowid = NEW.id;
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        DELETE FROM products_fts WHERE rowid = OLD.id;
+    END
+    ''')
+
+    # 描述按语言写入对应的列（商品被删除时描述级联删除，此时索引行已不存在，UPDATE 不影响任何行）
+    def set_columns(value_for):
+        return ', '.join(f'description_{lang} = {value_for(lang)}' for lang in DESCRIPTION_LANGS)
+
+    inserted = set_columns(lambda lang: f"CASE NEW.lang WHEN '{lang}' THEN NEW.text ELSE description_{lang} END")
+    updated = set_columns(lambda lang: f"CASE WHEN NEW.lang = '{lang}' THEN NEW.text "
+                                       f"WHEN OLD.lang = '{lang}' THEN NULL ELSE description_{lang} END")
+    deleted = set_columns(lambda lang: f"CASE OLD.lang WHEN '{lang}' THEN NULL ELSE description_{lang} END")
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS product_descriptions_fts_insert AFTER INSERT ON product_descriptions BEGIN
+        UPDATE products_fts SET {inserted} WHERE rowid = NEW.product_id;
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS product_descriptions_fts_update AFTER UPDATE ON product_descriptions BEGIN
+        UPDATE products_fts SET {updated} WHERE rowid = NEW.product_id;
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS product_descriptions_fts_delete AFTER DELETE ON product_descriptions BEGIN
+        UPDATE products_fts SET {deleted} WHERE rowid = OLD.product_id;
+    END
+    ''')
+
+    # 为已有商品建立索引
+    description_values = ', '.join(
+        f"(SELECT text FROM product_descriptions WHERE product_id = products.id AND lang = '{lang}')"
+        for lang in DESCRIPTION_LANGS)
+    conn.execute(f'''
+    INSERT INTO products_fts (rowid, title, {description_columns})
+    SELECT id, title, {description_values} FROM products
+    ''')
+
+
+# 版本9：全文索引改为中日韩分词（见 text_search.py）
+# 触发器写入索引前经过 cjk_segment() 把连续的中日韩文字展开为 bigram 和单字，然后重建索引
+def _migration_009_cjk_segmentation(conn):
+    for trigger in ('products_fts_insert', 'products_fts_update', 'products_fts_delete',
+                    'product_descriptions_fts_insert', 'product_descriptions_fts_update',
+                    'product_descriptions_fts_delete'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+
+    conn.execute('''
+    CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, title) VALUES (NEW.id, cjk_segment(NEW.title));
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER products_fts_update AFTER UPDATE OF title ON products BEGIN
+        UPDATE products_fts SET title = cjk_segment(NEW.title) WHERE rowid = NEW.id;
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER products_fts_delete AFTER DELETE ON products BEGIN
+        DELETE FROM products_fts WHERE rowid = OLD.id;
+    END
+    ''')
+
+    def set_columns(value_for):
+        return ', '.join(f'description_{lang} = {value_for(lang)}' for lang in DESCRIPTION_LANGS)
+
+    inserted = set_columns(
+        lambda lang: f"CASE NEW.lang WHEN '{lang}' THEN cjk_segment(NEW.text) ELSE description_{lang} END")
+    updated = set_columns(lambda lang: f"CASE WHEN NEW.lang = '{lang}' THEN cjk_segment(NEW.text) "
+                                       f"WHEN OLD.lang = '{lang}' THEN NULL ELSE description_{lang} END")
+    deleted = set_columns(lambda lang: f"CASE OLD.lang WHEN '{lang}' THEN NULL ELSE description_{lang} END")
+    conn.execute(f'''
+    CREATE TRIGGER product_descriptions_fts_insert AFTER INSERT ON product_descriptions BEGIN
+        UPDATE products_fts SET {inserted} WHERE rowid = NEW.product_id;
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER product_descriptions_fts_update AFTER UPDATE ON product_descriptions BEGIN
+        UPDATE products_fts SET {updated} WHERE rowid = NEW.product_id;
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER product_descriptions_fts_delete AFTER DELETE ON product_descriptions BEGIN
+        UPDATE products_fts SET {deleted} WHERE rowid = OLD.product_id;
+    END
+    ''')
+
+    description_columns = ', '.join(f'description_{lang}' for lang in DESCRIPTION_LANGS)
+    description_values = ', '.join(
+        f"cjk_segment((SELECT text FROM product_descriptions WHERE product_id = products.id AND lang = '{lang}'))"
+        for lang in DESCRIPTION_LANGS)
+    conn.execute('DELETE FROM products_fts')
+    conn.execute(f'''
+    INSERT INTO products_fts (rowid, title, {description_columns})
+    SELECT id, cjk_segment(title), {description_values} FROM products
+    ''')
+
+
+# 版本10：类别和新旧程度改为保存与语言无关的代码（见 listing_codes.py）
+# 旧数据中是发布时界面语言的显示文本（大多是中文），按各语言的显示文本换成代码；
+# 无法识别的值保持不变。category 上已有只包含在售商品的索引，按代码筛选可以直接使用
+def _migration_010_listing_codes(conn):
+    from listing_codes import CATEGORY_BY_LABEL, CONDITION_BY_LABEL
+
+    conn.executemany('UPDATE products SET category = ? WHERE category = ?',
+                     [(code, label) for label, code in CATEGORY_BY_LABEL.items() if label != code])
+    conn.executemany('UPDATE products SET condition = ? WHERE condition = ?',
+                     [(code, label) for label, code in CONDITION_BY_LABEL.items() if label != code])
+
+
+# 版本11：聊天记录按 (较小用户ID, 较大用户ID, 发送时间) 建立表达式索引
+# 两个用户之间的消息历史改为按这对用户查询（不再是两个方向的 OR 条件），
+# 索引顺序与 ORDER BY created_at_ms 一致，不再需要临时 B 树排序（见 messages.get_message_history）
+def _migration_011_conversation_index(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_pair_created_at_ms ON messages('
+                 'min(sender_id, receiver_id), max(sender_id, receiver_id), created_at_ms)')
+
+
+# 版本12：全文索引改由应用维护（见 text_search.index_products()）。
+# 版本9的触发器调用 Python 函数 cjk_segment()，没有注册该函数的连接（sqlite3 命令行、独立脚本、
+# 备份恢复工具）无法写入商品和描述；删除这些触发器，再按当前数据重建一次索引
+def _migration_012_app_maintained_fts(conn):
+    for trigger in ('products_fts_insert', 'products_fts_update', 'products_fts_delete',
+                    'product_descriptions_fts_insert', 'product_descriptions_fts_update',
+                    'product_descriptions_fts_delete'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    rebuild_product_fts(conn)
+
+
+# 迁移列表（版本号必须严格递增，已发布的步骤不要修改，只能追加新步骤）
+MIGRATIONS = [
+    (1, '基础表结构', _migration_001_baseline),
+    (2, '索引诊断工具建议的索引', _migration_002_advisor_indexes),
+    (3, '时间字段改为整数毫秒时间戳', _migration_003_epoch_ms),
+    (4, '商品描述拆分为按语言存储的 product_descriptions 表', _migration_004_product_descriptions),
+    (5, '图片路径索引', _migration_005_image_path_index),
+    (6, '商品状态和只包含在售商品的部分索引', _migration_006_listing_status),
+    (7, '商品和聊天记录软删除', _migration_007_soft_delete),
+    (8, '商品全文索引', _migration_008_product_fts),
+    (9, '全文索引使用中日韩分词', _migration_009_cjk_segmentation),
+    (10, '类别和新旧程度改为语言无关的代码', _migration_010_listing_codes),
+    (11, '聊天记录按用户对和发送时间的索引', _migration_011_conversation_index),
+    (12, '全文索引改由应用维护，删除调用 Python 函数的触发器', _migration_012_app_maintained_fts),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# 获取数据库当前的结构版本
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+# 获取尚未执行的迁移步骤
+def pending_migrations(conn):
+    current = get_schema_version(conn)
+    return [m for m in MIGRATIONS if m[0] > current]
+
+
+# 按顺序执行所有未执行的迁移，返回已执行的版本号列表
+def apply_migrations(db_path, target=None):
+    # 使用自动提交模式，由我们显式控制事务（SQLite 的 DDL 支持事务）
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    register_sql_functions(conn)
+    applied = []
+    try:
+        for version, description, migrate in MIGRATIONS:
+            if target is not None and version > target:
+                break
+            # 加写锁后再检查版本，避免多个进程同时迁移
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if get_schema_version(conn) >= version:
+                    conn.execute('ROLLBACK')
+                    continue
+                migrate(conn)
+                conn.execute(f'PRAGMA user_version = {int(version)}')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            applied.append(version)
+    finally:
+        conn.close()
+    return applied
+
+
+# 启动时的快速检查：版本已是最新时只读取一次 user_version
+def ensure_schema(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        current = get_schema_version(conn)
+    finally:
+        conn.close()
+    if current >= LATEST_VERSION:
+        return []
+    return apply_migrations(db_path)
+
+
+# 命令行：python migrations.py status|apply
+def main(argv=None):
+    from database import DB_PATH
+
+    parser = argparse.ArgumentParser(description='数据库结构迁移工具')
+    parser.add_argument('--db', default=DB_PATH, help='数据库文件路径')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('status', help='查看当前版本和待执行的迁移')
+    apply_parser = subparsers.add_parser('apply', help='执行待执行的迁移')
+    apply_parser.add_argument('--target', type=int, default=None, help='只迁移到指定版本')
+    subparsers.add_parser('rebuild-fts', help='重建商品全文索引（用其他工具修改过商品后执行）')
+    args = parser.parse_args(argv)
+
+    if args.command == 'status':
+        conn = sqlite3.connect(args.db)
+        try:
+            current = get_schema_version(conn)
+            pending = pending_migrations(conn)
+        finally:
+            conn.close()
+        print(f"当前版本: {current}，最新版本: {LATEST_VERSION}")
+        for version, description, _ in MIGRATIONS:
+            state = '待执行' if version > current else '已执行'
+            print(f"  [{state}] {version:03d} {description}")
+        if not pending:
+            print("数据库结构已是最新")
+    elif args.command == 'apply':
+        applied = apply_migrations(args.db, target=args.target)
+        if applied:
+            for version in applied:
+                print(f"已执行迁移 {version:03d}")
+        else:
+            print("没有需要执行的迁移")
+    elif args.command == 'rebuild-fts':
+        ensure_schema(args.db)
+        conn = sqlite3.connect(args.db, isolation_level=None)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                count = rebuild_product_fts(conn)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        finally:
+            conn.close()
+        print(f"已重建全文索引：{count} 个商品")
+
+
+if __name__ == '__main__':
+    main()
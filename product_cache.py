@@ -0,0 +1,82 @@
+import time
+import streamlit as st
+from ttl_cache import TTLCache
+
+# 进程级商品缓存：按商品ID缓存 products 行（sqlite3.Row，不可变）及已解析的各语言描述，
+# 超过容量时淘汰最久未使用的商品，超过有效期的条目在读取时丢弃；
+# 发布、修改、删除商品后按ID精确失效
+
+# 缓存的商品数量上限和有效期（秒）
+CACHE_MAX_SIZE = 5000
+CACHE_TTL = 300.0
+
+
+class ProductCache(TTLCache):
+    def __init__(self, max_size=CACHE_MAX_SIZE, ttl=CACHE_TTL):
+        # 缓存键是商品ID，值为 (行, {语言: 描述})
+        super().__init__(max_size, ttl)
+
+    # 批量读取商品行，返回 ({商品ID: 行}, [未命中的ID])
+    def get_many(self, product_ids):
+        found = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for product_id in product_ids:
+                entry = self._lookup(product_id, now)
+                if entry is None:
+                    missing.append(product_id)
+                else:
+                    found[product_id] = entry[0][0]
+            self._hits += len(found)
+            self._misses += len(missing)
+        return found, missing
+
+    # 写入从数据库读取的商品行；generation 是读取前的 generation()
+    def put_many(self, rows, generation):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            if generation != self._generation:
+                return
+            for row in rows:
+                product_id = row['id']
+                entry = self._entries.get(product_id)
+                # 行没有变化时保留已缓存的描述
+                descriptions = entry[0][1] if entry is not None else {}
+                self._store(product_id, (row, descriptions), expires)
+            self._evict()
+
+    # 读取已缓存的描述（已按语言回退），未缓存时返回 None
+    def get_description(self, product_id, lang):
+        with self._lock:
+            entry = self._lookup(product_id, time.monotonic())
+            text = entry[0][1].get(lang) if entry is not None else None
+            if text is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+            return text
+
+    # 缓存描述；只在商品行已缓存时保存，随商品一起失效和淘汰
+    def put_description(self, product_id, lang, text, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            entry = self._entries.get(product_id)
+            if entry is not None:
+                entry[0][1][lang] = text
+
+    # 商品被修改或删除后调用
+    def invalidate(self, product_id):
+        with self._lock:
+            self._invalidate([product_id])
+
+
+@st.cache_resource
+def get_product_cache():
+    return ProductCache()
+
+
+# 获取商品缓存统计信息
+def get_product_cache_stats():
+    return get_product_cache().stats()
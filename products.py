@@ -1,101 +1,343 @@
 import streamlit as st
-from database import get_db_connection
-from datetime import datetime
-from language import t
-from search import get_category_key, get_condition_key
+from database import db_connection, get_writer
+from time_utils import now_ms, format_timestamp
+from image_store import save_upload, save_uploads, image_for_width
+from product_cache import get_product_cache
+from search_cache import invalidate_search_categories
+from facets import record_listing_change
+from suggestions import record_title_change
+from text_search import index_products
+from language import t, get_current_language, LANGUAGES
+from listing_codes import (CATEGORY_CODES, CONDITION_CODES, category_code, condition_code,
+                           category_label, condition_label)
 
 # 发布商品
 def publish_product(user_id, title, descriptions, price, category, condition, contact_info, image_path=None):
-    conn = get_db_connection()
-    c = conn.cursor()
-    
+    # 类别和新旧程度保存为语言无关的代码（也接受任意语言的显示文本）
+    category, condition = category_code(category), condition_code(condition)
+    product = {
+        'id': None,
+        'user_id': user_id,
+        'title': title,
+        'price': price,
+        'category': category,
+        'condition': condition,
+        'contact_info': contact_info,
+        'image_path': image_path,
+        'created_at_ms': now_ms(),
+    }
     try:
-        # 获取各语言描述，如果没有提供则使用默认语言(中文)的描述
-        description_zh = descriptions.get('zh', '')
-        description_en = descriptions.get('en', description_zh)  # 如果没有英文，使用中文
-        description_ja = descriptions.get('ja', description_zh)  # 如果没有日文，使用中文
-        description_ko = descriptions.get('ko', description_zh)  # 如果没有韩文，使用中文
-        
-        c.execute(
-            '''INSERT INTO products 
-               (user_id, title, description_zh, description_en, description_ja, description_ko, 
-                price, category, condition, contact_info, image_path, created_at) 
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-            (user_id, title, description_zh, description_en, description_ja, description_ko, 
-             price, category, condition, contact_info, image_path, datetime.now())
-        )
-        conn.commit()
-        return True, t('product.publish_success')
+        # 与批量发布相同，由写线程写入；只保存实际填写的语言，未填写的语言在读取时回退到中文
+        product_id, = get_writer().run(
+            lambda conn: insert_product_rows(conn, [(product, description_items(descriptions))]))
     except Exception as e:
         return False, f"{t('product.publish_failed')}: {str(e)}"
-    finally:
-        conn.close()
-
-# 获取用户发布的所有商品
-def get_user_products(user_id):
-    conn = get_db_connection()
-    # 只获取产品ID列表
-    product_ids = [row['id'] for row in conn.execute(
-        'SELECT * FROM products WHERE user_id = ? ORDER BY created_at DESC', 
-        (user_id,)
-    ).fetchall()]
-    conn.close()
-    
-    # 使用get_product_details函数处理每个产品，以支持多语言描述
-    products = []
-    for product_id in product_ids:
-        product = get_product_details(product_id)
-        if product:
-            products.append(product)
+    get_product_cache().invalidate(product_id)
+    invalidate_search_categories(category)
+    record_listing_change(None, (category, condition, float(price), STATUS_ACTIVE))
+    record_title_change(product_id, title)
+    return True, t('product.publish_success')
+
+# 校验一条待发布的商品（与发布表单的检查一致），返回错误信息，通过时返回 None
+def validate_listing(listing):
+    if not all(listing.get(key) for key in ('title', 'category', 'condition', 'price', 'contact_info')):
+        return t('product.fill_required')
+    try:
+        price = float(listing['price'])
+    except (TypeError, ValueError):
+        return t('product.price_not_number')
+    if price <= 0:
+        return t('product.invalid_price')
+    if not description_items(listing.get('descriptions') or {}):
+        return t('product.at_least_one_description_required')
+    return None
+
+# 在调用方的写事务中批量插入商品及其描述，返回商品ID列表
+# rows 为 [(商品字段字典, [(语言, 描述)])]；字典中 id 为 None 时在写锁内连续分配新ID
+def insert_product_rows(conn, rows):
+    if not rows:
+        return []
+    next_id = conn.execute(
+        '''SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'products'), 0),
+                      COALESCE((SELECT MAX(id) FROM products), 0))'''
+    ).fetchone()[0] + 1
+    for product, _ in rows:
+        if product.get('id') is None:
+            product['id'] = next_id
+            next_id += 1
+        # 未指定状态时为在售（批量导入恢复备份时保留原状态）
+        product.setdefault('status', STATUS_ACTIVE)
+        product.setdefault('status_changed_ms', None)
+    
+    conn.executemany(
+        '''INSERT INTO products
+           (id, user_id, title, price, category, condition, contact_info, image_path, created_at_ms,
+            status, status_changed_ms)
+           VALUES (:id, :user_id, :title, :price, :category, :condition, :contact_info,
+                   :image_path, :created_at_ms, :status, :status_changed_ms)''',
+        [product for product, _ in rows]
+    )
+    conn.executemany(
+        'INSERT INTO product_descriptions (product_id, lang, text) VALUES (?, ?, ?)',
+        [(product['id'], lang, text) for product, descriptions in rows for lang, text in descriptions]
+    )
+    ids = [product['id'] for product, _ in rows]
+    index_products(conn, ids)
+    return ids
+
+# 批量发布商品：listings 为字典列表，字段与 publish_product() 的参数相同，
+# 图片可用 image=(数据, 文件名) 上传或用 image_path 指定已保存的路径。
+# 每行单独校验，图片并行保存，通过校验的商品在写线程的一个事务中用 executemany 写入；
+# 返回与 listings 一一对应的 [(是否成功, 消息)]，单行失败不影响其他行
+def publish_products(user_id, listings):
+    results = [None] * len(listings)
+    valid = []
+    for index, listing in enumerate(listings):
+        error = validate_listing(listing)
+        if error:
+            results[index] = (False, error)
+        else:
+            valid.append(index)
     
+    saved_images = save_uploads({index: listings[index]['image'] for index in valid if listings[index].get('image')})
+    
+    rows = []
+    created_at = now_ms()
+    for index in valid:
+        listing = listings[index]
+        image_path = listing.get('image_path')
+        if index in saved_images:
+            if isinstance(saved_images[index], Exception):
+                results[index] = (False, f"{t('product.publish_failed')}: {saved_images[index]}")
+                continue
+            image_path = saved_images[index]
+        product = {
+            'id': None,
+            'user_id': user_id,
+            'title': listing['title'],
+            'price': float(listing['price']),
+            'category': category_code(listing['category']),
+            'condition': condition_code(listing['condition']),
+            'contact_info': listing['contact_info'],
+            'image_path': image_path,
+            'created_at_ms': created_at,
+        }
+        rows.append((index, product, description_items(listing['descriptions'])))
+    
+    if rows:
+        try:
+            product_ids = get_writer().run(
+                lambda conn: insert_product_rows(conn, [(product, descriptions) for _, product, descriptions in rows]))
+        except Exception as e:
+            for index, _, _ in rows:
+                results[index] = (False, f"{t('product.publish_failed')}: {str(e)}")
+            return results
+        cache = get_product_cache()
+        for (index, _, _), product_id in zip(rows, product_ids):
+            cache.invalidate(product_id)
+            results[index] = (True, t('product.publish_success'))
+        invalidate_search_categories(*{product['category'] for _, product, _ in rows})
+        for (_, product, _), product_id in zip(rows, product_ids):
+            record_listing_change(None, (product['category'], product['condition'], product['price'], STATUS_ACTIVE))
+            record_title_change(product_id, product['title'])
+    return results
+
+# 把描述参数整理为 [(语言, 文本)]：字典按语言保存，单个字符串视为中文描述，空白文本不保存
+def description_items(descriptions):
+    if not isinstance(descriptions, dict):
+        descriptions = {'zh': descriptions}
+    return [(lang, descriptions[lang]) for lang in LANGUAGES
+            if descriptions.get(lang) and descriptions[lang].strip()]
+
+# 在调用方的事务中替换商品的全部描述
+def _save_descriptions(conn, product_id, descriptions):
+    conn.execute('DELETE FROM product_descriptions WHERE product_id = ?', (product_id,))
+    conn.executemany(
+        'INSERT INTO product_descriptions (product_id, lang, text) VALUES (?, ?, ?)',
+        [(product_id, lang, text) for lang, text in description_items(descriptions)]
+    )
+
+# 获取商品已保存的各语言描述 {语言: 文本}（不含回退，供编辑表单使用）
+def get_product_descriptions(product_id):
+    with db_connection(readonly=True) as conn:
+        rows = conn.execute(
+            'SELECT lang, text FROM product_descriptions WHERE product_id = ?', (product_id,)
+        ).fetchall()
+    return {row['lang']: row['text'] for row in rows}
+
+# 获取单个商品指定语言的描述，没有该语言时回退到中文（优先从商品缓存读取）
+def _load_description(product_id, lang):
+    cache = get_product_cache()
+    text = cache.get_description(product_id, lang)
+    if text is not None:
+        return text
+    
+    generation = cache.generation()
+    with db_connection(readonly=True) as conn:
+        row = conn.execute(
+            '''SELECT text FROM product_descriptions
+               WHERE product_id = ? AND lang IN (?, 'zh')
+               ORDER BY lang = 'zh' LIMIT 1''',
+            (product_id, lang)
+        ).fetchone()
+    text = row['text'] if row else ''
+    cache.put_description(product_id, lang, text, generation)
+    return text
+
+# 为一批需要显示描述的商品一次性加载当前语言（及中文回退）的描述
+def load_descriptions(products):
+    cache = get_product_cache()
+    pending = {}
+    for product in products:
+        if product._desc is None:
+            product._desc = cache.get_description(product['id'], product._lang)
+            if product._desc is None:
+                pending[product['id']] = product
+    if not pending:
+        return products
+    
+    found = {}
+    lang = next(iter(pending.values()))._lang
+    generation = cache.generation()
+    product_ids = list(pending)
+    with db_connection(readonly=True) as conn:
+        for start in range(0, len(product_ids), BULK_LOAD_CHUNK):
+            chunk = product_ids[start:start + BULK_LOAD_CHUNK]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = conn.execute(
+                f'''SELECT product_id, lang, text FROM product_descriptions
+                    WHERE lang IN (?, 'zh') AND product_id IN ({placeholders})''',
+                [lang] + chunk
+            ).fetchall()
+            for row in rows:
+                # 当前语言优先，中文只在没有当前语言时使用
+                if row['lang'] == lang or row['product_id'] not in found:
+                    found[row['product_id']] = row['text']
+    
+    for product_id, product in pending.items():
+        product._desc = found.get(product_id, '')
+        cache.put_description(product_id, lang, product._desc, generation)
     return products
 
+# 获取用户发布的商品（按发布时间从新到旧）
+# limit 为每页数量（None 表示全部）；cursor 是上一页最后一个商品的 (created_at_ms, id)，
+# 按 (created_at_ms, id) 做键集分页，翻到第几页都只需沿索引读取一页的数据
+def get_user_products(user_id, limit=None, cursor=None):
+    # 不包含已删除的商品；条件写成字面量，才能使用不含已删除商品的部分索引
+    query = "SELECT id FROM products WHERE user_id = ? AND status <> 'deleted'"
+    params = [user_id]
+    if cursor is not None:
+        query += ' AND (created_at_ms, id) < (?, ?)'
+        params.extend(cursor)
+    query += ' ORDER BY created_at_ms DESC, id DESC'
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    
+    with db_connection(readonly=True) as conn:
+        # 只获取产品ID列表
+        product_ids = [row['id'] for row in conn.execute(query, params).fetchall()]
+    
+    # 一次查询批量加载所有商品，以支持多语言描述
+    return get_products_by_ids(product_ids)
+
+# 商品在分页中的位置，作为下一页的 cursor
+def product_cursor(product):
+    return (product['created_at_ms'], product['id'])
+
+# 批量查询时每条 IN (...) 语句最多包含的ID数量（低于SQLite的绑定参数上限）
+BULK_LOAD_CHUNK = 500
+
+# 批量获取商品详情，按传入ID的顺序返回，不存在的ID会被跳过；
+# 先从进程级商品缓存读取，只查询未命中的商品
+def get_products_by_ids(product_ids):
+    product_ids = list(product_ids)
+    if not product_ids:
+        return []
+    
+    cache = get_product_cache()
+    rows_by_id, missing = cache.get_many(product_ids)
+    if missing:
+        generation = cache.generation()
+        loaded = []
+        with db_connection(readonly=True) as conn:
+            for start in range(0, len(missing), BULK_LOAD_CHUNK):
+                chunk = missing[start:start + BULK_LOAD_CHUNK]
+                placeholders = ', '.join('?' * len(chunk))
+                loaded.extend(conn.execute(f'SELECT * FROM products WHERE id IN ({placeholders})', chunk).fetchall())
+        cache.put_many(loaded, generation)
+        for row in loaded:
+            rows_by_id[row['id']] = row
+    
+    # 整批商品共用一次语言查询
+    lang = get_current_language()
+    return [ProductRecord(rows_by_id[product_id], lang) for product_id in product_ids if product_id in rows_by_id]
+
 # 获取商品详情
 def get_product_details(product_id):
-    conn = get_db_connection()
-    product = conn.execute('SELECT * FROM products WHERE id = ?', (product_id,)).fetchone()
-    conn.close()
+    products = get_products_by_ids([product_id])
     
     # 如果找不到产品，返回None
-    if not product:
+    if not products:
         return None
     
-    # 获取当前语言的描述
-    from language import get_current_language
-    current_lang = get_current_language()
+    return products[0]
+
+# 商品记录：直接包装 sqlite3.Row（字段值保存在紧凑的元组中），不复制到 __dict__；
+# 为了保持向后兼容性，product['description'] 返回创建时确定的语言的描述（没有时回退到中文），
+# 描述在第一次访问时才从 product_descriptions 加载，列表页需要显示描述时用 load_descriptions() 批量加载；
+# 同时支持 product['字段']、product.get() 和 product.字段 三种访问方式
+class ProductRecord:
+    __slots__ = ('_row', '_lang', '_desc')
     
-    # 为了保持向后兼容性，我们添加一个description属性，根据当前语言返回相应的描述
-    class ProductWithLangDesc:
-        def __init__(self, original_product):
-            # 将SQLite Row对象转换为可修改的字典
-            self.__dict__ = dict(original_product)
-            
-        def __getitem__(self, key):
-            if key == 'description':
-                # 根据当前语言返回相应的描述字段
-                lang_desc_key = f'description_{get_current_language()}'
-                # 如果特定语言的描述为空，则尝试回退到中文描述
-                if lang_desc_key in self.__dict__ and self.__dict__[lang_desc_key]:
-                    return self.__dict__[lang_desc_key]
-                elif 'description_zh' in self.__dict__ and self.__dict__['description_zh']:
-                    return self.__dict__['description_zh']
-                else:
-                    return ''
-            return self.__dict__[key]
-            
-        def get(self, key, default=None):
-            if key == 'description':
-                try:
-                    return self[key]
-                except KeyError:
-                    return default
-            return self.__dict__.get(key, default)
+    def __init__(self, row, lang):
+        self._row = row
+        self._lang = lang
+        self._desc = None
+    
+    def _description(self):
+        if self._desc is None:
+            self._desc = _load_description(self._row['id'], self._lang)
+        return self._desc
+    
+    def __getitem__(self, key):
+        if key == 'description':
+            return self._description()
+        try:
+            return self._row[key]
+        except IndexError:
+            pass
+        # 兼容旧的 description_zh 等字段：返回该语言已保存的描述，不回退
+        if key.startswith('description_') and key[len('description_'):] in LANGUAGES:
+            return get_product_descriptions(self._row['id']).get(key[len('description_'):])
+        raise KeyError(key)
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
     
-    return ProductWithLangDesc(product)
+    def __getattr__(self, name):
+        # 只有在 __slots__ 中找不到属性时才会调用，用于按属性访问字段
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+    
+    def keys(self):
+        return self._row.keys()
+    
+    def __repr__(self):
+        return f"ProductRecord(id={self._row['id']}, title={self._row['title']!r})"
 
 # 根据当前语言获取商品描述
 def get_product_description(product):
-    from language import get_current_language
+    if isinstance(product, ProductRecord):
+        return product['description']
+    
     current_lang = get_current_language()
     
     # 尝试获取当前语言的描述
@@ -127,66 +369,103 @@ def get_product_description(product):
 
 # 更新商品
 def update_product(product_id, title, descriptions, price, category, condition, contact_info, image_path=None):
-    conn = get_db_connection()
-    try:
-        # 准备更新语句
-        update_fields = ['title = ?', 'price = ?', 'category = ?', 'condition = ?', 'contact_info = ?']
-        update_values = [title, price, category, condition, contact_info]
-        
-        # 处理多语言描述字段
-        if isinstance(descriptions, dict):
-            # 为每种支持的语言设置描述
-            for lang in ['zh', 'en', 'ja', 'ko']:
-                update_fields.append(f'description_{lang} = ?')
-                update_values.append(descriptions.get(lang, ''))
-            # 设置默认description字段为中文描述（向后兼容）
-            update_fields.append('description = ?')
-            update_values.append(descriptions.get('zh', ''))
-        else:
-            # 向后兼容，单字符串描述
-            update_fields.append('description_zh = ?')
-            update_fields.append('description = ?')
-            update_values.append(descriptions)  # 同时更新zh版本和默认版本
-            # 其他语言保持为空
-            for lang in ['en', 'ja', 'ko']:
-                update_fields.append(f'description_{lang} = ?')
-                update_values.append('')
-        
-        # 如果提供了图片路径，则更新
-        if image_path:
-            update_fields.append('image_path = ?')
-            update_values.append(image_path)
-        
-        # 添加WHERE子句和product_id
-        update_values.append(product_id)
-        
-        # 构建SQL语句
-        sql = f"UPDATE products SET {', '.join(update_fields)} WHERE id = ?"
-        
-        # 执行更新
+    category, condition = category_code(category), condition_code(condition)
+    # 准备更新语句
+    update_fields = ['title = ?', 'price = ?', 'category = ?', 'condition = ?', 'contact_info = ?']
+    update_values = [title, price, category, condition, contact_info]
+
+    # 如果提供了图片路径，则更新
+    if image_path:
+        update_fields.append('image_path = ?')
+        update_values.append(image_path)
+
+    # 添加WHERE子句和product_id
+    update_values.append(product_id)
+
+    # 构建SQL语句
+    sql = f"UPDATE products SET {', '.join(update_fields)} WHERE id = ?"
+
+    # 由写线程执行，返回修改前的数据：类别变化时新旧类别的搜索缓存都要失效，筛选统计按新旧数据增量更新
+    def update(conn):
+        row = conn.execute(
+            'SELECT category, condition, price, status FROM products WHERE id = ?', (product_id,)
+        ).fetchone()
+        # 执行更新，描述在同一事务中整体替换
         conn.execute(sql, update_values)
-        conn.commit()
-        
-        return True, "商品更新成功！"
+        _save_descriptions(conn, product_id, descriptions)
+        index_products(conn, [product_id])
+        return row
+
+    try:
+        row = get_writer().run(update)
     except Exception as e:
-        conn.rollback()
         return False, f"更新失败: {str(e)}"
-    finally:
-        conn.close()
+    get_product_cache().invalidate(product_id)
+    if row:
+        invalidate_search_categories(category, row['category'])
+        record_listing_change(tuple(row), (category, condition, float(price), row['status']))
+        if row['status'] == STATUS_ACTIVE:
+            record_title_change(product_id, title)
+    return True, "商品更新成功！"
+
+# 商品状态：只有在售商品会出现在搜索结果和最新商品列表中
+STATUS_ACTIVE = 'active'
+STATUS_SOLD = 'sold'
+STATUS_EXPIRED = 'expired'
+STATUS_DELETED = 'deleted'
+LISTING_STATUSES = (STATUS_ACTIVE, STATUS_SOLD, STATUS_EXPIRED, STATUS_DELETED)
+
+# 修改商品状态
+def set_product_status(product_id, status):
+    error = _change_status(product_id, status)
+    if error:
+        return False, f"更新失败: {error}"
+    return True, t('product.status_updated')
+
+# 修改商品状态并更新缓存和索引，失败时返回原因；重新上架时发布时间更新为当前时间，避免立即再次过期
+def _change_status(product_id, status):
+    if status not in LISTING_STATUSES:
+        return f"未知状态 {status}"
+
+    # 由写线程执行，返回修改前的数据；商品不存在时返回 None
+    def update(conn):
+        row = conn.execute(
+            'SELECT category, condition, price, status, title FROM products WHERE id = ?', (product_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        now = now_ms()
+        if status == STATUS_ACTIVE:
+            conn.execute(
+                'UPDATE products SET status = ?, status_changed_ms = ?, created_at_ms = ? WHERE id = ?',
+                (status, now, now, product_id)
+            )
+        else:
+            conn.execute(
+                'UPDATE products SET status = ?, status_changed_ms = ? WHERE id = ?',
+                (status, now, product_id)
+            )
+        return row
 
-# 删除商品
-def delete_product(product_id):
-    conn = get_db_connection()
-    c = conn.cursor()
-    
     try:
-        c.execute('DELETE FROM products WHERE id = ?', (product_id,))
-        conn.commit()
-        return True, t('product.deleted_success')
+        row = get_writer().run(update)
     except Exception as e:
-        return False, f"删除失败: {str(e)}"
-    finally:
-        conn.close()
+        return str(e)
+    if row is None:
+        return "商品不存在"
+    get_product_cache().invalidate(product_id)
+    invalidate_search_categories(row['category'])
+    old = (row['category'], row['condition'], row['price'], row['status'])
+    record_listing_change(old, old[:3] + (status,))
+    record_title_change(product_id, row['title'] if status == STATUS_ACTIVE else None)
+    return None
+
+# 删除商品：只标记为已删除（按主键更新一行），商品行、相关消息和图片由后台清理任务分批删除
+def delete_product(product_id):
+    error = _change_status(product_id, STATUS_DELETED)
+    if error:
+        return False, f"删除失败: {error}"
+    return True, t('product.deleted_success')
 
 # 商品发布页面
 def product_publish_page():
@@ -196,16 +475,17 @@ def product_publish_page():
     
     st.title(t('page_titles.publish'))
     
+    mode = st.radio(t('product.publish_mode'), [t('product.single_publish'), t('product.batch_publish')],
+                    horizontal=True, key='publish_mode')
+    if mode == t('product.batch_publish'):
+        batch_publish_form()
+        return
+    
     with st.form("product_form"):
         title = st.text_input(t('product.product_name'))
-        category = st.selectbox(t('product.category'), 
-                               [t('product.categories.electronics'), t('product.categories.household'), 
-                                t('product.categories.clothing'), t('product.categories.books'), 
-                                t('product.categories.sports'), t('product.categories.other')])
-        condition = st.selectbox(t('product.condition'), 
-                                [t('product.conditions.new'), t('product.conditions.like_new'), 
-                                 t('product.conditions.minor_wear'), t('product.conditions.normal'), 
-                                 t('product.conditions.heavy_wear')])
+        # 选项是语言无关的代码，显示为当前语言
+        category = st.selectbox(t('product.category'), CATEGORY_CODES, format_func=category_label)
+        condition = st.selectbox(t('product.condition'), CONDITION_CODES, format_func=condition_label)
         price = st.number_input(t('product.price'), min_value=0.01, format="%.2f")
         
         # 多语言描述输入
@@ -240,21 +520,13 @@ def product_publish_page():
             # 检查必填字段
             if not all([title, category, condition, price, contact_info]):
                 st.error(t('product.fill_required'))
-            elif not any(descriptions.values()):  # 至少要有一个语言的描述
+            elif not description_items(descriptions):  # 至少要有一个语言的描述（只有空白的不算）
                 st.error(t('product.at_least_one_description_required'))
             else:
-                # 处理图片上传，实际保存到文件系统
+                # 处理图片上传：按内容哈希保存，缩略图在后台生成
                 image_path = None
                 if image:
-                    # 确保images目录存在
-                    import os
-                    if not os.path.exists('images'):
-                        os.makedirs('images')
-                    
-                    # 生成唯一的文件名并保存图片
-                    image_path = f"images/{datetime.now().timestamp()}_{image.name}"
-                    with open(image_path, "wb") as f:
-                        f.write(image.getbuffer())
+                    image_path = save_upload(image.getbuffer(), image.name)
                     st.success(f"图片已成功上传: {image.name}")
                 
                 success, message = publish_product(
@@ -267,6 +539,79 @@ def product_publish_page():
                 else:
                     st.error(message)
 
+# 批量发布表单：每行一个商品（描述使用当前语言），图片一次上传多张后按文件名对应到行
+def batch_publish_form():
+    current_lang = get_current_language()
+    st.info(t('product.batch_hint'))
+    
+    with st.form("batch_product_form"):
+        rows = st.data_editor(
+            [{'title': '', 'category': None, 'condition': None, 'price': None,
+              'contact_info': '', 'description': '', 'image': ''}],
+            num_rows="dynamic",
+            use_container_width=True,
+            key='batch_rows',
+            column_config={
+                'title': st.column_config.TextColumn(t('product.product_name')),
+                'category': st.column_config.SelectboxColumn(t('product.category'), options=CATEGORY_CODES,
+                                                             format_func=category_label),
+                'condition': st.column_config.SelectboxColumn(t('product.condition'), options=CONDITION_CODES,
+                                                              format_func=condition_label),
+                'price': st.column_config.NumberColumn(t('product.price'), min_value=0.01, format="%.2f"),
+                'contact_info': st.column_config.TextColumn(t('product.contact_info')),
+                'description': st.column_config.TextColumn(
+                    f"{t('product.product_description')} ({LANGUAGES[current_lang]})"),
+                'image': st.column_config.TextColumn(t('product.batch_image_file')),
+            }
+        )
+        images = st.file_uploader(t('product.batch_images'), type=["jpg", "jpeg", "png"],
+                                  accept_multiple_files=True)
+        submit = st.form_submit_button(t('product.batch_submit'))
+    
+    if not submit:
+        return
+    uploads = {image.name: image for image in images or []}
+    listings = []
+    row_numbers = []
+    missing_images = []
+    for number, row in enumerate(rows, start=1):
+        # 跳过完全空白的行
+        if not any(value not in (None, '') for value in row.values()):
+            continue
+        image_name = (row.get('image') or '').strip()
+        if image_name and image_name not in uploads:
+            missing_images.append((number, t('product.batch_image_missing', image_name)))
+            continue
+        listing = {
+            'title': (row.get('title') or '').strip(),
+            'descriptions': {current_lang: row.get('description') or ''},
+            'price': row.get('price'),
+            'category': row.get('category'),
+            'condition': row.get('condition'),
+            'contact_info': (row.get('contact_info') or '').strip(),
+        }
+        if image_name:
+            listing['image'] = (uploads[image_name].getbuffer(), image_name)
+        listings.append(listing)
+        row_numbers.append(number)
+    if not listings and not missing_images:
+        st.warning(t('product.batch_empty'))
+        return
+    
+    results = publish_products(st.session_state.user['id'], listings)
+    failures = missing_images + [(number, message) for number, (success, message) in zip(row_numbers, results)
+                                 if not success]
+    published = len(results) - sum(1 for success, _ in results if not success)
+    if published:
+        st.success(t('product.batch_result', published, len(failures)))
+    else:
+        st.error(t('product.batch_result', published, len(failures)))
+    for number, message in sorted(failures):
+        st.error(f"{t('product.batch_row', number)}: {message}")
+
+# 每页商品数量选项
+PAGE_SIZE_OPTIONS = [10, 20, 50]
+
 # 商品管理页面
 def product_management_page():
     if not st.session_state.get('user'):
@@ -274,32 +619,58 @@ def product_management_page():
         return
     
     st.title(t('page_titles.my_products'))
-    products = get_user_products(st.session_state.user['id'])
+    user_id = st.session_state.user['id']
+    
+    # 正在编辑的商品单独加载并显示在列表上方（不要求在当前页中）
+    editing_id = st.session_state.get('editing_product')
+    if editing_id is not None:
+        editing = get_product_details(editing_id)
+        if editing and editing['user_id'] == user_id:
+            product_edit_form(editing)
+        else:
+            del st.session_state.editing_product
+    
+    # 分页状态：my_products_cursors[i] 是第 i 页的起始 cursor（第一页为 None）
+    page_size = st.selectbox(t('product.page_size'), PAGE_SIZE_OPTIONS, key='my_products_page_size')
+    if st.session_state.get('my_products_cursor_size') != page_size:
+        st.session_state.my_products_cursor_size = page_size
+        st.session_state.my_products_cursors = [None]
+    cursors = st.session_state.my_products_cursors
+    
+    # 多取一个商品，用于判断是否还有下一页
+    products = get_user_products(user_id, limit=page_size + 1, cursor=cursors[-1])
+    has_next = len(products) > page_size
+    products = products[:page_size]
     
     if not products:
+        if len(cursors) > 1:
+            # 当前页的商品都已删除，回到上一页
+            cursors.pop()
+            st.rerun()
         st.info(t('product.no_products'))
         return
     
+    # 每个商品都会显示描述，一次查询批量加载
+    load_descriptions(products)
+    
     for product in products:
         with st.expander(f"{product['title']} - ¥{product['price']}"):
             col1, col2 = st.columns(2)
             with col1:
-                # 将数据库中的中文类别转换为当前语言
-                cat_key = get_category_key(product['category'])
-                st.write(f"{t('product.category')}: {t(f'product.categories.{cat_key}')}")
-                
-                # 将数据库中的中文新旧程度转换为当前语言
-                cond_key = get_condition_key(product['condition'])
-                st.write(f"{t('product.condition')}: {t(f'product.conditions.{cond_key}')}")
-                st.write(f"{t('product.created_at')}: {product['created_at']}")
+                # 类别和新旧程度按代码查表显示为当前语言
+                st.write(f"{t('product.category')}: {category_label(product['category'])}")
+                st.write(f"{t('product.condition')}: {condition_label(product['condition'])}")
+                st.write(f"{t('product.created_at')}: {format_timestamp(product['created_at_ms'])}")
+                status_key = product['status']
+                st.write(f"{t('product.status')}: {t(f'product.statuses.{status_key}')}")
                 st.write(f"{t('product.contact_info')}: {product['contact_info']}")
                 
                 # 如果有图片路径，先检查文件是否存在再显示
                 if product['image_path']:
-                    import os
-                    if os.path.exists(product['image_path']):
+                    image_path = image_for_width(product['image_path'], 200)
+                    if image_path:
                         st.subheader(t("product.product_image"))
-                        st.image(product['image_path'], width=200)
+                        st.image(image_path, width=200)
                     else:
                         st.warning(t("product.image_not_found"))
             
@@ -309,8 +680,21 @@ def product_management_page():
                 
                 # 编辑和删除功能
                 if st.button(t('product.edit'), key=f"edit_{product['id']}"):
-                    # 设置编辑状态，存储当前编辑的商品ID
+                    # 设置编辑状态，存储当前编辑的商品ID，重新渲染后显示编辑表单
                     st.session_state.editing_product = product['id']
+                    st.rerun()
+                
+                # 在售商品可标记为已售，已售或已过期的商品可重新上架
+                if product['status'] == STATUS_ACTIVE:
+                    new_status, status_label = STATUS_SOLD, t('product.mark_sold')
+                else:
+                    new_status, status_label = STATUS_ACTIVE, t('product.relist')
+                if st.button(status_label, key=f"status_{product['id']}"):
+                    success, message = set_product_status(product['id'], new_status)
+                    if success:
+                        st.rerun()
+                    else:
+                        st.error(message)
                     
                 if st.button(t('product.delete'), key=f"delete_{product['id']}", type="primary"):
                     # 显示确认对话框
@@ -331,133 +715,104 @@ def product_management_page():
                         st.session_state.confirming_delete = product['id']
                         # 刷新页面以显示确认状态
                         st.rerun()
+    
+    # 翻页按钮
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if len(cursors) > 1 and st.button(t('product.prev_page'), key='my_products_prev'):
+            cursors.pop()
+            st.rerun()
+    with col_page:
+        st.write(t('product.page_number', len(cursors)))
+    with col_next:
+        if has_next and st.button(t('product.next_page'), key='my_products_next'):
+            cursors.append(product_cursor(products[-1]))
+            st.rerun()
+
+# 商品编辑表单：只在点击"编辑"后渲染，此时才加载各语言描述
+def product_edit_form(product):
+    st.subheader(t('product.update_button'))
+    with st.form(f"edit_form_{product['id']}"):
+        # 预填充表单字段
+        edit_title = st.text_input(t('product.product_name'), value=product['title'])
+        # 选项是语言无关的代码，显示为当前语言；无法识别的旧值默认选中第一项
+        category = category_code(product['category'])
+        edit_category = st.selectbox(
+            t('product.category'),
+            CATEGORY_CODES,
+            index=CATEGORY_CODES.index(category) if category in CATEGORY_CODES else 0,
+            format_func=category_label
+        )
+        condition = condition_code(product['condition'])
+        edit_condition = st.selectbox(
+            t('product.condition'),
+            CONDITION_CODES,
+            index=CONDITION_CODES.index(condition) if condition in CONDITION_CODES else 0,
+            format_func=condition_label
+        )
+        edit_price = st.number_input(t('product.price'), min_value=0.01, format="%.2f", value=product['price'])
         
-        # 处理编辑功能
-        if 'editing_product' in st.session_state and st.session_state.editing_product == product['id']:
-            st.subheader(t('product.update_button'))
-            with st.form(f"edit_form_{product['id']}"):
-                # 预填充表单字段
-                edit_title = st.text_input(t('product.product_name'), value=product['title'])
-                # 获取当前商品类别的翻译键
-                current_category_key = get_category_key(product['category'])
-                current_category_text = t(f'product.categories.{current_category_key}')
-                
-                # 类别选项列表
-                category_options = [
-                    t('product.categories.electronics'),
-                    t('product.categories.household'),
-                    t('product.categories.clothing'),
-                    t('product.categories.books'),
-                    t('product.categories.sports'),
-                    t('product.categories.other')
-                ]
-                
-                # 找到当前类别的索引
-                category_index = category_options.index(current_category_text)
-                
-                edit_category = st.selectbox(
-                    t('product.category'),
-                    category_options,
-                    index=category_index
-                )
-                # 获取当前商品状态的翻译键
-                current_condition_key = get_condition_key(product['condition'])
-                current_condition_text = t(f'product.conditions.{current_condition_key}')
-                
-                # 状态选项列表
-                condition_options = [
-                    t('product.conditions.new'),
-                    t('product.conditions.like_new'),
-                    t('product.conditions.minor_wear'),
-                    t('product.conditions.normal'),
-                    t('product.conditions.heavy_wear')
-                ]
-                
-                # 找到当前状态的索引
-                condition_index = condition_options.index(current_condition_text)
-                
-                edit_condition = st.selectbox(
-                    t('product.condition'),
-                    condition_options,
-                    index=condition_index
-                )
-                edit_price = st.number_input(t('product.price'), min_value=0.01, format="%.2f", value=product['price'])
-                
-                # 多语言描述编辑
-                st.subheader(t('product.multilingual_description'))
-                edit_descriptions = {}
-                
-                # 获取当前语言
-                from language import get_current_language, LANGUAGES
-                current_lang = get_current_language()
-                
-                # 尝试从产品对象获取各语言描述
-                for lang in LANGUAGES.keys():
-                    desc_key = f'description_{lang}'
-                    # 如果有该语言的描述字段且存在值，则使用该值，否则使用当前语言的description
-                    if hasattr(product, desc_key) and getattr(product, desc_key):
-                        default_desc = getattr(product, desc_key)
-                    elif product.get(desc_key):
-                        default_desc = product[desc_key]
-                    else:
-                        default_desc = product['description']
-                    
-                    # 为每种语言创建文本区域
-                    edit_descriptions[lang] = st.text_area(
-                        f"{t('product.product_description')} ({LANGUAGES[lang]})",
-                        value=default_desc,
-                        key=f"edit_desc_{lang}_{product['id']}")
-                
-                # 保留原始edit_description变量以保持向后兼容
-                edit_description = edit_descriptions.get(current_lang, '')
-                edit_contact_info = st.text_input(t('product.contact_info'), value=product['contact_info'])
-                
-                # 图片上传功能（可选）
-                edit_image = st.file_uploader(t('product.upload_image'), type=["jpg", "jpeg", "png"], accept_multiple_files=False)
+        # 多语言描述编辑
+        st.subheader(t('product.multilingual_description'))
+        edit_descriptions = {}
+        
+        # 获取当前语言
+        from language import get_current_language, LANGUAGES
+        current_lang = get_current_language()
+        
+        # 只预填已保存的描述，未填写的语言保持为空（读取时会回退到中文）
+        stored_descriptions = get_product_descriptions(product['id'])
+        for lang in LANGUAGES.keys():
+            # 为每种语言创建文本区域
+            edit_descriptions[lang] = st.text_area(
+                f"{t('product.product_description')} ({LANGUAGES[lang]})",
+                value=stored_descriptions.get(lang, ''),
+                placeholder=t('product.optional_description'),
+                key=f"edit_desc_{lang}_{product['id']}")
+        
+        # 保留原始edit_description变量以保持向后兼容
+        edit_description = edit_descriptions.get(current_lang, '')
+        edit_contact_info = st.text_input(t('product.contact_info'), value=product['contact_info'])
+        
+        # 图片上传功能（可选）
+        edit_image = st.file_uploader(t('product.upload_image'), type=["jpg", "jpeg", "png"], accept_multiple_files=False)
+        
+        # 提交和取消按钮
+        col_submit, col_cancel = st.columns(2)
+        with col_submit:
+            submit_edit = st.form_submit_button(t('product.update_button'), type="primary")
+        with col_cancel:
+            cancel_edit = st.form_submit_button(t('common.cancel'))
+        
+        if submit_edit:
+            if not all([edit_title, edit_category, edit_condition, edit_price, edit_contact_info]):
+                st.error(t('product.fill_required'))
+            else:
+                # 处理图片（如果有新上传）
+                edit_image_path = product['image_path']  # 默认保留原图片
+                if edit_image:
+                    # 按内容哈希保存，缩略图在后台生成
+                    edit_image_path = save_upload(edit_image.getbuffer(), edit_image.name)
+                    st.success(f"图片已成功更新: {edit_image.name}")
                 
-                # 提交和取消按钮
-                col_submit, col_cancel = st.columns(2)
-                with col_submit:
-                    submit_edit = st.form_submit_button(t('product.update_button'), type="primary")
-                with col_cancel:
-                    cancel_edit = st.form_submit_button(t('common.cancel'))
+                # 检查必填字段
+                if not description_items(edit_descriptions):  # 至少要有一个语言的描述（只有空白的不算）
+                    st.error(t('product.at_least_one_description_required'))
+                else:
+                    success, message = update_product(
+                        product['id'],
+                        edit_title, edit_descriptions, edit_price, edit_category, edit_condition, edit_contact_info, edit_image_path
+                    )
                 
-                if submit_edit:
-                    if not all([edit_title, edit_category, edit_condition, edit_price, edit_description, edit_contact_info]):
-                        st.error(t('product.fill_required'))
+                    if success:
+                        st.success(message)
+                        # 清除编辑状态并重新加载页面
+                        del st.session_state.editing_product
+                        st.rerun()
                     else:
-                        # 处理图片（如果有新上传）
-                        edit_image_path = product['image_path']  # 默认保留原图片
-                        if edit_image:
-                            # 确保images目录存在
-                            import os
-                            if not os.path.exists('images'):
-                                os.makedirs('images')
-                            
-                            # 生成唯一的文件名并保存图片
-                            edit_image_path = f"images/{datetime.now().timestamp()}_{edit_image.name}"
-                            with open(edit_image_path, "wb") as f:
-                                f.write(edit_image.getbuffer())
-                            st.success(f"图片已成功更新: {edit_image.name}")
-                        
-                        # 检查必填字段
-                        if not any(edit_descriptions.values()):  # 至少要有一个语言的描述
-                            st.error(t('product.at_least_one_description_required'))
-                        else:
-                            success, message = update_product(
-                                product['id'],
-                                edit_title, edit_descriptions, edit_price, edit_category, edit_condition, edit_contact_info, edit_image_path
-                            )
-                        
-                        if success:
-                            st.success(message)
-                            # 清除编辑状态并重新加载页面
-                            del st.session_state.editing_product
-                            st.rerun()
-                        else:
-                            st.error(message)
-                
-                if cancel_edit:
-                    # 清除编辑状态并刷新页面
-                    del st.session_state.editing_product
-                    st.rerun()
+                        st.error(message)
+        
+        if cancel_edit:
+            # 清除编辑状态并刷新页面
+            del st.session_state.editing_product
+            st.rerun()
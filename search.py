@@ -1,55 +1,54 @@
+import math
 import streamlit as st
 import sqlite3
-from database import get_db_connection
+from database import db_connection
 from messages import show_contact_seller_button
 from language import t
+from time_utils import format_timestamp
+from image_store import image_for_width
+from text_search import build_match_query
+from search_cache import get_search_cache, normalize_keyword
+from facets import get_facets
+from suggestions import suggest_titles
+from listing_codes import category_code, category_label, condition_label
 
-# 创建反向映射，用于将数据库中的中文值映射到英文键名
-def get_category_key(category_text):
-    """根据分类文本获取对应的英文键名"""
-    category_mapping = {
-        "电子产品": "electronics",
-        "家居用品": "household",
-        "服装": "clothing",
-        "图书": "books",
-        "运动用品": "sports",
-        "其他": "other"
-    }
-    return category_mapping.get(category_text, category_text)
+# 列表缩略图和详情图的显示宽度（像素），用于选择合适的图片尺寸
+LIST_IMAGE_WIDTH = 200
+DETAIL_IMAGE_WIDTH = 700
 
-def get_condition_key(condition_text):
-    """根据新旧程度文本获取对应的英文键名"""
-    condition_mapping = {
-        "全新": "new",
-        "几乎全新": "like_new",
-        "轻微使用痕迹": "minor_wear",
-        "正常使用": "normal",
-        "使用较久": "heavy_wear"
-    }
-    return condition_mapping.get(condition_text, condition_text)
+# 搜索结果每页显示的商品数量，以及总数统计的上限（超过时显示为"上限+"，统计代价不随结果数增长）
+SEARCH_PAGE_SIZE = 30
+COUNT_LIMIT = 1000
 
-# 搜索商品
-def search_products(keyword=None, category=None, min_price=None, max_price=None, sort_by="created_at"):
-    conn = get_db_connection()
-    query = "SELECT * FROM products WHERE 1=1"
-    params = []
-    
-    if keyword:
-        query += " AND title LIKE ?"
-        params.append(f"%{keyword}%")
+# 搜索框下方显示的标题联想数量
+SEARCH_SUGGESTIONS = 5
+
+# 把筛选的类别转换为数据库中保存的代码（也接受任意语言的显示文本），"全部"或未选择时返回 None
+def _db_category(category):
+    if not category or category == t("search.all"):
+        return None
+    return category_code(category)
+
+# 填写了关键词，但其中没有可以匹配的字词（只有标点或空白）：这样的搜索没有结果，
+# 不能当作未填写关键词处理，否则会返回全部商品
+def _keyword_matches_nothing(keyword):
+    return bool(keyword) and not build_match_query(normalize_keyword(keyword))
+
+# 拼接搜索条件，返回 (FROM ... WHERE ... 语句, 参数, 是否使用全文索引)
+def _search_conditions(keyword, db_category, min_price, max_price):
+    # 只搜索在售商品；status 条件必须是字面量，才能使用只包含在售商品的部分索引
+    match_query = build_match_query(keyword) if keyword else ''
+    if match_query:
+        # 关键词通过全文索引匹配标题和各语言描述（中日韩文字按 bigram 匹配，见 text_search.py）
+        query = """FROM products_fts JOIN products ON products.id = products_fts.rowid
+                   WHERE products_fts MATCH ? AND status = 'active'"""
+        params = [match_query]
+    else:
+        query = "FROM products WHERE status = 'active'"
+        params = []
     
-    if category and category != t("search.all"):
+    if db_category is not None:
         query += " AND category = ?"
-        # 需要将当前语言的类别翻译回中文存储值
-        reverse_category_mapping = {
-            t('product.categories.electronics'): "电子产品",
-            t('product.categories.household'): "家居用品",
-            t('product.categories.clothing'): "服装",
-            t('product.categories.books'): "图书",
-            t('product.categories.sports'): "运动用品",
-            t('product.categories.other'): "其他"
-        }
-        db_category = reverse_category_mapping.get(category, category)
         params.append(db_category)
     
     if min_price is not None:
@@ -60,36 +59,126 @@ def search_products(keyword=None, category=None, min_price=None, max_price=None,
         query += " AND price <= ?"
         params.append(max_price)
     
-    # 排序
+    return query, params, bool(match_query)
+
+# 搜索商品：按 (排序键, id) 做 keyset 分页，cursor 为上一页最后一个商品的 (排序键, id)；
+# 按相关度排序时 BM25 得分随商品增删而变化，不能作为翻页位置，cursor 为已读取的结果数（OFFSET）。
+# 返回 (商品列表, 下一页的 cursor)，没有更多结果时 cursor 为 None；limit 为 None 时返回全部结果。
+# 分页查询的结果（商品ID）按规范化后的条件缓存在 search_cache 中
+def search_products(keyword=None, category=None, min_price=None, max_price=None, sort_by="created_at_ms",
+                    cursor=None, limit=None):
+    if _keyword_matches_nothing(keyword):
+        return [], None
+    keyword = normalize_keyword(keyword)
+    db_category = _db_category(category)
+    query, params, full_text = _search_conditions(keyword, db_category, min_price, max_price)
+    
+    # 排序：(排序键, 是否降序)，相同排序键按 id 同方向排序，保证翻页时顺序稳定
     order_map = {
-        t("search.sort_newest"): "created_at DESC",
-        t("search.sort_price_low"): "price ASC",
-        t("search.sort_price_high"): "price DESC"
+        t("search.sort_newest"): ("created_at_ms", True),
+        t("search.sort_price_low"): ("price", False),
+        t("search.sort_price_high"): ("price", True)
     }
-    query += f" ORDER BY {order_map.get(sort_by, 'created_at DESC')}"
+    # 按相关度排序（BM25 得分越小越相关）只在有关键词时可用，否则按最新上架
+    if full_text:
+        order_map[t("search.sort_relevance")] = ("products_fts.rank", False)
+    sort_key, descending = order_map.get(sort_by, ("created_at_ms", True))
+    by_offset = sort_key == "products_fts.rank"
     
-    # 获取产品ID列表
-    product_ids = [row['id'] for row in conn.execute(query, params).fetchall()]
-    conn.close()
-    
-    # 使用get_product_details函数处理每个产品，以支持多语言描述
-    from products import get_product_details
-    products = []
-    for product_id in product_ids:
-        product = get_product_details(product_id)
-        if product:
-            products.append(product)
+    # 缓存键使用数据库中的类别和排序字段，与界面语言无关；不分页的查询不缓存，避免单个条目过大
+    cache = get_search_cache()
+    cache_key = ('page', db_category, keyword, min_price, max_price, sort_key, descending, cursor, limit)
+    cached = cache.get(cache_key) if limit is not None else None
+    if cached is None:
+        generation = cache.generation()
+        if cursor is not None and not by_offset:
+            query += f" AND ({sort_key}, products.id) {'<' if descending else '>'} (?, ?)"
+            params.extend(cursor)
+        direction = 'DESC' if descending else 'ASC'
+        query = f"SELECT products.id, {sort_key} AS sort_key {query} ORDER BY {sort_key} {direction}, products.id {direction}"
+        # 多取一条，用来判断是否还有下一页
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit + 1)
+            if by_offset and cursor:
+                query += " OFFSET ?"
+                params.append(cursor)
+        
+        # 获取产品ID列表
+        with db_connection(readonly=True) as conn:
+            rows = conn.execute(query, params).fetchall()
+        
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (cursor or 0) + limit if by_offset else (rows[-1]['sort_key'], rows[-1]['id'])
+        cached = (tuple(row['id'] for row in rows), next_cursor)
+        if limit is not None:
+            cache.put(cache_key, cached, generation)
+    product_ids, next_cursor = cached
     
-    return products
+    # 一次查询批量加载所有商品（保持排序），以支持多语言描述；
+    # 缓存的ID列表可能包含之后售出或删除的商品，只返回仍在售的商品
+    from products import get_products_by_ids, STATUS_ACTIVE
+    products = [product for product in get_products_by_ids(product_ids) if product['status'] == STATUS_ACTIVE]
+    return products, next_cursor
+
+# 统计符合条件的商品数量，最多数到 COUNT_LIMIT；返回 (数量, 是否达到上限)
+def count_search_results(keyword=None, category=None, min_price=None, max_price=None):
+    if _keyword_matches_nothing(keyword):
+        return 0, False
+    keyword = normalize_keyword(keyword)
+    db_category = _db_category(category)
+    cache = get_search_cache()
+    cache_key = ('count', db_category, keyword, min_price, max_price)
+    cached = cache.get(cache_key)
+    if cached is None:
+        generation = cache.generation()
+        query, params, _ = _search_conditions(keyword, db_category, min_price, max_price)
+        with db_connection(readonly=True) as conn:
+            count = conn.execute(f"SELECT COUNT(*) FROM (SELECT 1 {query} LIMIT ?)",
+                                 params + [COUNT_LIMIT + 1]).fetchone()[0]
+        cached = (min(count, COUNT_LIMIT), count > COUNT_LIMIT)
+        cache.put(cache_key, cached, generation)
+    return cached
 
-# 获取所有商品类别
+# 获取所有在售商品的类别代码（来自筛选统计，按商品数量从多到少排列）
 def get_all_categories():
-    conn = get_db_connection()
-    categories = [row['category'] for row in conn.execute('SELECT DISTINCT category FROM products').fetchall()]
-    conn.close()
-    
-    # 直接返回数据库中的类别，不进行翻译
-    return [t("search.all")] + categories
+    return list(get_facets()['categories'])
+
+# 价格滑块的范围：按在售商品的最低/最高价格取整，没有商品时使用默认范围
+def price_slider_bounds(facets):
+    if facets['min_price'] is None:
+        return 0.0, 10000.0
+    low = float(math.floor(facets['min_price']))
+    high = float(math.ceil(facets['max_price']))
+    return low, max(high, low + 1.0)
+
+# 读取当前搜索的结果：session_state 中只记录已加载的页数（"加载更多"时加一），筛选条件或排序变化时重置为1；
+# 每次重新运行都按页重新读取，各页和总数来自搜索缓存（商品变化时相关条目已失效），
+# 所以新发布的商品会出现，售出、下架的商品不会继续显示。返回 {'products', 'next_cursor', 'total'}
+def load_search_results(filters, sort_by):
+    key = (tuple(sorted(filters.items())), sort_by)
+    state = st.session_state.get('search_results')
+    if state is None or state['key'] != key:
+        state = {'key': key, 'pages': 1}
+        st.session_state.search_results = state
+    products = []
+    seen = set()
+    cursor = None
+    for _ in range(state['pages']):
+        page, cursor = search_products(**filters, sort_by=sort_by, cursor=cursor, limit=SEARCH_PAGE_SIZE)
+        # 按相关度翻页时各页可能在商品变化前后分别读取，去掉重复的商品
+        products.extend(product for product in page if product['id'] not in seen)
+        seen.update(product['id'] for product in page)
+        if cursor is None:
+            break
+    return {'products': products, 'next_cursor': cursor, 'total': count_search_results(**filters)}
+
+# 点击联想标题：填入搜索框并立即搜索（回调在页面重新运行前执行，可以修改搜索框的值）
+def _apply_suggestion(title):
+    st.session_state.search_keyword = title
+    st.session_state.search_requested = True
 
 # 搜索页面
 def search_page():
@@ -97,34 +186,62 @@ def search_page():
     
     # 搜索条件
     col1, col2 = st.columns(2)
+    # 筛选统计在内存中维护，每次重新运行不查询数据库
+    facets = get_facets()
     with col1:
-        keyword = st.text_input(t("search.search_bar"))
-        category = st.selectbox(t("search.filter_category"), get_all_categories())
+        keyword = st.text_input(t("search.search_bar"), key="search_keyword")
+        # 标题联想显示在搜索框下方，但要在处理搜索按钮之后再填入（见下文）
+        suggestion_box = st.container()
+        # 选项是类别代码（None 表示全部），显示为当前语言的名称和商品数量
+        category_counts = facets['categories']
+        category = st.selectbox(
+            t("search.filter_category"), [None] + get_all_categories(),
+            format_func=lambda code: (f"{t('search.all')} ({facets['total']})" if code is None
+                                      else f"{category_label(code)} ({category_counts.get(code, 0)})"))
     
     with col2:
-        price_range = st.slider(t("search.price_range"), 0.0, 10000.0, (0.0, 5000.0))
+        low, high = price_slider_bounds(facets)
+        price_range = st.slider(t("search.price_range"), low, high, (low, high))
         sort_by = st.selectbox(t("search.sort_price"), 
                              [t("search.sort_newest"), 
                               t("search.sort_price_low"), 
-                              t("search.sort_price_high")])
-    
-    if st.button(t("search.search_button")):
-        products = search_products(
-            keyword=keyword,
-            category=category,
-            min_price=price_range[0],
-            max_price=price_range[1],
-            sort_by=sort_by
-        )
-        
-        display_search_results(products)
-    else:
-        # 默认显示最新商品
-        products = search_products(sort_by=sort_by)
-        display_search_results(products)
+                              t("search.sort_price_high"),
+                              t("search.sort_relevance")])
+    
+    # 点击搜索（或联想标题）后保存筛选条件，翻页和查看详情时保持不变；未搜索时默认显示最新商品
+    search_requested = st.session_state.pop('search_requested', False)
+    if st.button(t("search.search_button")) or search_requested:
+        st.session_state.search_filters = {
+            'keyword': keyword,
+            'category': category,
+            'min_price': price_range[0],
+            'max_price': price_range[1],
+        }
+        # 再次点击搜索时重新查询（条件未变也刷新结果）
+        st.session_state.pop('search_results', None)
+    filters = st.session_state.get('search_filters', {})
+    
+    # 输入了新的关键词但还没有搜索时，显示以它开头的商品标题（内存索引查找，不访问数据库）；
+    # 与已保存的筛选条件比较，点击搜索的这次运行不会显示刚搜索过的关键词的联想
+    if keyword and keyword != filters.get('keyword'):
+        suggestions = suggest_titles(keyword, SEARCH_SUGGESTIONS)
+        if suggestions:
+            with suggestion_box:
+                st.caption(t("search.suggestions"))
+                for i, title in enumerate(suggestions):
+                    st.button(title, key=f"suggest_{i}", on_click=_apply_suggestion, args=(title,))
+    results = load_search_results(filters, sort_by)
+    
+    display_search_results(results['products'], results['total'])
+    
+    # 加载下一页，追加到已显示的结果之后
+    if 'showing_detail' not in st.session_state and results['next_cursor'] is not None:
+        if st.button(t("search.load_more"), key="search_load_more"):
+            st.session_state.search_results['pages'] += 1
+            st.rerun()
 
-# 显示搜索结果
-def display_search_results(products):
+# 显示搜索结果；total 为 count_search_results() 的结果
+def display_search_results(products, total=None):
     if not products:
         st.info(t("search.no_results"))
         return
@@ -142,20 +259,26 @@ def display_search_results(products):
         return
     
     # 如果没有点击详情按钮，则显示商品列表
-    st.subheader(f"{t('search.results_found')} {len(products)} {t('search.products')}")
+    if total is None:
+        count = str(len(products))
+    else:
+        count = f"{total[0]}+" if total[1] else str(total[0])
+    st.subheader(f"{t('search.results_found')} {count} {t('search.products')}")
+    if total is not None and len(products) < total[0]:
+        st.caption(t("search.showing", len(products)))
     
     # 网格布局显示商品
     cols = st.columns(3)
     for i, product in enumerate(products):
         with cols[i % 3]:
             st.subheader(product['title'])
-            # 将数据库中的中文类别转换为当前语言
-            cat_key = get_category_key(product['category'])
-            st.write(f"{t('product.category')}: {t(f'product.categories.{cat_key}')}")
-            
-            # 将数据库中的中文新旧程度转换为当前语言
-            cond_key = get_condition_key(product['condition'])
-            st.write(f"{t('product.condition')}: {t(f'product.conditions.{cond_key}')}")
+            # 列表中只显示缩略图
+            thumbnail = image_for_width(product['image_path'], LIST_IMAGE_WIDTH)
+            if thumbnail:
+                st.image(thumbnail, width=LIST_IMAGE_WIDTH)
+            # 类别和新旧程度按代码查表显示为当前语言
+            st.write(f"{t('product.category')}: {category_label(product['category'])}")
+            st.write(f"{t('product.condition')}: {condition_label(product['condition'])}")
             
             st.write(f"{t('product.price')}: ¥{product['price']}")
             
@@ -168,23 +291,18 @@ def display_search_results(products):
 # 显示商品详情
 def show_product_detail(product):
     st.title(product['title'])
-    st.write(f"{t('product.created_at')}: {product['created_at']}")
+    st.write(f"{t('product.created_at')}: {format_timestamp(product['created_at_ms'])}")
     
     # 获取卖家信息
-    conn = get_db_connection()
-    seller = conn.execute("SELECT username FROM users WHERE id = ?", (product['user_id'],)).fetchone()
-    conn.close()
+    with db_connection(readonly=True) as conn:
+        seller = conn.execute("SELECT username FROM users WHERE id = ?", (product['user_id'],)).fetchone()
     
     col1, col2 = st.columns(2)
     with col1:
         st.subheader(t("product.info"))
-        # 将数据库中的中文类别转换为当前语言
-        cat_key = get_category_key(product['category'])
-        st.write(f"{t('product.category')}: {t(f'product.categories.{cat_key}')}")
-        
-        # 将数据库中的中文新旧程度转换为当前语言
-        cond_key = get_condition_key(product['condition'])
-        st.write(f"{t('product.condition')}: {t(f'product.conditions.{cond_key}')}")
+        # 类别和新旧程度按代码查表显示为当前语言
+        st.write(f"{t('product.category')}: {category_label(product['category'])}")
+        st.write(f"{t('product.condition')}: {condition_label(product['condition'])}")
         st.write(f"{t('product.price')}: ¥{product['price']}")
         st.write(f"{t('product.seller')}: {seller['username']}" if seller else t("product.seller_info_unavailable"))
         
@@ -197,10 +315,10 @@ def show_product_detail(product):
         
         # 如果有图片，显示图片
         if product['image_path']:
-            import os
-            if os.path.exists(product['image_path']):
+            image_path = image_for_width(product['image_path'], DETAIL_IMAGE_WIDTH)
+            if image_path:
                 st.subheader(t("product.product_image"))
-                st.image(product['image_path'])
+                st.image(image_path)
             else:
                 st.warning(t("product.image_not_found"))
     
@@ -0,0 +1,166 @@
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import statistics
+from migrations import apply_migrations, DESCRIPTION_LANGS
+from text_search import build_match_query, rebuild_product_fts
+
+# 搜索基准测试：在临时数据库中生成中日韩英混合的商品，对比以下几种关键词搜索的召回率和耗时：
+#   like_title   原来的 title LIKE '%关键词%'（只搜索标题）
+#   like_all     标题和所有描述都用 LIKE 扫描（作为召回率的参照结果）
+#   fts_plain    FTS5 unicode61 分词（不做中日韩分词，即版本8的索引）
+#   fts_cjk      FTS5 + 中日韩 bigram 分词（当前的搜索实现）
+# 召回率 = 命中的参照结果数 / 参照结果数，精确率 = 命中的参照结果数 / 返回结果数。
+#
+# 用法：
+#   python search_benchmark.py [--products 30000] [--repeat 5] [--seed 42]
+
+_ZH_WORDS = ['苹果', '手机', '手机壳', '笔记本', '电脑', '耳机', '充电器', '自行车', '山地车', '台灯',
+             '书架', '沙发', '羽绒服', '运动鞋', '篮球', '吉他', '相机', '镜头', '小说', '教材',
+             '二手', '全新', '九成新', '包邮', '正品', '原装', '蓝牙', '无线', '儿童', '学生']
+_JA_WORDS = ['カメラ', 'レンズ', 'スマホ', 'ケース', 'ノートパソコン', 'イヤホン', '自転車', '本棚',
+             'ソファ', 'ギター', '中古', '新品', '美品', '送料無料', '純正', 'ワイヤレス', '漫画', '参考書']
+_KO_WORDS = ['카메라', '렌즈', '휴대폰', '케이스', '노트북', '이어폰', '자전거', '책장', '소파',
+             '기타', '중고', '새상품', '정품', '무선', '만화책', '교재', '운동화', '패딩']
+_EN_WORDS = ['camera', 'lens', 'phone', 'case', 'laptop', 'earphones', 'bicycle', 'bookshelf', 'sofa',
+             'guitar', 'used', 'new', 'original', 'wireless', 'charger', 'jacket', 'sneakers', 'novel']
+
+# 按语言生成标题/描述：中文和日文词之间不加空格，韩文和英文用空格分隔
+_LANG_WORDS = {'zh': (_ZH_WORDS, ''), 'ja': (_JA_WORDS, ''), 'ko': (_KO_WORDS, ' '), 'en': (_EN_WORDS, ' ')}
+
+# 测试查询：整词、词的一部分（中日韩子串、英文前缀和中缀）以及单字
+QUERIES = ['手机', '手机壳', '机壳', '九成新', '成新', '山地车', '书', '蓝牙耳机',
+           'カメラ', 'メラ', 'ノートパソコン', 'パソコン', '中古',
+           '카메라', '메라', '자전거', '중고',
+           'camera', 'cam', 'phone', 'book', 'wireless charger']
+
+_METHODS = ('like_title', 'like_all', 'fts_plain', 'fts_cjk')
+
+
+def _text(rng, lang, words):
+    vocabulary, separator = _LANG_WORDS[lang]
+    return separator.join(rng.choice(vocabulary) for _ in range(words))
+
+
+# 生成测试数据：每个商品一个主要语言，部分商品另有英文描述
+def seed(conn, products, rng):
+    conn.execute("INSERT INTO users (username, email, password) VALUES ('bench', 'bench@example.com', 'x')")
+    now = int(time.time() * 1000)
+    rows = []
+    descriptions = []
+    for product_id in range(1, products + 1):
+        lang = rng.choice(DESCRIPTION_LANGS)
+        rows.append((product_id, _text(rng, lang, rng.randint(2, 4)), round(rng.uniform(1, 5000), 2),
+                     now - rng.randint(0, 90 * 24 * 3600 * 1000)))
+        descriptions.append((product_id, lang, _text(rng, lang, rng.randint(5, 15))))
+        if lang != 'en' and rng.random() < 0.3:
+            descriptions.append((product_id, 'en', _text(rng, 'en', rng.randint(5, 10))))
+    conn.executemany(
+        '''INSERT INTO products (id, user_id, title, price, category, condition, contact_info, created_at_ms)
+           VALUES (?, 1, ?, ?, 'other', 'new', 'x', ?)''', rows)
+    conn.executemany('INSERT INTO product_descriptions (product_id, lang, text) VALUES (?, ?, ?)', descriptions)
+    rebuild_product_fts(conn)
+
+    # 不做中日韩分词的对照索引（与版本8的 products_fts 相同）
+    columns = ', '.join(f'description_{lang}' for lang in DESCRIPTION_LANGS)
+    conn.execute(f"CREATE VIRTUAL TABLE products_fts_plain USING fts5(title, {columns}, "
+                 f"tokenize = 'unicode61 remove_diacritics 2')")
+    values = ', '.join(f"(SELECT text FROM product_descriptions WHERE product_id = products.id AND lang = '{lang}')"
+                       for lang in DESCRIPTION_LANGS)
+    conn.execute(f'INSERT INTO products_fts_plain (rowid, title, {columns}) SELECT id, title, {values} FROM products')
+    conn.commit()
+    conn.execute('ANALYZE')
+
+
+# 每种方法的查询语句和参数
+def method_query(method, keyword):
+    words = keyword.split()
+    if method == 'like_title':
+        conditions = ' AND '.join('title LIKE ?' for _ in words)
+        return (f"SELECT id FROM products WHERE status = 'active' AND {conditions} ORDER BY created_at_ms DESC",
+                [f'%{word}%' for word in words])
+    if method == 'like_all':
+        conditions = ' AND '.join(
+            '(title LIKE ? OR EXISTS (SELECT 1 FROM product_descriptions d '
+            'WHERE d.product_id = products.id AND d.text LIKE ?))' for _ in words)
+        params = [param for word in words for param in (f'%{word}%', f'%{word}%')]
+        return (f"SELECT id FROM products WHERE status = 'active' AND {conditions} ORDER BY created_at_ms DESC",
+                params)
+    if method == 'fts_plain':
+        match = ' '.join('"' + word.replace('"', '""') + '"*' for word in words)
+        table = 'products_fts_plain'
+    else:
+        match = build_match_query(keyword)
+        table = 'products_fts'
+    return (f"""SELECT products.id FROM {table} JOIN products ON products.id = {table}.rowid
+                WHERE {table} MATCH ? AND status = 'active' ORDER BY {table}.rank""", [match])
+
+
+def run_benchmark(conn, queries=QUERIES, repeat=5):
+    results = []
+    for keyword in queries:
+        entry = {'keyword': keyword}
+        found = {}
+        for method in _METHODS:
+            sql, params = method_query(method, keyword)
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                ids = {row[0] for row in conn.execute(sql, params)}
+                timings.append((time.perf_counter() - started) * 1000)
+            found[method] = ids
+            entry[f'{method}_ms'] = statistics.median(timings)
+        reference = found['like_all']
+        entry['reference'] = len(reference)
+        for method in _METHODS:
+            hits = len(found[method] & reference)
+            entry[f'{method}_recall'] = hits / len(reference) if reference else 1.0
+            entry[f'{method}_precision'] = hits / len(found[method]) if found[method] else 1.0
+        results.append(entry)
+    return results
+
+
+def print_results(results, products):
+    print(f"商品数: {products}，耗时为中位数（毫秒），召回率以 like_all 为参照")
+    header = f"{'关键词':<14}{'参照':>6}" + ''.join(f"{method:>22}" for method in _METHODS)
+    print(header)
+    for entry in results:
+        cells = ''.join(
+            f"{entry[f'{method}_recall']:>8.0%} {entry[f'{method}_precision']:>5.0%} {entry[f'{method}_ms']:>6.2f}ms"
+            for method in _METHODS)
+        print(f"{entry['keyword']:<14}{entry['reference']:>6}{cells}")
+    print("（每列依次为 召回率 精确率 耗时）")
+    print("平均：")
+    for method in _METHODS:
+        recall = statistics.mean(entry[f'{method}_recall'] for entry in results)
+        latency = statistics.mean(entry[f'{method}_ms'] for entry in results)
+        print(f"  {method:<12} 召回率 {recall:.1%}，耗时 {latency:.2f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='关键词搜索基准测试')
+    parser.add_argument('--products', type=int, default=30000, help='生成的商品数量')
+    parser.add_argument('--repeat', type=int, default=5, help='每个查询重复执行的次数')
+    parser.add_argument('--seed', type=int, default=42, help='随机数种子')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'search_benchmark.db')
+        apply_migrations(path)
+        conn = sqlite3.connect(path)
+        try:
+            started = time.perf_counter()
+            seed(conn, args.products, random.Random(args.seed))
+            print(f"生成数据和索引用时 {time.perf_counter() - started:.1f} 秒")
+            print_results(run_benchmark(conn, repeat=args.repeat), args.products)
+        finally:
+            conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import unicodedata
+import streamlit as st
+from ttl_cache import TTLCache
+
+# 进程级搜索结果缓存：按规范化后的搜索条件缓存一页结果的商品ID（以及下一页的 cursor）和结果总数，
+# 不保存商品数据本身（商品行由 product_cache 缓存）。
+# 超过容量时淘汰最久未使用的条目，超过有效期的条目在读取时丢弃；
+# 发布、修改、下架或删除商品后，按商品类别使相关条目失效（未按类别筛选的条目总是失效）
+
+# 缓存的条目数量上限和有效期（秒）
+SEARCH_CACHE_MAX_SIZE = 1000
+SEARCH_CACHE_TTL = 60.0
+
+
+# 规范化关键词：全角/半角统一、忽略大小写，多个空白合并为一个空格
+def normalize_keyword(keyword):
+    if not keyword:
+        return ''
+    return ' '.join(unicodedata.normalize('NFKC', keyword).lower().split())
+
+
+class SearchCache(TTLCache):
+    def __init__(self, max_size=SEARCH_CACHE_MAX_SIZE, ttl=SEARCH_CACHE_TTL):
+        # 缓存键的第二项是数据库中的类别（None 表示所有类别）
+        super().__init__(max_size, ttl)
+
+    # 某些类别的商品发生变化后调用：删除这些类别以及未按类别筛选的条目
+    def invalidate_categories(self, categories):
+        categories = set(categories)
+        with self._lock:
+            self._invalidate([key for key in self._entries if key[1] is None or key[1] in categories])
+
+
+@st.cache_resource
+def get_search_cache():
+    return SearchCache()
+
+
+# 获取搜索缓存统计信息
+def get_search_cache_stats():
+    return get_search_cache().stats()
+
+
+# 商品发布、修改或状态变化后调用，传入涉及的类别（修改类别时新旧类别都要传入）
+def invalidate_search_categories(*categories):
+    get_search_cache().invalidate_categories(categories)
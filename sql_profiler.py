@@ -0,0 +1,244 @@
+import sqlite3
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+import streamlit as st
+
+# SQL 性能统计：为连接池中的连接计时每条语句，记录调用函数、慢查询和每次页面渲染的汇总
+
+# 是否启用统计（SQL_PROFILING=0 可关闭）以及慢查询阈值（毫秒）
+PROFILING_ENABLED = os.environ.get('SQL_PROFILING', '1') != '0'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+
+logger = logging.getLogger('sql')
+slow_logger = logging.getLogger('sql.slow')
+
+# 查找调用函数时需要跳过的文件（本模块、database.py 和 contextlib）
+_SKIP_FILES = {__file__}
+
+# 进程级按调用函数汇总的统计
+_totals = {}
+_totals_lock = threading.Lock()
+
+# 当前线程（即当前 Streamlit 会话的脚本线程）正在进行的渲染统计
+_local = threading.local()
+
+# 语句收集（供索引诊断工具使用），为 None 时不收集
+_captured = None
+
+
+# 注册需要在调用栈中跳过的模块文件
+def skip_module_file(path):
+    _SKIP_FILES.add(path)
+
+
+# 找到发起查询的业务函数名，例如 search_products、get_message_history；
+# 在 tagged() 范围内（如写线程代提交者执行的写操作）直接使用指定的名称
+def _caller_tag():
+    tag = getattr(_local, 'tag', None)
+    if tag is not None:
+        return tag
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename not in _SKIP_FILES and not filename.endswith('contextlib.py'):
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return '?'
+
+
+# 在调用方线程记下发起操作的业务函数名，稍后在其他线程执行时通过 tagged() 使用
+def caller_tag():
+    return _caller_tag()
+
+
+# 范围内当前线程执行的语句都计入 tag
+@contextmanager
+def tagged(tag):
+    previous = getattr(_local, 'tag', None)
+    _local.tag = tag
+    try:
+        yield
+    finally:
+        _local.tag = previous
+
+
+# 隐去绑定参数的具体值，只保留类型，避免在日志中泄露用户数据
+def redact_params(params):
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+def _compact_sql(sql):
+    return ' '.join(sql.split())
+
+
+# 记录一次统计（执行或读取结果）
+def _record(tag, elapsed, queries=0, rows=0):
+    with _totals_lock:
+        entry = _totals.get(tag)
+        if entry is None:
+            entry = _totals[tag] = {'queries': 0, 'time': 0.0, 'rows': 0}
+        entry['queries'] += queries
+        entry['time'] += elapsed
+        entry['rows'] += rows
+
+    render = getattr(_local, 'render', None)
+    if render is not None:
+        render['queries'] += queries
+        render['time'] += elapsed
+        render['rows'] += rows
+        by_tag = render['by_tag'].setdefault(tag, [0, 0.0])
+        by_tag[0] += queries
+        by_tag[1] += elapsed
+
+
+def _log_slow(tag, sql, params, elapsed):
+    slow_logger.warning(json.dumps({
+        'event': 'slow_query',
+        'caller': tag,
+        'ms': round(elapsed * 1000, 2),
+        'sql': _compact_sql(sql),
+        'params': redact_params(params),
+    }, ensure_ascii=False))
+
+
+# 带计时的游标：执行和读取结果的耗时都计入发起查询的函数
+class InstrumentedCursor(sqlite3.Cursor):
+    _tag = '?'
+    _sql = ''
+    _params = None
+    _elapsed = 0.0
+    _slow_logged = False
+
+    def _start(self, sql, params):
+        self._tag = _caller_tag()
+        if _captured is not None:
+            _captured.setdefault(sql, (self._tag, params))
+        self._sql = sql
+        self._params = params
+        self._elapsed = 0.0
+        self._slow_logged = False
+
+    def _add(self, elapsed, queries=0, rows=0):
+        self._elapsed += elapsed
+        _record(self._tag, elapsed, queries, rows)
+        if not self._slow_logged and self._elapsed * 1000 >= SLOW_QUERY_MS:
+            self._slow_logged = True
+            _log_slow(self._tag, self._sql, self._params, self._elapsed)
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._add(time.perf_counter() - start, queries=1)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql, None)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._add(time.perf_counter() - start, queries=1)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._add(time.perf_counter() - start, rows=0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add(time.perf_counter() - start, rows=len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._add(time.perf_counter() - start, rows=len(rows))
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        row = super().__next__()
+        self._add(time.perf_counter() - start, rows=1)
+        return row
+
+
+# 带计时的连接：conn.execute()/conn.cursor() 都返回 InstrumentedCursor
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = InstrumentedCursor if PROFILING_ENABLED else sqlite3.Cursor
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# 开始一次页面渲染的统计（在 main() 开头调用）
+def begin_render():
+    _local.render = {'queries': 0, 'time': 0.0, 'rows': 0, 'by_tag': {},
+                     'started': time.perf_counter()}
+
+
+# 结束本次渲染的统计，记录汇总日志并保存到 session_state
+def end_render():
+    render = getattr(_local, 'render', None)
+    _local.render = None
+    if render is None:
+        return None
+
+    summary = {
+        'event': 'render_sql_summary',
+        'queries': render['queries'],
+        'sql_ms': round(render['time'] * 1000, 2),
+        'rows': render['rows'],
+        'render_ms': round((time.perf_counter() - render['started']) * 1000, 2),
+        'by_caller': {tag: {'queries': q, 'ms': round(t * 1000, 2)}
+                      for tag, (q, t) in sorted(render['by_tag'].items(),
+                                                key=lambda item: -item[1][1])},
+    }
+    logger.info(json.dumps(summary, ensure_ascii=False))
+    try:
+        st.session_state['sql_render_stats'] = summary
+    except Exception:
+        # 不在 Streamlit 会话中运行（如命令行脚本）时忽略
+        pass
+    return summary
+
+
+# 收集期间执行过的所有不同SQL语句：{sql: (调用函数, 第一次执行时的参数)}
+@contextmanager
+def capture_statements():
+    global _captured
+    captured = {}
+    _captured = captured
+    try:
+        yield captured
+    finally:
+        _captured = None
+
+
+# 进程启动以来按调用函数汇总的统计
+def get_query_totals():
+    with _totals_lock:
+        return {tag: dict(entry) for tag, entry in _totals.items()}
+
+
+def reset_query_totals():
+    with _totals_lock:
+        _totals.clear()
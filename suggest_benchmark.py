@@ -0,0 +1,109 @@
+import sys
+import time
+import random
+import argparse
+import statistics
+import tracemalloc
+from search_benchmark import _text
+from migrations import DESCRIPTION_LANGS
+from search_cache import normalize_keyword
+from suggestions import SuggestIndex, SUGGEST_LIMIT
+
+# 标题联想基准测试：在内存中生成中日韩英混合的商品标题，建立 SuggestIndex，测量：
+#   - 建立索引的耗时和占用的内存（tracemalloc 统计，不含已生成的标题字符串本身）
+#   - 不同长度前缀的查找耗时（前缀取自随机标题的开头和词的开头，也包含没有结果的前缀）
+#   - 增量加入和移除一个标题的耗时
+#
+# 用法：
+#   python suggest_benchmark.py [--titles 100000] [--queries 5000] [--seed 42]
+
+
+def generate_titles(count, rng):
+    return [(product_id, _text(rng, rng.choice(DESCRIPTION_LANGS), rng.randint(2, 4)))
+            for product_id in range(1, count + 1)]
+
+
+# 测试前缀：随机标题开头或某个词开头的 1~6 个字符，另有一成是不存在的前缀
+def generate_prefixes(titles, count, rng):
+    prefixes = []
+    for _ in range(count):
+        if rng.random() < 0.1:
+            prefixes.append('zzz' + str(rng.randint(0, 999)))
+            continue
+        words = normalize_keyword(rng.choice(titles)[1]).split(' ')
+        word = ' '.join(words[rng.randrange(len(words)):])
+        prefixes.append(word[:rng.randint(1, 6)])
+    return prefixes
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def _summary(timings):
+    return (f"中位数 {statistics.median(timings) * 1000:.1f}µs，p99 {_percentile(timings, 0.99) * 1000:.1f}µs，"
+            f"最大 {max(timings) * 1000:.1f}µs")
+
+
+def run_benchmark(titles, prefixes, limit=SUGGEST_LIMIT):
+    # 内存用单独建立的一份索引统计（tracemalloc 会明显拖慢建立速度）
+    tracemalloc.start()
+    traced = SuggestIndex(max_titles=len(titles))
+    traced.load(titles)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del traced
+    index = SuggestIndex(max_titles=len(titles))
+    started = time.perf_counter()
+    index.load(titles)
+    build_seconds = time.perf_counter() - started
+    stats = index.stats()
+    print(f"标题数 {stats['titles']}，索引条目 {stats['keys']}，建立用时 {build_seconds:.2f} 秒，"
+          f"占用内存约 {memory / 1024 / 1024:.1f} MB")
+
+    # 按前缀长度分组统计查找耗时（毫秒）
+    by_length = {}
+    found = 0
+    for prefix in prefixes:
+        started = time.perf_counter()
+        suggestions = index.lookup(prefix, limit)
+        by_length.setdefault(min(len(prefix), 6), []).append((time.perf_counter() - started) * 1000)
+        found += bool(suggestions)
+    all_timings = [timing for timings in by_length.values() for timing in timings]
+    print(f"查找 {len(prefixes)} 次（每次最多 {limit} 条，{found} 次有结果）：{_summary(all_timings)}")
+    for length in sorted(by_length):
+        print(f"  前缀 {length} 个字符{'以上' if length == 6 else ''}：{_summary(by_length[length])}")
+
+    # 增量更新：加入新标题（超过上限时淘汰最早的标题）后再移除
+    next_id = len(titles) + 1
+    put_timings = []
+    remove_timings = []
+    for product_id, title in titles[:1000]:
+        started = time.perf_counter()
+        index.put(next_id, title)
+        put_timings.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        index.remove(next_id)
+        remove_timings.append((time.perf_counter() - started) * 1000)
+        next_id += 1
+    print(f"加入一个标题：{_summary(put_timings)}")
+    print(f"移除一个标题：{_summary(remove_timings)}")
+    return statistics.median(all_timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='标题联想基准测试')
+    parser.add_argument('--titles', type=int, default=100000, help='生成的标题数量')
+    parser.add_argument('--queries', type=int, default=5000, help='查找次数')
+    parser.add_argument('--seed', type=int, default=42, help='随机数种子')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    titles = generate_titles(args.titles, rng)
+    run_benchmark(titles, generate_prefixes(titles, args.queries, rng))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
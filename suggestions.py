@@ -0,0 +1,184 @@
+import time
+import bisect
+import threading
+import streamlit as st
+from database import db_connection
+from search_cache import normalize_keyword
+
+# 搜索框的标题联想（输入前缀，返回匹配的商品标题）：
+# 在售商品的规范化标题保存在进程内存中一个按 (键, 商品ID) 排序的列表里，查找时用 bisect 定位前缀，
+# 只扫描以该前缀开头的少量条目，不访问数据库。每个标题的键是整个标题以及从第2、3个词开始的部分，
+# 所以输入标题中间某个词的开头也能匹配（中日韩文字不以空格分词，只按标题开头匹配）。
+# 启动时加载，发布、修改、下架商品时增量更新，定期重新加载一次以包含其他进程（如批量导入）的改动。
+# 最多保存最新发布的 SUGGEST_MAX_TITLES 个标题，超过时淘汰最早加入的标题。
+
+# 内存上限：保存的标题数量和每个标题的键数量
+SUGGEST_MAX_TITLES = 100000
+SUGGEST_KEYS_PER_TITLE = 3
+
+# 每次返回的联想数量，以及每次查找最多扫描的条目数（大量标题以同一前缀开头时限制查找耗时）
+SUGGEST_LIMIT = 8
+SUGGEST_SCAN_LIMIT = 200
+
+# 完整重新加载的间隔（秒）
+SUGGEST_REFRESH_INTERVAL = 600.0
+
+
+# 标题的索引键：规范化后的整个标题，以及从后面几个词开始的部分
+def title_keys(title, max_keys=SUGGEST_KEYS_PER_TITLE):
+    words = normalize_keyword(title).split(' ')
+    keys = []
+    for start in range(min(len(words), max_keys)):
+        key = ' '.join(words[start:])
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+# 读取最新发布的在售商品标题，按发布时间从早到晚排列（淘汰时先淘汰最早的）
+def load_suggest_rows(conn, limit=SUGGEST_MAX_TITLES):
+    return conn.execute('''
+        SELECT id, title FROM (
+            SELECT id, title, created_at_ms FROM products WHERE status = 'active'
+            ORDER BY created_at_ms DESC LIMIT ?
+        ) ORDER BY created_at_ms
+    ''', (limit,)).fetchall()
+
+
+class SuggestIndex:
+    def __init__(self, max_titles=SUGGEST_MAX_TITLES, refresh_interval=SUGGEST_REFRESH_INTERVAL):
+        self.max_titles = max_titles
+        self.refresh_interval = refresh_interval
+        # 按 (键, 商品ID) 排序的列表；商品ID → (标题, 键列表)，按加入顺序排列
+        self._keys = None
+        self._titles = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        # 每次变化加一；重新加载期间有变化时，下次查找再加载一次
+        self._generation = 0
+        self._lookups = 0
+        self._updates = 0
+        self._evictions = 0
+        self._refreshes = 0
+
+    # 用 (商品ID, 标题) 列表重建索引，列表按加入顺序（发布时间从早到晚）排列
+    def load(self, rows):
+        titles = {}
+        for product_id, title in rows[-self.max_titles:]:
+            titles[product_id] = (title, title_keys(title))
+        keys = sorted((key, product_id) for product_id, (_, entry_keys) in titles.items() for key in entry_keys)
+        with self._lock:
+            self._titles = titles
+            self._keys = keys
+            self._refreshes += 1
+
+    # 首次查找或超过刷新间隔时从数据库重新加载；启动时调用一次以预先加载
+    def ensure_loaded(self):
+        with self._lock:
+            if self._keys is not None and time.monotonic() - self._loaded_at < self.refresh_interval:
+                return
+            generation = self._generation
+        with db_connection(readonly=True) as conn:
+            rows = [(row['id'], row['title']) for row in load_suggest_rows(conn, self.max_titles)]
+        self.load(rows)
+        with self._lock:
+            # 加载期间有变化时，结果可能不包含这些变化，下次查找重新加载
+            self._loaded_at = time.monotonic() if generation == self._generation else 0.0
+
+    # 返回以 prefix 开头（规范化后比较）的商品标题，相同标题只返回一次
+    def suggest(self, prefix, limit=SUGGEST_LIMIT):
+        prefix = normalize_keyword(prefix)
+        if not prefix:
+            return []
+        self.ensure_loaded()
+        return self.lookup(prefix, limit)
+
+    # 在已加载的索引中查找，prefix 须已规范化
+    def lookup(self, prefix, limit=SUGGEST_LIMIT):
+        suggestions = []
+        seen = set()
+        with self._lock:
+            self._lookups += 1
+            keys = self._keys or []
+            start = bisect.bisect_left(keys, (prefix,))
+            for key, product_id in keys[start:start + SUGGEST_SCAN_LIMIT]:
+                if not key.startswith(prefix):
+                    break
+                # 第一个键是规范化后的整个标题，用来去掉重复的标题
+                title, entry_keys = self._titles[product_id]
+                if entry_keys[0] not in seen:
+                    seen.add(entry_keys[0])
+                    suggestions.append(title)
+                    if len(suggestions) >= limit:
+                        break
+        return suggestions
+
+    # 增量更新：商品上架或修改标题后加入（已有的先移除），超过上限时淘汰最早加入的标题
+    def put(self, product_id, title):
+        with self._lock:
+            self._generation += 1
+            self._updates += 1
+            if self._keys is None:
+                return
+            self._remove(product_id)
+            keys = title_keys(title)
+            self._titles[product_id] = (title, keys)
+            for key in keys:
+                bisect.insort(self._keys, (key, product_id))
+            while len(self._titles) > self.max_titles:
+                self._remove(next(iter(self._titles)))
+                self._evictions += 1
+
+    # 增量更新：商品下架、售出或删除后移除
+    def remove(self, product_id):
+        with self._lock:
+            self._generation += 1
+            self._updates += 1
+            if self._keys is not None:
+                self._remove(product_id)
+
+    def _remove(self, product_id):
+        entry = self._titles.pop(product_id, None)
+        if entry is None:
+            return
+        for key in entry[1]:
+            index = bisect.bisect_left(self._keys, (key, product_id))
+            if index < len(self._keys) and self._keys[index] == (key, product_id):
+                del self._keys[index]
+
+    # 无法增量更新时调用，下次查找时重新加载
+    def mark_stale(self):
+        with self._lock:
+            self._generation += 1
+            self._loaded_at = 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'loaded': self._keys is not None,
+                'titles': len(self._titles),
+                'keys': len(self._keys or []),
+                'max_titles': self.max_titles,
+                'lookups': self._lookups,
+                'updates': self._updates,
+                'evictions': self._evictions,
+                'refreshes': self._refreshes,
+            }
+
+
+@st.cache_resource
+def get_suggest_index():
+    return SuggestIndex()
+
+
+# 搜索框联想：返回以 prefix 开头的商品标题
+def suggest_titles(prefix, limit=SUGGEST_LIMIT):
+    return get_suggest_index().suggest(prefix, limit)
+
+
+# 商品变化后调用：title 为 None 表示商品不再在售（下架、售出、删除）
+def record_title_change(product_id, title):
+    if title is None:
+        get_suggest_index().remove(product_id)
+    else:
+        get_suggest_index().put(product_id, title)
@@ -0,0 +1,61 @@
+from product_cache import ProductCache
+from search_cache import SearchCache, normalize_keyword
+
+
+def test_lru_eviction_and_ttl_expiry():
+    cache = SearchCache(max_size=2)
+    generation = cache.generation()
+    cache.put(('page', None, 'a'), 'A', generation)
+    cache.put(('page', None, 'b'), 'B', generation)
+    assert cache.get(('page', None, 'a')) == 'A'
+    # 'b' 最久未使用，加入第三个条目时被淘汰
+    cache.put(('page', None, 'c'), 'C', generation)
+    assert cache.get(('page', None, 'b')) is None
+    assert cache.get(('page', None, 'c')) == 'C'
+
+    expired = SearchCache(ttl=0.0)
+    expired.put(('page', None, 'a'), 'A', expired.generation())
+    assert expired.get(('page', None, 'a')) is None
+    stats = cache.stats()
+    assert (stats['evictions'], stats['hits'], stats['misses']) == (1, 2, 1)
+    assert expired.stats()['expirations'] == 1
+
+
+def test_search_cache_invalidates_category_and_unfiltered_entries():
+    cache = SearchCache()
+    generation = cache.generation()
+    for category in ('books', 'sports', None):
+        cache.put(('page', category, ''), category, generation)
+    cache.invalidate_categories(['books'])
+    assert cache.get(('page', 'books', '')) is None
+    assert cache.get(('page', None, '')) is None
+    assert cache.get(('page', 'sports', '')) == 'sports'
+
+
+def test_results_read_before_invalidation_are_not_written_back():
+    cache = SearchCache()
+    generation = cache.generation()
+    cache.invalidate_categories(['books'])
+    cache.put(('page', 'books', ''), 'stale', generation)
+    assert cache.get(('page', 'books', '')) is None
+
+    products = ProductCache()
+    generation = products.generation()
+    products.invalidate(1)
+    products.put_many([{'id': 1}], generation)
+    assert products.get_many([1]) == ({}, [1])
+
+
+def test_product_cache_keeps_descriptions_with_row():
+    cache = ProductCache()
+    cache.put_many([{'id': 1, 'title': 'a'}], cache.generation())
+    cache.put_description(1, 'zh', '描述', cache.generation())
+    assert cache.get_many([1, 2]) == ({1: {'id': 1, 'title': 'a'}}, [2])
+    assert cache.get_description(1, 'zh') == '描述'
+    cache.invalidate(1)
+    assert cache.get_description(1, 'zh') is None
+
+
+def test_normalize_keyword():
+    assert normalize_keyword('  ＡＢＣ   自行车 ') == 'abc 自行车'
+    assert normalize_keyword(None) == ''
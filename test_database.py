@@ -0,0 +1,54 @@
+import pytest
+from database import ConnectionPool
+from migrations import apply_migrations
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'pool.db')
+    apply_migrations(path)
+    return path
+
+
+def test_pool_reuses_connections_and_limits_checkouts(db_path):
+    pool = ConnectionPool(db_path, max_size=2, timeout=0.1)
+    try:
+        first = pool.acquire()
+        second = pool.acquire()
+        assert pool.stats()['in_use'] == 2
+        with pytest.raises(TimeoutError):
+            pool.acquire()
+
+        # close() 把连接归还到连接池，下次借出的是同一个连接
+        first.close()
+        assert pool.acquire() is first
+        pool.release(first)
+        pool.release(second)
+
+        stats = pool.stats()
+        assert (stats['created'], stats['in_use'], stats['idle'], stats['timeouts']) == (2, 0, 2, 1)
+    finally:
+        pool.close_all()
+
+
+def test_release_rolls_back_open_transaction(db_path):
+    pool = ConnectionPool(db_path, max_size=1)
+    try:
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO users (username, email, password) VALUES ('u', 'u@example.com', 'x')")
+            assert conn.in_transaction
+        with pool.connection() as conn:
+            assert not conn.in_transaction
+            assert conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 0
+    finally:
+        pool.close_all()
+
+
+def test_readonly_pool_rejects_writes(db_path):
+    pool = ConnectionPool(db_path, readonly=True)
+    try:
+        with pool.connection() as conn:
+            with pytest.raises(Exception, match='readonly'):
+                conn.execute("INSERT INTO users (username, email, password) VALUES ('u', 'u@example.com', 'x')")
+    finally:
+        pool.close_all()
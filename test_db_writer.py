@@ -0,0 +1,76 @@
+import sqlite3
+import threading
+import pytest
+from db_writer import DatabaseWriter
+
+
+@pytest.fixture
+def writer(tmp_path):
+    path = str(tmp_path / 'writer.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE items (value INTEGER UNIQUE)')
+    conn.close()
+    writer = DatabaseWriter(lambda: sqlite3.connect(path))
+    yield writer, path
+    writer.close(timeout=5)
+
+
+def _values(path):
+    conn = sqlite3.connect(path)
+    try:
+        return sorted(row[0] for row in conn.execute('SELECT value FROM items'))
+    finally:
+        conn.close()
+
+
+# 先提交一个等待中的写操作占住写线程，之后提交的写操作会合并到同一次提交
+def _hold_writer(writer):
+    release = threading.Event()
+    writer.submit_func(lambda conn: release.wait(5))
+    return release
+
+
+def test_failed_job_rolls_back_only_its_own_savepoint(writer):
+    writer, path = writer
+    release = _hold_writer(writer)
+
+    def partial_then_fail(conn):
+        conn.execute('INSERT INTO items (value) VALUES (2)')
+        raise ValueError('boom')
+
+    first = writer.submit('INSERT INTO items (value) VALUES (?)', (1,))
+    failing = writer.submit_func(partial_then_fail)
+    duplicate = writer.submit('INSERT INTO items (value) VALUES (?)', (1,))
+    last = writer.submit('INSERT INTO items (value) VALUES (?)', (3,))
+    release.set()
+
+    assert first.result(5).rowcount == 1
+    with pytest.raises(ValueError):
+        failing.result(5)
+    with pytest.raises(sqlite3.IntegrityError):
+        duplicate.result(5)
+    assert last.result(5).rowcount == 1
+
+    # 失败的写操作（包括已执行的部分）被回滚，同批次的其他写操作已提交
+    assert _values(path) == [1, 3]
+    stats = writer.stats()
+    assert stats['failed'] == 2
+    assert stats['batch_max'] >= 4
+
+
+def test_run_returns_function_result(writer):
+    writer, path = writer
+    assert writer.run(lambda conn: conn.execute('INSERT INTO items (value) VALUES (5)').rowcount) == 1
+    assert writer.execute('INSERT INTO items (value) VALUES (?)', (6,)).lastrowid == 2
+    assert _values(path) == [5, 6]
+
+
+def test_writer_that_cannot_connect_fails_pending_and_new_jobs():
+    def connect():
+        raise sqlite3.OperationalError('unable to open database file')
+
+    writer = DatabaseWriter(connect)
+    writer._thread.join(5)
+    assert not writer.is_alive()
+    with pytest.raises(sqlite3.OperationalError):
+        writer.execute('SELECT 1', timeout=5)
@@ -0,0 +1,74 @@
+import sqlite3
+from datetime import datetime
+from migrations import apply_migrations, get_schema_version, LATEST_VERSION
+from text_search import build_match_query
+
+
+# 只执行基础表结构（版本1），写入旧版格式的数据
+def _baseline_database(path):
+    assert apply_migrations(path, target=1) == [1]
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO users (username, email, password) VALUES ('u', 'u@example.com', 'x')")
+    conn.execute('''INSERT INTO products (user_id, title, description, description_zh, description_en, price,
+                                          category, condition, contact_info, created_at)
+                    VALUES (1, '二手自行车', NULL, '九成新的山地车', 'mountain bike', 120, '运动用品', '全新',
+                            '13800000000', '2024-01-02 03:04:05')''')
+    conn.execute("INSERT INTO messages (sender_id, receiver_id, content, created_at) "
+                 "VALUES (1, 1, 'hi', '2024-01-02 03:04:05.250')")
+    conn.commit()
+    conn.close()
+
+
+def test_baseline_migrates_to_latest(tmp_path):
+    path = str(tmp_path / 'market.db')
+    _baseline_database(path)
+
+    assert apply_migrations(path) == list(range(2, LATEST_VERSION + 1))
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    assert get_schema_version(conn) == LATEST_VERSION
+
+    # 时间按本地时间回填为毫秒时间戳
+    expected = int(datetime(2024, 1, 2, 3, 4, 5).timestamp() * 1000)
+    product = conn.execute('SELECT * FROM products WHERE id = 1').fetchone()
+    assert product['created_at_ms'] == expected
+    assert conn.execute('SELECT created_at_ms FROM messages').fetchone()[0] == expected + 250
+
+    # 已有商品为在售，类别和新旧程度换成代码，描述拆分到 product_descriptions
+    assert product['status'] == 'active'
+    assert (product['category'], product['condition']) == ('sports', 'new')
+    descriptions = dict(conn.execute('SELECT lang, text FROM product_descriptions WHERE product_id = 1'))
+    assert descriptions == {'zh': '九成新的山地车', 'en': 'mountain bike'}
+
+    # 全文索引包含已有商品，中文按 bigram 匹配标题和描述的一部分
+    for keyword in ('自行车', '山地', 'mountain'):
+        rows = conn.execute('SELECT rowid FROM products_fts WHERE products_fts MATCH ?',
+                            (build_match_query(keyword),)).fetchall()
+        assert [row[0] for row in rows] == [1]
+    conn.close()
+
+
+def test_latest_schema_has_no_udf_triggers(tmp_path):
+    path = str(tmp_path / 'market.db')
+    apply_migrations(path)
+
+    # 没有注册 cjk_segment() 的普通连接也能写入商品和描述
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'").fetchone()[0] == 0
+    conn.execute("INSERT INTO users (username, email, password) VALUES ('u', 'u@example.com', 'x')")
+    conn.execute("INSERT INTO products (user_id, title, price, contact_info) VALUES (1, 'lamp', 1, 'x')")
+    conn.execute("INSERT INTO product_descriptions (product_id, lang, text) VALUES (1, 'zh', '台灯')")
+    conn.commit()
+    conn.close()
+
+
+def test_apply_migrations_is_idempotent_and_respects_target(tmp_path):
+    path = str(tmp_path / 'market.db')
+    assert apply_migrations(path, target=3) == [1, 2, 3]
+    conn = sqlite3.connect(path)
+    assert get_schema_version(conn) == 3
+    conn.close()
+
+    assert apply_migrations(path) == list(range(4, LATEST_VERSION + 1))
+    assert apply_migrations(path) == []
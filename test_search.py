@@ -0,0 +1,71 @@
+import pytest
+from auth import register_user
+from database import db_connection
+from language import t
+from products import publish_products, set_product_status, STATUS_SOLD
+from search import search_products, SEARCH_PAGE_SIZE
+from search_cache import get_search_cache
+
+SORTS = ('search.sort_newest', 'search.sort_price_low', 'search.sort_price_high')
+
+
+# 同一批发布的商品发布时间相同，价格也有重复，翻页必须按 id 区分排序键相同的商品
+@pytest.fixture(scope='module')
+def user_id():
+    register_user('seller', 'seller@example.com', 'x')
+    with db_connection(readonly=True) as conn:
+        user_id = conn.execute("SELECT id FROM users WHERE username = 'seller'").fetchone()[0]
+    listings = [{'title': f'自行车 {i}', 'category': 'sports', 'condition': 'new', 'price': i % 7 + 1,
+                 'contact_info': 'x', 'descriptions': {'zh': '山地车' * (i % 3 + 1)}}
+                for i in range(2 * SEARCH_PAGE_SIZE + 5)]
+    assert all(success for success, _ in publish_products(user_id, listings))
+    return user_id
+
+
+def _active_ids():
+    with db_connection(readonly=True) as conn:
+        return {row[0] for row in conn.execute("SELECT id FROM products WHERE status = 'active'")}
+
+
+def _all_pages(**kwargs):
+    ids = []
+    cursor = None
+    while True:
+        page, cursor = search_products(cursor=cursor, limit=SEARCH_PAGE_SIZE, **kwargs)
+        ids.extend(product['id'] for product in page)
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize('sort', SORTS)
+def test_keyset_pages_have_no_duplicates_or_gaps(user_id, sort):
+    ids = _all_pages(sort_by=t(sort))
+    assert len(ids) == len(set(ids))
+    assert set(ids) == _active_ids()
+
+
+def test_relevance_pages_have_no_duplicates_or_gaps(user_id):
+    ids = _all_pages(keyword='自行车', sort_by=t('search.sort_relevance'))
+    assert len(ids) == len(set(ids))
+    assert set(ids) == _active_ids()
+
+
+def test_status_change_and_publish_invalidate_cached_results(user_id):
+    first_page = [product['id'] for product in search_products(sort_by=t('search.sort_newest'),
+                                                                limit=SEARCH_PAGE_SIZE)[0]]
+    hits = get_search_cache().stats()['hits']
+    assert [product['id'] for product in search_products(sort_by=t('search.sort_newest'),
+                                                         limit=SEARCH_PAGE_SIZE)[0]] == first_page
+    assert get_search_cache().stats()['hits'] == hits + 1
+
+    sold = first_page[0]
+    assert set_product_status(sold, STATUS_SOLD)[0]
+    assert sold not in _all_pages(sort_by=t('search.sort_newest'))
+    assert sold not in [product['id'] for product in search_products(keyword='自行车', limit=SEARCH_PAGE_SIZE)[0]]
+
+    listing = {'title': '台灯', 'category': 'household', 'condition': 'new', 'price': 9,
+               'contact_info': 'x', 'descriptions': {'zh': '护眼台灯'}}
+    assert publish_products(user_id, [listing])[0][0]
+    newest, _ = search_products(sort_by=t('search.sort_newest'), limit=SEARCH_PAGE_SIZE)
+    assert newest[0]['title'] == '台灯'
+    assert [product['title'] for product in search_products(keyword='台灯', limit=SEARCH_PAGE_SIZE)[0]] == ['台灯']
@@ -0,0 +1,119 @@
+import re
+
+# 全文索引的中日韩分词：FTS5 的 unicode61 分词器只按空白和标点切分，整段中文会被当作一个词，
+# 搜索其中的一部分无法命中。写入索引前把连续的中日韩文字展开为相邻两字（bigram）和单字，
+# 查询时按同样的规则转换：两个字以上的词按 bigram 短语匹配（要求相邻，相当于子串匹配），
+# 单字匹配单字词；其他文字保持原样，由 unicode61 分词并按前缀匹配。
+#
+# 全文索引 products_fts 由应用维护：写入商品标题或描述的同一事务中调用 index_products() 更新这些商品的
+# 索引行，删除商品时删除对应的索引行；用其他工具修改过商品后用 rebuild_product_fts() 重建
+# （python migrations.py rebuild-fts）。版本9~11的触发器通过 SQL 函数 cjk_segment() 分词，
+# 迁移到这些版本的连接须先调用 register_sql_functions()（迁移工具已经处理）。
+
+# 汉字（含扩展A和兼容汉字）、平假名、片假名（不含间隔号・）、谚文
+CJK_RUN = re.compile('[\u3040-\u30fa\u30fc-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+                     '\u1100-\u11ff\u3130-\u318f\uac00-\ud7af]+')
+
+
+# 一段连续的中日韩文字展开为 bigram（按原顺序相邻）和单字
+def cjk_grams(run):
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)] + list(run)
+
+
+# 索引时的分词：返回写入 FTS 表的文本
+def segment_text(text):
+    if not text:
+        return text
+    parts = []
+    pos = 0
+    for match in CJK_RUN.finditer(text):
+        parts.append(text[pos:match.start()])
+        parts.append(' ' + ' '.join(cjk_grams(match.group())) + ' ')
+        pos = match.end()
+    parts.append(text[pos:])
+    return ''.join(parts)
+
+
+def _quote(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+# 查询时的分词：把用户输入的关键词转换为 FTS5 查询，各部分之间为 AND。
+# 关键词只有标点或空白时返回空字符串，调用方应视为没有结果（见 search.py），而不是不按关键词筛选
+def build_match_query(keyword):
+    clauses = []
+
+    # 只含标点的部分不会产生任何词，跳过
+    def add_other(text):
+        if any(ch.isalnum() for ch in text):
+            clauses.append(_quote(text) + '*')
+
+    for term in keyword.split():
+        pos = 0
+        for match in CJK_RUN.finditer(term):
+            add_other(term[pos:match.start()])
+            run = match.group()
+            # 单字匹配单字词，两个字以上按相邻的 bigram 短语匹配
+            grams = [run] if len(run) == 1 else [run[i:i + 2] for i in range(len(run) - 1)]
+            clauses.append(_quote(' '.join(grams)))
+            pos = match.end()
+        add_other(term[pos:])
+    return ' '.join(clauses)
+
+
+# 注册版本9的触发器使用的 SQL 函数
+def register_sql_functions(conn):
+    conn.create_function('cjk_segment', 1, segment_text, deterministic=True)
+
+
+# 每条语句最多绑定的商品ID数量
+FTS_BATCH = 500
+
+
+# products_fts 中描述列对应的语言（列名为 description_<语言>）
+def _fts_langs(conn):
+    return [row[1][len('description_'):] for row in conn.execute('PRAGMA table_info(products_fts)').fetchall()
+            if row[1].startswith('description_')]
+
+
+# 在调用方的事务中重新写入这些商品的索引行（商品和描述须已写入），不存在的商品只删除索引行
+def index_products(conn, product_ids):
+    ids = list(product_ids)
+    if not ids:
+        return
+    langs = _fts_langs(conn)
+    columns = ', '.join(['title'] + [f'description_{lang}' for lang in langs])
+    values = ', '.join('?' * (len(langs) + 2))
+    for start in range(0, len(ids), FTS_BATCH):
+        chunk = ids[start:start + FTS_BATCH]
+        placeholders = ', '.join('?' * len(chunk))
+        conn.execute(f'DELETE FROM products_fts WHERE rowid IN ({placeholders})', chunk)
+        texts = {row[0]: {'title': row[1]} for row in
+                 conn.execute(f'SELECT id, title FROM products WHERE id IN ({placeholders})', chunk)}
+        for product_id, lang, text in conn.execute(
+                f'SELECT product_id, lang, text FROM product_descriptions WHERE product_id IN ({placeholders})',
+                chunk):
+            texts[product_id][lang] = text
+        conn.executemany(
+            f'INSERT INTO products_fts (rowid, {columns}) VALUES ({values})',
+            [(product_id, segment_text(text['title'])) + tuple(segment_text(text.get(lang)) for lang in langs)
+             for product_id, text in texts.items()]
+        )
+
+
+# 在调用方的事务中删除这些商品的索引行
+def unindex_products(conn, product_ids):
+    ids = list(product_ids)
+    for start in range(0, len(ids), FTS_BATCH):
+        chunk = ids[start:start + FTS_BATCH]
+        conn.execute(f"DELETE FROM products_fts WHERE rowid IN ({', '.join('?' * len(chunk))})", chunk)
+
+
+# 按 products 和 product_descriptions 重建整个全文索引，返回写入的商品数量
+def rebuild_product_fts(conn):
+    conn.execute('DELETE FROM products_fts')
+    ids = [row[0] for row in conn.execute('SELECT id FROM products ORDER BY id').fetchall()]
+    index_products(conn, ids)
+    return len(ids)
@@ -0,0 +1,52 @@
+import time
+from datetime import datetime, timezone
+
+# 时间工具：数据库中的时间统一存储为整数毫秒时间戳（*_ms 字段），
+# 排序、范围筛选和分组都直接比较整数，只在显示时转换为本地时间。
+
+
+# 当前时间的毫秒时间戳
+def now_ms():
+    return int(time.time() * 1000)
+
+
+# 毫秒时间戳 → 本地时间 datetime
+def ms_to_datetime(ms):
+    return datetime.fromtimestamp(ms / 1000)
+
+
+# 本地时间 datetime → 毫秒时间戳
+def datetime_to_ms(dt):
+    return int(dt.timestamp() * 1000)
+
+
+# 格式化毫秒时间戳用于页面显示
+def format_timestamp(ms, fmt="%Y-%m-%d %H:%M"):
+    if ms is None:
+        return ""
+    return ms_to_datetime(ms).strftime(fmt)
+
+
+# 把旧版文本时间解析为毫秒时间戳（仅供数据迁移使用），无法解析时返回 None
+LEGACY_TIME_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y-%m-%d %H:%M",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y/%m/%d %H:%M",
+)
+
+
+# utc=True 表示文本是 UTC 时间（SQLite 的 CURRENT_TIMESTAMP 默认值），否则按本地时间解析
+def parse_legacy_time(text, utc=False):
+    for fmt in LEGACY_TIME_FORMATS:
+        try:
+            dt = datetime.strptime(text, fmt)
+        except (TypeError, ValueError):
+            continue
+        if utc:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return datetime_to_ms(dt)
+    return None
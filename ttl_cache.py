@@ -0,0 +1,95 @@
+import time
+import threading
+from collections import OrderedDict
+
+# 进程级缓存的公共部分：容量上限（超过时淘汰最久未使用的条目）、有效期（过期条目在读取时丢弃）、
+# generation 写回保护和命中率统计。商品缓存（product_cache.py）和搜索结果缓存（search_cache.py）
+# 在此基础上各自定义缓存键和失效方式
+
+
+class TTLCache:
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        # 缓存键 → [值, 过期时间]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # 每次失效加一；读取数据库前记下，写回缓存时如已变化说明期间有写入，放弃写回
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    # 以下带下划线的方法须在持有 self._lock 时调用
+
+    # 查找未过期的条目（[值, 过期时间]）并标记为最近使用，不计入命中统计
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            del self._entries[key]
+            self._expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value, expires):
+        self._entries[key] = [value, expires]
+        self._entries.move_to_end(key)
+
+    def _evict(self):
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    # 删除这些条目，并使读取中的查询结果不再写回
+    def _invalidate(self, keys):
+        self._generation += 1
+        for key in keys:
+            if self._entries.pop(key, None) is not None:
+                self._invalidations += 1
+
+    # 读取缓存的值，未命中时返回 None
+    def get(self, key):
+        with self._lock:
+            entry = self._lookup(key, time.monotonic())
+            if entry is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return entry[0]
+
+    # 写入查询结果；generation 是查询前的 generation()
+    def put(self, key, value, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._store(key, value, time.monotonic() + self.ttl)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations,
+            }